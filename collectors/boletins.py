@@ -1,13 +1,19 @@
 import re
 import json
 import logging
+import math
 import os
-from datetime import datetime
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import urljoin, urlparse
 from playwright.sync_api import sync_playwright
 import gspread
 from google.oauth2.service_account import Credentials
 import requests
 import pathlib
+import shutil
+import tempfile
 import zipfile
 from dotenv import load_dotenv
 
@@ -16,11 +22,20 @@ load_dotenv()
 #from services.gemini_service import analisar_edital
 from services.drive_service import criar_pasta, upload_arquivo_para_pasta, SHARED_DRIVE_ID
 from services.gemini_queue import GeminiQueue
-from services.gemini_service import tokens_para_custo_usd
+from services.gemini_service import obter_cliente, tokens_para_custo_usd
+from services.gemini_arquivos import arquivos as gemini_arquivos
+from services.gemini_contexto import contextos as gemini_contextos
+from services.cache_gemini import CABECALHO_MEMORIA, cache as cache_gemini
 from inputData.inputDataPipedrive import processar as importar_pipedrive, importar_deal_unico
-from services.filtro_palavras import motivo_match, licitacao_telemedicina
+from services.filtro_palavras import analisar, textos_bidding
 from services.feedback_service import processar_feedbacks
 from services.notificacao_service import notificar_resumo_coleta
+from services.esteira import Esteira, Etapa
+from services.sessao_portal import SessaoPortal, pediu_login, url_de_login
+from services.cache_http import CacheHTTP
+from services import arquivamento, artefatos, espelho_planilha, estado, gemini_ritmo, resumos
+from services.log_coleta import EscritorLog
+from services.sheets_buffer import EscritorPlanilha
 
 
 # =====================================================
@@ -28,14 +43,24 @@ from services.notificacao_service import notificar_resumo_coleta
 # =====================================================
 LOGIN_URL = "https://conlicitacao.com.br/"
 CALENDARIO_URL = "https://consulteonline.conlicitacao.com.br/boletim_web/public/boletins"
+CALENDARIO_FEED_URL = os.getenv("CONLICITACAO_CALENDARIO_FEED", "")  # vazio = descobre no HTML
+CALENDARIO_JANELA_DIAS = 60  # dias para trás pedidos ao feed do calendário
+BOLETIM_URL = "https://consulteonline.conlicitacao.com.br/boletim_web/public/boletins/{}"
 BIDDINGS_API = "https://consultaonline.conlicitacao.com.br/boletim_web/public/boletins/{}/biddings.json"
 BIDDINGS_PER_PAGE = 50
+MAX_CONEXOES_POR_HOST = 6   # requisições simultâneas por host na paginação
+PAGINAS_POR_SONDAGEM = 4    # páginas pedidas em paralelo quando o total é desconhecido
+ATIVACAO_TENTATIVAS_SONDAGEM = 5
+DOWNLOAD_CHUNK = 1024 * 1024                # 1 MB por leitura no download/extração
+ZIP_EM_MEMORIA_MAX = 16 * 1024 * 1024      # acima disso o ZIP vai para arquivo temporário
+ZIP_PROFUNDIDADE_MAX = 3                   # níveis de ZIP aninhado abertos
+# Membros do edital.zip que são extraídos (análise e Drive); o resto é ignorado
+EXTENSOES_EDITAL = (".pdf", ".doc", ".docx", ".odt", ".rtf", ".xls", ".xlsx", ".ods", ".txt")
+ATIVACAO_INTERVALO_SONDAGEM = 0.25  # segundos; dobra a cada tentativa
 VALOR_MINIMO      = 1_200_000   # R$ 1.200.000 — não se aplica à telemedicina
 
-CHECKPOINT_FILE = "logs/ultimo_boletim.json"
-CHECKPOINT_LICITACOES_FILE = "logs/licitacoes_processadas.json"
-LOG_FILE = "logs/coleta_log.json"
-RELATORIO_FILE = "logs/relatorio_coleta.json"
+LOG_FILE = "logs/coleta_log.jsonl"
+STORAGE_STATE_FILE = "credentials/portal_storage_state.json"
 GEMINI_MEMORY_FILE = "memory/gemini_memoria.md"
 
 SHEET_ID = os.getenv("GOOGLE_SHEET_ID")
@@ -43,7 +68,7 @@ if not SHEET_ID:
     raise EnvironmentError("GOOGLE_SHEET_ID não definido no .env")
 SHEET_APROVADOS = "aprovados"
 SHEET_REPROVADOS = "reprovados"
-gemini_queue = GeminiQueue(delay=15)  # 15 segundos entre envios
+gemini_queue = GeminiQueue()  # até GEMINI_CONCORRENCIA análises em paralelo
 PROMPT_GERED = PROMPT_GERED = """GERED (Gerador de Informações dos Editais)
 Você é o GERED, um agente especialista em licitações públicas na área da saúde.
 Você opera em BLOCOS SEQUENCIAIS COM VALIDAÇÃO AUTOMÁTICA.
@@ -383,20 +408,13 @@ STATUS_FINAL: APROVADO
 ou
 STATUS_FINAL: REPROVADO"""
 
+# Fonte de eventos do FullCalendar: `events: "/url"` ou `eventSources: ["/url"]`
+_FEED_CALENDARIO_RE = re.compile(r"""(?:events|eventSources)\s*:\s*\[?\s*['"]([^'"]+)['"]""")
+
 MODO_TESTE = False
 TESTE_LIMITE = 1
 
-def _carregar_log_existente():
-    if os.path.exists(LOG_FILE):
-        try:
-            with open(LOG_FILE, "r", encoding="utf-8") as f:
-                dados = json.load(f)
-                return dados if isinstance(dados, list) else []
-        except Exception:
-            return []
-    return []
-
-log_entries = _carregar_log_existente()
+_log = EscritorLog(LOG_FILE)
 
 # =====================================================
 # MEMORIA GEMINI
@@ -417,7 +435,7 @@ def montar_prompt_gemini():
     return f"""{PROMPT_GERED}
 
 ========================================
-MEMORIA OPERACIONAL OBRIGATORIA
+{CABECALHO_MEMORIA}
 ========================================
 As regras abaixo foram adicionadas pelo usuario a partir de analises anteriores.
 Elas corrigem erros recorrentes e devem prevalecer quando nao conflitarem com o edital.
@@ -450,73 +468,29 @@ def log_message(level, message, extra=None):
     if extra:
         entry.update(extra)
 
-    log_entries.append(entry)
     print(f"[{level.upper()}] {message}")
-
-    os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
-    with open(LOG_FILE, "w", encoding="utf-8") as f:
-        json.dump(log_entries, f, indent=2, ensure_ascii=False)
+    # Gravação fica com a thread do EscritorLog; workers da esteira não esperam disco
+    _log.registrar(entry)
 
 # =====================================================
 # CHECKPOINT
 # =====================================================
+# Checkpoints ficam no SQLite de services/estado.py (logs/estado.db)
 def carregar_ultimo_boletim():
-    if os.path.exists(CHECKPOINT_FILE):
-        try:
-            with open(CHECKPOINT_FILE, "r", encoding="utf-8") as f:
-                return int(json.load(f).get("ultimo_id", 0))
-        except Exception:
-            return 0
-    return 0
+    return estado.obter_ultimo_boletim()
 
 def salvar_ultimo_boletim(boletim_id):
-    os.makedirs(os.path.dirname(CHECKPOINT_FILE), exist_ok=True)
-    with open(CHECKPOINT_FILE, "w", encoding="utf-8") as f:
-        json.dump({
-            "ultimo_id": boletim_id,
-            "data_processamento": datetime.now().isoformat()
-        }, f, indent=2, ensure_ascii=False)
+    estado.salvar_ultimo_boletim(boletim_id)
 
 def carregar_licitacoes_processadas():
-    if os.path.exists(CHECKPOINT_LICITACOES_FILE):
-        try:
-            with open(CHECKPOINT_LICITACOES_FILE, "r", encoding="utf-8") as f:
-                dados = json.load(f)
-                return dados if isinstance(dados, dict) else {}
-        except Exception:
-            return {}
-    return {}
+    return estado.licitacoes_processadas()
 
 def salvar_licitacao_processada(bidding_id, dados):
-    os.makedirs(os.path.dirname(CHECKPOINT_LICITACOES_FILE), exist_ok=True)
-    processadas = carregar_licitacoes_processadas()
-    processadas[str(bidding_id)] = {
-        "boletim_id": dados.get("boletim_id"),
-        "status_ia": dados.get("status_ia"),
-        "link_drive": dados.get("link_drive"),
-        "link_txt": dados.get("link_txt"),
-        "data_processamento": datetime.now().isoformat()
-    }
-
-    with open(CHECKPOINT_LICITACOES_FILE, "w", encoding="utf-8") as f:
-        json.dump(processadas, f, indent=2, ensure_ascii=False)
+    estado.registrar_licitacao_processada(bidding_id, dados)
 
 
 def salvar_relatorio_coleta(stats):
-    os.makedirs(os.path.dirname(RELATORIO_FILE), exist_ok=True)
-
-    historico = []
-    if os.path.exists(RELATORIO_FILE):
-        try:
-            with open(RELATORIO_FILE, "r", encoding="utf-8") as f:
-                historico = json.load(f)
-        except Exception:
-            historico = []
-
-    historico.append(stats)
-
-    with open(RELATORIO_FILE, "w", encoding="utf-8") as f:
-        json.dump(historico, f, indent=2, ensure_ascii=False)
+    estado.registrar_relatorio(stats)
 
     print(
         f"[RELATORIO] Boletins: {stats['boletins_processados']} | "
@@ -524,7 +498,7 @@ def salvar_relatorio_coleta(stats):
         f"Aprovadas: {stats['licitacoes_aprovadas']} | "
         f"Reprovadas: {stats['licitacoes_reprovadas']} | "
         f"Cache hits: {stats['cache_hits']} | "
-        f"Tokens entrada: {stats['tokens_entrada']} | "
+        f"Tokens entrada: {stats['tokens_entrada']} ({stats['tokens_entrada_cache']} do contexto em cache) | "
         f"Tokens saida: {stats['tokens_saida']} | "
         f"Custo estimado: US$ {stats['custo_estimado_usd']:.4f}"
     )
@@ -547,7 +521,15 @@ def conectar_google_sheets():
     return client.open_by_key(SHEET_ID)
 
 def obter_ids_existentes(spreadsheet):
-    ids_existentes = set()
+    try:
+        espelho_planilha.sincronizar(spreadsheet, (SHEET_APROVADOS, SHEET_REPROVADOS))
+        return (espelho_planilha.ids(SHEET_APROVADOS) | espelho_planilha.ids(SHEET_REPROVADOS)
+                | estado.ids_arquivados())
+    except Exception as e:
+        log_message("WARNING", f"Espelho da planilha indisponível, lendo coluna B: {type(e).__name__}: {e}")
+
+    # Linhas movidas para as abas de arquivo continuam contando no dedupe
+    ids_existentes = estado.ids_arquivados()
 
     for nome_aba in [SHEET_APROVADOS, SHEET_REPROVADOS]:
         sheet = spreadsheet.worksheet(nome_aba)
@@ -573,7 +555,7 @@ def montar_linha_planilha(dados):
         dados.get("status_ia") or "",                   # 13 aprovado_ia
         dados.get("link_drive") or "",                  # 14 link_drive_edital
         "",                                              # 15 importado_pipedrive
-        dados.get("resumo_ia") or "",                   # 16 resumo_ia
+        resumos.valor_planilha(dados.get("resumo_ia"), dados.get("link_txt")),  # 16 resumo_ia
         dados.get("orgao_nome") or "",                  # 17 orgao_nome
         dados.get("modalidade") or "",                  # 18 modalidade
         dados.get("modo_disputa") or "",                # 19 modo_disputa
@@ -581,13 +563,21 @@ def montar_linha_planilha(dados):
         "",                                              # 21 feedback_qualitativo
     ]
 
-def inserir_boletim_google_sheets(spreadsheet, dados, ids_existentes):
+def inserir_boletim_google_sheets(spreadsheet, dados, ids_existentes, escritor=None, contexto=None):
+    """Com `escritor` (EscritorPlanilha) a linha vai para o buffer e o índice
+    só é conhecido na gravação (retorna None)."""
     bidding_id = str(dados.get("bidding_id")).strip()
 
     if bidding_id in ids_existentes:
         return False, None
 
     nome_aba = SHEET_APROVADOS if dados.get("status_ia") == "SIM" else SHEET_REPROVADOS
+
+    if escritor is not None:
+        escritor.adicionar(nome_aba, bidding_id, montar_linha_planilha(dados), contexto)
+        ids_existentes.add(bidding_id)
+        return True, None
+
     sheet = spreadsheet.worksheet(nome_aba)
     resp = sheet.append_row(montar_linha_planilha(dados), value_input_option="USER_ENTERED")
 
@@ -618,42 +608,255 @@ def carregar_credenciais():
     with open("credentials/credentials.json", "r", encoding="utf-8") as f:
         return json.load(f)
 
-def criar_browser_autenticado():
+def sessao_autenticada(context):
+    """Sonda barata: a página de boletins responde 200 sem redirecionar para o login."""
+    try:
+        resp = context.request.get(CALENDARIO_URL, max_redirects=0, timeout=15000)
+    except Exception as e:
+        log_message("WARNING", f"Sonda de autenticação falhou: {type(e).__name__}: {e}")
+        return False
+
+    autenticado = resp.status == 200 and not url_de_login(resp.url)
+    resp.dispose()
+    return autenticado
+
+
+def fazer_login(context):
     creds = carregar_credenciais()
+    page = context.new_page()
+
+    try:
+        log_message("INFO", "Iniciando login...")
+        page.goto(LOGIN_URL, wait_until="domcontentloaded")
+        page.get_by_role("link", name="Acessar Conta").click()
+        page.get_by_role("textbox", name="Seu e-mail").fill(creds["email"])
+        page.get_by_role("textbox", name="Sua senha").fill(creds["password"])
+        page.get_by_role("button", name="Acessar").click()
+
+        # Login aceito = formulário some; evita espera fixa
+        page.get_by_role("textbox", name="Sua senha").wait_for(state="hidden", timeout=30000)
+        page.wait_for_load_state("domcontentloaded")
+    finally:
+        page.close()
+
+    if not sessao_autenticada(context):
+        log_message("WARNING", "Login concluído, mas a sonda de autenticação não confirmou a sessão")
+
+    os.makedirs(os.path.dirname(STORAGE_STATE_FILE), exist_ok=True)
+    context.storage_state(path=STORAGE_STATE_FILE)
+    log_message("INFO", "Login concluído")
+
+
+def cookies_autenticados(context):
+    """Cookies do contexto, refazendo o login só se a sessão tiver expirado."""
+    if not sessao_autenticada(context):
+        log_message("INFO", "Sessão do portal expirada — refazendo login")
+        fazer_login(context)
+    return context.cookies()
+
 
+def criar_browser_autenticado():
     p = sync_playwright().start()
     browser = p.chromium.launch(headless=True)
-    context = browser.new_context()
-    page = context.new_page()
 
-    log_message("INFO", "Iniciando login...")
-    page.goto(LOGIN_URL, wait_until="networkidle")
-    page.get_by_role("link", name="Acessar Conta").click()
-    page.get_by_role("textbox", name="Seu e-mail").fill(creds["email"])
-    page.get_by_role("textbox", name="Sua senha").fill(creds["password"])
-    page.get_by_role("button", name="Acessar").click()
-    page.wait_for_timeout(8000)
+    if os.path.exists(STORAGE_STATE_FILE):
+        context = browser.new_context(storage_state=STORAGE_STATE_FILE)
+        if sessao_autenticada(context):
+            log_message("INFO", "Sessão salva reaproveitada — login dispensado")
+            return p, browser, context
 
-    log_message("INFO", "Login concluído")
+        log_message("INFO", "Sessão salva expirada — refazendo login")
+        context.close()
+
+    context = browser.new_context()
+    fazer_login(context)
 
     return p, browser, context
 
 # =====================================================
 # ATIVAR BOLETIM (ESSENCIAL)
 # =====================================================
-def ativar_boletim_html(context, boletim_id):
+def boletim_ativo(sessao, boletim_id):
+    """Sonda o biddings.json (1 item) para confirmar que o boletim já responde.
+    Lista vazia não confirma: é o que um boletim ainda não ativado devolve."""
+    url = f"{BIDDINGS_API.format(boletim_id)}?page=1&per_page=1"
+    try:
+        resp = sessao.get(url, timeout=30)
+    except requests.exceptions.RequestException:
+        return False
+
+    if resp.status_code != 200 or pediu_login(resp):
+        return False
+
+    try:
+        biddings = resp.json().get("biddings")
+    except Exception:
+        return False
+    return isinstance(biddings, list) and len(biddings) > 0
+
+
+def _ativar_boletim_http(sessao, boletim_id):
+    try:
+        resp = sessao.get(BOLETIM_URL.format(boletim_id), timeout=30)
+    except requests.exceptions.RequestException as e:
+        log_message("WARNING", f"Ativação HTTP do boletim {boletim_id} falhou: {e}")
+        return False
+
+    resp.close()
+    if resp.status_code != 200 or pediu_login(resp):
+        log_message("WARNING", f"Ativação HTTP do boletim {boletim_id} retornou {resp.status_code}")
+        return False
+    return True
+
+
+def _semaforo(semaforos, url):
+    """Semáforo do host da URL (limita requisições simultâneas por host)."""
+    host = urlparse(url).netloc
+    return semaforos.setdefault(host, asyncio.Semaphore(MAX_CONEXOES_POR_HOST))
+
+
+async def _aguardar_boletim_ativo(sessao, semaforos, boletim_id):
+    espera = ATIVACAO_INTERVALO_SONDAGEM
+    for _ in range(ATIVACAO_TENTATIVAS_SONDAGEM):
+        async with _semaforo(semaforos, BIDDINGS_API.format(boletim_id)):
+            ativo = await asyncio.to_thread(boletim_ativo, sessao, boletim_id)
+        if ativo:
+            return True
+        await asyncio.sleep(espera)
+        espera *= 2
+    return False
+
+
+async def _ativar_e_confirmar(sessao, semaforos, boletim_id):
+    async with _semaforo(semaforos, BOLETIM_URL.format(boletim_id)):
+        if not await asyncio.to_thread(_ativar_boletim_http, sessao, boletim_id):
+            return False
+    return await _aguardar_boletim_ativo(sessao, semaforos, boletim_id)
+
+
+async def _confirmar_com_vigia(sessao, boletim_id):
+    # A sonda roda em thread: sem o vigia, cookies expirados travariam até o timeout
+    vigia = asyncio.create_task(_atender_renovacoes(sessao))
+    try:
+        return await _aguardar_boletim_ativo(sessao, {}, boletim_id)
+    finally:
+        vigia.cancel()
+
+
+def _ativar_boletins_navegador(context, sessao, boletins):
+    """Fallback: navega cada boletim numa única aba e confirma pela sonda."""
+    ativados = []
     page = context.new_page()
     try:
-        url = f"https://consulteonline.conlicitacao.com.br/boletim_web/public/boletins/{boletim_id}"
-        page.goto(url, wait_until="domcontentloaded", timeout=30000)
-        page.wait_for_timeout(3000)
+        for boletim_id in boletins:
+            try:
+                page.goto(BOLETIM_URL.format(boletim_id), wait_until="domcontentloaded", timeout=30000)
+            except Exception as e:
+                log_message("WARNING", f"Falha ao abrir boletim {boletim_id} no navegador: {type(e).__name__}: {e}")
+                continue
+            if asyncio.run(_confirmar_com_vigia(sessao, boletim_id)):
+                ativados.append(boletim_id)
     finally:
         page.close()
+    return ativados
+
+
+def ativar_boletins(sessao, context, boletins):
+    """Ativa todos os boletins de uma vez, confirmando cada um pela sonda do
+    biddings.json. Usa a sessão HTTP em paralelo e cai para o navegador
+    (uma única aba) só para os que não confirmarem."""
+    async def _executar():
+        semaforos = {}
+        vigia = asyncio.create_task(_atender_renovacoes(sessao))
+        try:
+            return await asyncio.gather(
+                *(_ativar_e_confirmar(sessao, semaforos, b) for b in boletins)
+            )
+        finally:
+            vigia.cancel()
+
+    confirmados = asyncio.run(_executar())
+    pendentes = [b for b, ok in zip(boletins, confirmados) if not ok]
+
+    if pendentes:
+        log_message("INFO", f"Ativando {len(pendentes)} boletim(ns) pelo navegador: {pendentes}")
+        ativados = _ativar_boletins_navegador(context, sessao, pendentes)
+        for boletim_id in pendentes:
+            if boletim_id not in ativados:
+                log_message("WARNING", f"Boletim {boletim_id} não confirmou ativação")
+
+    log_message("INFO", f"{len(boletins) - len(pendentes)}/{len(boletins)} boletins ativados via HTTP")
 
 # =====================================================
 # EXTRAIR BOLETINS
 # =====================================================
-def extrair_boletins(context):
+def _descobrir_feed_calendario(sessao):
+    """URL do feed JSON que alimenta o FullCalendar (lido do HTML, sem navegador)."""
+    if CALENDARIO_FEED_URL:
+        return CALENDARIO_FEED_URL
+
+    resp = sessao.get(CALENDARIO_URL, timeout=30)
+    if resp.status_code != 200 or pediu_login(resp):
+        return None
+
+    match = _FEED_CALENDARIO_RE.search(resp.text)
+    if match:
+        return urljoin(CALENDARIO_URL, match.group(1))
+    return f"{CALENDARIO_URL}.json"
+
+
+def _extrair_boletins_feed(sessao):
+    url_feed = _descobrir_feed_calendario(sessao)
+    if not url_feed:
+        return [], {}
+
+    hoje = datetime.now().date()
+    params = {
+        "start": (hoje - timedelta(days=CALENDARIO_JANELA_DIAS)).isoformat(),
+        "end": (hoje + timedelta(days=1)).isoformat(),
+    }
+    resp = sessao.get(url_feed, params=params, timeout=30)
+    if resp.status_code != 200 or pediu_login(resp):
+        log_message("WARNING", f"Feed do calendário respondeu {resp.status_code}")
+        return [], {}
+
+    eventos = resp.json()
+    if isinstance(eventos, dict):
+        eventos = eventos.get("events") or eventos.get("boletins") or []
+
+    boletins_info = {}  # {id: titulo_do_evento}
+    for ev in eventos:
+        if not isinstance(ev, dict):
+            continue
+        match = re.search(r"/boletins/(\d+)", str(ev.get("url") or ""))
+        if match:
+            bid = int(match.group(1))
+        elif str(ev.get("id") or "").isdigit():
+            bid = int(ev["id"])
+        else:
+            continue
+        boletins_info[bid] = str(ev.get("title") or "").strip().replace("\n", " ")
+
+    return sorted(boletins_info.keys()), boletins_info
+
+
+def extrair_boletins(context, sessao=None):
+    if sessao is not None:
+        log_message("INFO", "Extraindo boletins via feed do calendário (HTTP)")
+        try:
+            ids, boletins_info = _extrair_boletins_feed(sessao)
+            if ids:
+                log_message("INFO", f"{len(ids)} boletins válidos encontrados")
+                log_message("INFO", f"Boletins encontrados: {ids}")
+                return ids, boletins_info
+            log_message("WARNING", "Feed do calendário sem boletins — usando FullCalendar")
+        except Exception as e:
+            log_message("WARNING", f"Feed do calendário falhou: {type(e).__name__}: {e} — usando FullCalendar")
+
+    return _extrair_boletins_dom(context)
+
+
+def _extrair_boletins_dom(context):
     log_message("INFO", "Extraindo boletins via Playwright (FullCalendar)")
 
     page = context.new_page()
@@ -699,10 +902,167 @@ def extrair_boletins(context):
         page.close()
 
 
+# =====================================================
+# PAGINAÇÃO CONCORRENTE (biddings.json)
+# =====================================================
+def _total_paginas(dados_json):
+    """Descobre o total de páginas pelos metadados da resposta, se existirem."""
+    for fonte in (dados_json, dados_json.get("meta"), dados_json.get("pagination")):
+        if not isinstance(fonte, dict):
+            continue
+        for chave in ("total_pages", "total_paginas"):
+            valor = fonte.get(chave)
+            if isinstance(valor, int) and valor > 0:
+                return valor
+        for chave in ("total", "total_count", "total_entries"):
+            valor = fonte.get(chave)
+            if isinstance(valor, int) and valor >= 0:
+                return max(1, math.ceil(valor / BIDDINGS_PER_PAGE))
+    return None
+
+
+async def _buscar_pagina(sessao, semaforos, boletim_id, pagina):
+    url_pag = f"{BIDDINGS_API.format(boletim_id)}?page={pagina}&per_page={BIDDINGS_PER_PAGE}"
+    async with _semaforo(semaforos, url_pag):
+        try:
+            resp = await asyncio.to_thread(sessao.get, url_pag, cache=True, timeout=60)
+        except requests.exceptions.Timeout:
+            log_message("WARNING", f"Timeout boletim {boletim_id} página {pagina} — parando paginação")
+            return None
+        except requests.exceptions.RequestException as e:
+            log_message("WARNING", f"Erro de rede boletim {boletim_id} página {pagina}: {e} — parando")
+            return None
+
+    if resp.status_code != 200:
+        log_message("WARNING", f"API falhou {boletim_id} p{pagina} (status {resp.status_code})")
+        return None
+
+    try:
+        return resp.json()
+    except Exception:
+        log_message("ERROR", f"Resposta inválida {boletim_id} p{pagina}: {resp.text[:200]}")
+        return None
+
+
+async def _paginar_boletim(sessao, semaforos, boletim_id):
+    primeira = await _buscar_pagina(sessao, semaforos, boletim_id, 1)
+    if primeira is None:
+        return []
+
+    paginas = [primeira.get("biddings", [])]
+    log_message("INFO", f"Boletim {boletim_id} — página 1: {len(paginas[0])} biddings")
+
+    if len(paginas[0]) >= BIDDINGS_PER_PAGE:
+        total = _total_paginas(primeira)
+        # Sem total nos metadados: sonda janelas de páginas até vir uma incompleta
+        janela = (total - 1) if total else PAGINAS_POR_SONDAGEM
+        proxima = 2
+
+        while janela > 0:
+            numeros = range(proxima, proxima + janela)
+            respostas = await asyncio.gather(
+                *(_buscar_pagina(sessao, semaforos, boletim_id, n) for n in numeros)
+            )
+
+            fim = total is not None
+            for numero, dados_json in zip(numeros, respostas):
+                if dados_json is None:
+                    fim = True
+                    break
+                pagina_biddings = dados_json.get("biddings", [])
+                paginas.append(pagina_biddings)
+                log_message("INFO", f"Boletim {boletim_id} — página {numero}: {len(pagina_biddings)} biddings")
+                # Para quando vier menos que o tamanho da página (última página)
+                if len(pagina_biddings) < BIDDINGS_PER_PAGE:
+                    fim = True
+                    break
+
+            if fim:
+                break
+            proxima += janela
+
+    biddings = [b for pagina in paginas for b in pagina]
+    log_message("INFO", f"Boletim {boletim_id} — total: {len(biddings)} biddings em {len(paginas)} página(s)")
+    return biddings
+
+
+async def _atender_renovacoes(sessao):
+    # Requisições rodam em threads; a renovação de cookies precisa da thread principal
+    while True:
+        sessao.atender_renovacao()
+        await asyncio.sleep(0.2)
+
+
+def buscar_biddings_boletins(sessao, boletins):
+    """Pagina o biddings.json de todos os boletins em paralelo.
+    Retorna {boletim_id: [biddings]} na mesma ordem da API."""
+    async def _executar():
+        semaforos = {}
+        vigia = asyncio.create_task(_atender_renovacoes(sessao))
+        try:
+            resultados = await asyncio.gather(
+                *(_paginar_boletim(sessao, semaforos, b) for b in boletins)
+            )
+        finally:
+            vigia.cancel()
+        return dict(zip(boletins, resultados))
+
+    return asyncio.run(_executar())
+
 # =====================================================
 # DOWNLOAD EDITAL
 # =====================================================
-def baixar_edital_por_json(context, boletim_id, bidding_id, arquivo_json):
+def _nome_seguro(nome):
+    """Caminho relativo seguro a partir do nome de um membro do ZIP."""
+    partes = [
+        re.sub(r'[\\/*?:"<>|]', "_", p)
+        for p in re.split(r"[\\/]+", nome)
+        if p and p not in (".", "..")
+    ]
+    return pathlib.Path(*partes) if partes else None
+
+
+def _extrair_zip(arquivo_zip, pasta_base, prefixo=pathlib.Path(), profundidade=0):
+    """Extrai só os membros úteis (EXTENSOES_EDITAL), abrindo ZIPs aninhados
+    em arquivo temporário. Retorna a lista de caminhos gravados."""
+    extraidos = []
+
+    with zipfile.ZipFile(arquivo_zip, "r") as zip_ref:
+        for info in zip_ref.infolist():
+            if info.is_dir():
+                continue
+
+            relativo = _nome_seguro(info.filename)
+            if relativo is None:
+                continue
+            nome = relativo.name.lower()
+
+            if nome.endswith(".zip"):
+                if profundidade >= ZIP_PROFUNDIDADE_MAX:
+                    continue
+                with zip_ref.open(info) as origem, tempfile.SpooledTemporaryFile(max_size=ZIP_EM_MEMORIA_MAX) as interno:
+                    shutil.copyfileobj(origem, interno, DOWNLOAD_CHUNK)
+                    interno.seek(0)
+                    try:
+                        extraidos += _extrair_zip(
+                            interno, pasta_base, prefixo / relativo.with_suffix(""), profundidade + 1
+                        )
+                    except zipfile.BadZipFile:
+                        continue
+                continue
+
+            if not nome.endswith(EXTENSOES_EDITAL):
+                continue
+
+            destino = pasta_base / prefixo / relativo
+            with zip_ref.open(info) as origem:
+                artefatos.gravar_stream(origem, destino, DOWNLOAD_CHUNK)
+            extraidos.append(str(destino))
+
+    return extraidos
+
+
+def baixar_edital_por_json(sessao, boletim_id, bidding_id, arquivo_json):
 
     url_relativa = arquivo_json.get("url")
     filename = arquivo_json.get("filename") or "arquivo"
@@ -721,12 +1081,41 @@ def baixar_edital_por_json(context, boletim_id, bidding_id, arquivo_json):
     pasta_base = pathlib.Path("downloads") / str(boletim_id) / str(bidding_id)
     pasta_base.mkdir(parents=True, exist_ok=True)
 
-    session = requests.Session()
-    for c in context.cookies():
-        session.cookies.set(c["name"], c["value"], domain=c.get("domain"))
+    eh_zip = filename.lower().endswith(".zip")
+    caminho = pasta_base / filename
 
     try:
-        response = session.get(url_completa, timeout=90)
+        with sessao.get(url_completa, cache=True, timeout=90, stream=True) as response:
+            if response.status_code != 200:
+                log_message("WARNING", f"Arquivo não disponível {bidding_id} (status {response.status_code})")
+                return []
+
+            if not eh_zip:
+                response.raw.decode_content = True
+                artefatos.gravar_stream(response.raw, caminho, DOWNLOAD_CHUNK)
+                return [str(caminho)]
+
+            # ZIP já salvo no cache HTTP: extrai direto do arquivo em disco
+            if getattr(response, "do_cache", False):
+                try:
+                    return _extrair_zip(response.raw, pasta_base)
+                except zipfile.BadZipFile:
+                    log_message("WARNING", f"ZIP corrompido para bidding {bidding_id} — pulando")
+                    return []
+
+            # ZIP fica em memória até ZIP_EM_MEMORIA_MAX; acima disso vai para um
+            # temporário que é descartado após extrair só o que usamos
+            with tempfile.SpooledTemporaryFile(max_size=ZIP_EM_MEMORIA_MAX) as arquivo_zip:
+                for chunk in response.iter_content(DOWNLOAD_CHUNK):
+                    arquivo_zip.write(chunk)
+                arquivo_zip.seek(0)
+
+                try:
+                    return _extrair_zip(arquivo_zip, pasta_base)
+                except zipfile.BadZipFile:
+                    log_message("WARNING", f"ZIP corrompido para bidding {bidding_id} — pulando")
+                    return []
+
     except requests.exceptions.Timeout:
         log_message("WARNING", f"Timeout ao baixar edital {bidding_id} — pulando")
         return []
@@ -734,31 +1123,6 @@ def baixar_edital_por_json(context, boletim_id, bidding_id, arquivo_json):
         log_message("WARNING", f"Erro de rede ao baixar edital {bidding_id}: {e} — pulando")
         return []
 
-    if response.status_code != 200:
-        log_message("WARNING", f"Arquivo não disponível {bidding_id} (status {response.status_code})")
-        return []
-
-    caminho = pasta_base / filename
-
-    with open(caminho, "wb") as f:
-        f.write(response.content)
-
-    arquivos_extraidos = []
-
-    if filename.lower().endswith(".zip"):
-        try:
-            with zipfile.ZipFile(caminho, 'r') as zip_ref:
-                zip_ref.extractall(pasta_base)
-                for nome in zip_ref.namelist():
-                    arquivos_extraidos.append(str(pasta_base / nome))
-            caminho.unlink()
-        except zipfile.BadZipFile:
-            log_message("WARNING", f"ZIP corrompido para bidding {bidding_id} — pulando")
-            return []
-        return arquivos_extraidos
-
-    return [str(caminho)]
-
 # =====================================================
 # MONTAR NOME PASTA
 # =====================================================
@@ -776,11 +1140,360 @@ def montar_nome_pasta(dados):
 # =====================================================
 # COLETAR LICITAÇÕES
 # =====================================================
-def coletar_licitacoes(context, boletins, boletins_info=None):
+# Workers por etapa da esteira. Planilha fica com 1 worker: gspread não é
+# thread-safe e o checkpoint por licitação depende da ordem de inserção.
+# A IA tem um worker por análise simultânea permitida no motor do Gemini.
+PIPELINE_WORKERS = {
+    "download": 4,
+    "ia": gemini_queue.concorrencia,
+    "drive": 3,
+    "registro": 1,
+}
+PIPELINE_TAMANHO_FILA = 10
+
+
+class _ControleBoletins:
+    """Acompanha licitações em voo por boletim e avança o checkpoint em ordem.
+
+    Um boletim só entra no checkpoint quando o produtor terminou de
+    enfileirá-lo, todas as suas licitações saíram da esteira e todos os
+    boletins anteriores já foram salvos. Falha em qualquer licitação trava o
+    checkpoint naquele boletim para que a próxima execução o retome.
+
+    `antes_do_checkpoint` roda antes de salvar (ex.: descarregar o buffer da
+    planilha); se falhar, o checkpoint espera a próxima chamada."""
+
+    def __init__(self, boletins, antes_do_checkpoint=None):
+        self._antes_do_checkpoint = antes_do_checkpoint or (lambda: None)
+        self._ordem = list(boletins)
+        self._pendentes = {b: 0 for b in boletins}
+        self._fechados = set()
+        self._falhos = set()
+        self._proximo = 0
+        self._lock = threading.Lock()
+
+    def adicionar(self, boletim_id):
+        with self._lock:
+            self._pendentes[boletim_id] += 1
+
+    def fechar(self, boletim_id):
+        with self._lock:
+            self._fechados.add(boletim_id)
+            self._avancar()
+
+    def concluir(self, boletim_id, sucesso=True):
+        with self._lock:
+            self._pendentes[boletim_id] -= 1
+            if not sucesso:
+                self._falhos.add(boletim_id)
+            self._avancar()
+
+    def avancar(self):
+        with self._lock:
+            self._avancar()
+
+    def _avancar(self):
+        while self._proximo < len(self._ordem):
+            boletim_id = self._ordem[self._proximo]
+            if boletim_id in self._falhos:
+                return
+            if boletim_id not in self._fechados or self._pendentes[boletim_id]:
+                return
+            try:
+                self._antes_do_checkpoint()
+            except Exception as e:
+                log_message("ERROR", f"Checkpoint do boletim {boletim_id} adiado: {type(e).__name__}: {e}")
+                return
+            salvar_ultimo_boletim(boletim_id)
+            log_message("INFO", f"Checkpoint salvo: boletim {boletim_id}")
+            self._proximo += 1
+
+
+def _linha_gravada(tarefa, nome_aba, row_idx):
+    """Chamado pelo EscritorPlanilha depois que a linha da tarefa foi gravada."""
+    bidding_id = tarefa["bidding_id"]
+    # Etapa antes da marca de processada: se cair entre as duas, a retomada
+    # sabe onde está a linha e só completa o Pipedrive
+    _concluir_etapa(tarefa, estado.ETAPA_PLANILHA, {"aba": nome_aba, "row_idx": row_idx})
+    salvar_licitacao_processada(bidding_id, tarefa["licitacao_dados"])
+    tarefa["licitacoes_processadas"][str(bidding_id).strip()] = tarefa["licitacao_dados"]
+
+
+def _linha_do_checkpoint(planilha):
+    """(aba, linha) gravados na etapa "planilha" de uma execução anterior."""
+    if not planilha:
+        return {}
+    return {"aba": planilha.get("aba"), "linha": planilha.get("row_idx")}
+
+
+def _concluir_etapa(tarefa, etapa, dados=None):
+    """Registra a etapa no estado para que uma execução interrompida retome dali."""
+    estado.registrar_etapa(tarefa["bidding_id"], etapa, dados)
+    tarefa["etapas"][etapa] = dados or {}
+
+
+def _etapa_download(tarefa):
+    item = tarefa["item"]
+
+    baixado = tarefa["etapas"].get(estado.ETAPA_BAIXADO)
+    if baixado and all(os.path.exists(a) for a in baixado["arquivos"]):
+        tarefa["arquivos_edital"] = list(baixado["arquivos"])
+        return True
+
+    for arquivo in item.get("edicts", []):
+        if arquivo.get("filename", "").lower() == "edital.zip":
+            tarefa["arquivos_edital"] = baixar_edital_por_json(
+                tarefa["sessao"], tarefa["boletim_id"], tarefa["bidding_id"], arquivo
+            )
+            break
+
+    if tarefa["arquivos_edital"]:
+        _concluir_etapa(tarefa, estado.ETAPA_BAIXADO, {"arquivos": tarefa["arquivos_edital"]})
+    return True
+
+
+def _etapa_ia(tarefa):
+    bidding_id = tarefa["bidding_id"]
+    stats = tarefa["stats"]
+
+    pdf_principal = next(
+        (a for a in tarefa["arquivos_edital"] if a.lower().endswith(".pdf")),
+        None
+    )
+
+    if not pdf_principal:
+        log_message("WARNING", f"Nenhum PDF encontrado para bidding {bidding_id}")
+        return True
+
+    analisado = tarefa["etapas"].get(estado.ETAPA_ANALISADO)
+    if analisado:
+        tarefa["texto_ia"] = analisado["texto_ia"]
+        tarefa["status_ia"] = analisado["status_ia"]
+        log_message("INFO", f"Bidding {bidding_id} já analisado em execução anterior - Status: {analisado['status_ia']}")
+        return True
+
+    _min = 1 if tarefa["eh_tele"] else 800
+    digest = artefatos.digest_de(pdf_principal)
+    texto_ia, status_ia, tokens_ia = gemini_queue.processar(
+        pdf_principal, montar_prompt_gemini(), min_chars=_min, hash_arquivo=digest["md5"]
+    )
+    log_message("INFO", f"Gemini retornou - Status: {status_ia} | Chars: {len(texto_ia or '')}")
+
+    tarefa["texto_ia"] = texto_ia
+    tarefa["status_ia"] = status_ia
+    if status_ia in ("SIM", "NAO"):
+        _concluir_etapa(tarefa, estado.ETAPA_ANALISADO, {"texto_ia": texto_ia, "status_ia": status_ia})
+
+    with tarefa["stats_lock"]:
+        stats["tokens_entrada"] += tokens_ia["prompt_tokens"]
+        stats["tokens_entrada_cache"] += tokens_ia["cached_tokens"]
+        stats["tokens_saida"] += tokens_ia["output_tokens"]
+        if tokens_ia["cache_hit"]:
+            stats["cache_hits"] += 1
+        if tokens_ia.get("paginas_total"):
+            stats["tokens_economizados_recorte"] += tokens_ia["tokens_economizados"]
+            stats["recorte_por_edital"].append({
+                "bidding_id": bidding_id,
+                "paginas_total": tokens_ia["paginas_total"],
+                "paginas_enviadas": tokens_ia["paginas_enviadas"],
+                "tokens_economizados": tokens_ia["tokens_economizados"],
+            })
+
+    return True
+
+
+_pastas_tipo = {}
+_pastas_tipo_lock = threading.Lock()
+
+
+def _pasta_tipo(nome):
+    """Pasta APROVADOS/REPROVADOS, resolvida uma vez para evitar duplicatas entre workers."""
+    with _pastas_tipo_lock:
+        if nome not in _pastas_tipo:
+            _pastas_tipo[nome] = criar_pasta(nome, SHARED_DRIVE_ID)
+        return _pastas_tipo[nome]
+
+
+def _etapa_drive(tarefa):
+    bidding_id = tarefa["bidding_id"]
+    boletim_id = tarefa["boletim_id"]
+    status_ia = tarefa["status_ia"]
+    texto_ia = tarefa["texto_ia"]
+    arquivos_edital = tarefa["arquivos_edital"]
+
+    if status_ia not in ["SIM", "NAO"]:
+        log_message("WARNING", f"IA falhou para {bidding_id}, upload ignorado.")
+        return True
+
+    enviado = tarefa["etapas"].get(estado.ETAPA_ENVIADO_DRIVE)
+    if enviado:
+        tarefa["link_drive"] = enviado["link_drive"]
+        tarefa["link_txt"] = enviado["link_txt"]
+        return True
+
+    # Pasta e arquivos já enviados numa execução interrompida são reaproveitados
+    progresso = tarefa["etapas"].get(estado.ETAPA_PASTA_DRIVE) or {}
+    enviados = dict(progresso.get("arquivos") or {})
+    pasta_id = progresso.get("pasta_id")
+
+    if not pasta_id:
+        pasta_tipo_id = _pasta_tipo("APROVADOS" if status_ia == "SIM" else "REPROVADOS")
+        nome_pasta = montar_nome_pasta(tarefa["item"])
+        pasta_id = criar_pasta(nome_pasta, pasta_tipo_id)
+        _concluir_etapa(tarefa, estado.ETAPA_PASTA_DRIVE, {"pasta_id": pasta_id, "arquivos": enviados})
+
+    # Gera TXT com resposta do Gemini e adiciona à lista de upload
+    if texto_ia:
+        caminho_txt = pathlib.Path("downloads") / str(boletim_id) / str(bidding_id) / "resumo_gemini.txt"
+        caminho_txt.parent.mkdir(parents=True, exist_ok=True)
+        with open(caminho_txt, "w", encoding="utf-8") as f:
+            f.write(texto_ia)
+        arquivos_edital.append(str(caminho_txt))
+
+    # Upload de todos os arquivos (edital + TXT)
+    file_id_txt = None
+
+    for arquivo in arquivos_edital:
+
+        # 🔥 evita erro de arquivo inválido
+        if not arquivo or "?" in arquivo:
+            log_message("WARNING", f"Arquivo inválido ignorado: {arquivo}")
+            continue
+
+        if not os.path.exists(arquivo):
+            log_message("WARNING", f"Arquivo não encontrado: {arquivo}")
+            continue
+
+        if arquivo in enviados:
+            file_id = enviados[arquivo]
+        elif arquivo.endswith("resumo_gemini.txt"):
+            file_id = upload_arquivo_para_pasta(arquivo, pasta_id)
+        else:
+            # Mesmo conteúdo já enviado antes (outra licitação/boletim): cópia no Drive
+            sha256 = artefatos.digest_de(arquivo)["sha256"]
+            file_id = upload_arquivo_para_pasta(arquivo, pasta_id, copiar_de=estado.drive_id_de(sha256))
+            estado.registrar_drive(sha256, file_id)
+
+        if file_id and arquivo not in enviados:
+            enviados[arquivo] = file_id
+            _concluir_etapa(tarefa, estado.ETAPA_PASTA_DRIVE, {"pasta_id": pasta_id, "arquivos": enviados})
+
+        if arquivo.endswith("resumo_gemini.txt"):
+            file_id_txt = file_id
+
+    # Link direto para o TXT no Drive
+    if file_id_txt:
+        tarefa["link_txt"] = f"https://drive.google.com/file/d/{file_id_txt}/view"
+
+    tarefa["link_drive"] = f"https://drive.google.com/drive/folders/{pasta_id}"
+    _concluir_etapa(tarefa, estado.ETAPA_ENVIADO_DRIVE, {
+        "pasta_id": pasta_id,
+        "link_drive": tarefa["link_drive"],
+        "link_txt": tarefa["link_txt"],
+        "arquivos": enviados,
+    })
+    return True
+
+
+def _etapa_registro(tarefa):
+    item = tarefa["item"]
+    bidding_id = tarefa["bidding_id"]
+    boletim_id = tarefa["boletim_id"]
+    eh_tele = tarefa["eh_tele"]
+    status_ia = tarefa["status_ia"]
+    link_drive = tarefa["link_drive"]
+    spreadsheet = tarefa["spreadsheet"]
+    stats = tarefa["stats"]
+
+    _obs = item.get("observacao") or ""
+    _modo_match = re.search(r"MODO DE DISPUTA:\s*(\S+)", _obs, re.IGNORECASE)
+
+    licitacao_dados = {
+        "boletim_id": boletim_id,
+        "boletim_titulo": tarefa["boletim_titulo"],
+        "bidding_id": bidding_id,
+        "idconlicitacao": bidding_id,
+        "orgao_cidade": item.get("orgao_cidade"),
+        "orgao_estado": item.get("orgao_estado"),
+        "orgao_nome": (item.get("public_body") or {}).get("nome") or "",
+        "edital": item.get("edital"),
+        "edital_site": item.get("edital_site"),
+        "itens": item.get("itens"),
+        "descricao": item.get("descricao"),
+        "objeto": item.get("objeto"),
+        "valor_estimado": item.get("valor_estimado"),
+        "datahora_abertura": item.get("datahora_abertura"),
+        "datahora_prazo": item.get("datahora_prazo"),
+        "status_ia": "SIM" if eh_tele else status_ia,
+        "link_drive": link_drive,
+        "link_drive_edital": link_drive,
+        "link_txt": tarefa["link_txt"],
+        "resumo_ia": tarefa["texto_ia"],
+        "modalidade": (item.get("modality") or {}).get("nome") or "",
+        "modo_disputa": _modo_match.group(1).upper() if _modo_match else "",
+        "deal_id_pipedrive": None,
+    }
+
+    if eh_tele and status_ia != "SIM":
+        status_ia = "SIM"
+        log_message("INFO", f"Bidding {bidding_id} [TELEMEDICINA] forçado APROVADO")
+
+    escritor = tarefa["escritor"]
+    tarefa["licitacao_dados"] = licitacao_dados
+
+    # Texto completo fica no estado local; a planilha pode guardar só o trecho
+    if tarefa["texto_ia"]:
+        estado.registrar_resumo(bidding_id, tarefa["texto_ia"], tarefa["link_txt"])
+
+    planilha = tarefa["etapas"].get(estado.ETAPA_PLANILHA)
+    if planilha:
+        inserido = True
+    else:
+        # Linha vai para o buffer; checkpoint e etapa "planilha" são gravados
+        # em _linha_gravada, quando o append_rows confirmar a escrita
+        inserido, _ = inserir_boletim_google_sheets(
+            spreadsheet, licitacao_dados, tarefa["ids_existentes"], escritor, tarefa
+        )
+
+    pipedrive = tarefa["etapas"].get(estado.ETAPA_PIPEDRIVE)
+    if pipedrive:
+        licitacao_dados["deal_id_pipedrive"] = pipedrive["deal_id"]
+        if not planilha:
+            escritor.marcar_importado(bidding_id)
+
+    importar_pip = status_ia == "SIM"
+    if inserido and importar_pip and not pipedrive:
+        try:
+            deal_id_pip = importar_deal_unico(licitacao_dados)
+            if deal_id_pip:
+                _concluir_etapa(tarefa, estado.ETAPA_PIPEDRIVE, {"deal_id": deal_id_pip})
+                licitacao_dados["deal_id_pipedrive"] = deal_id_pip
+                # Linha gravada numa execução anterior: o buffer só a conhece pelo checkpoint
+                escritor.marcar_importado(bidding_id, **_linha_do_checkpoint(planilha))
+                log_message("INFO", f"Deal Pipedrive criado inline: {deal_id_pip}"
+                            + (" [TELEMEDICINA]" if eh_tele else ""))
+        except Exception as e:
+            log_message("ERROR", f"Falha importacao inline {bidding_id}: {type(e).__name__}: {e}")
+
+    licitacao_dados["termo_match"] = tarefa["termo"]
+
+    with tarefa["stats_lock"]:
+        stats["licitacoes_coletadas"] += 1
+        if status_ia == "SIM":
+            stats["licitacoes_aprovadas"] += 1
+        elif status_ia == "ERRO":
+            stats["licitacoes_erro_ia"] += 1
+        else:
+            stats["licitacoes_reprovadas"] += 1
+
+    tarefa["resultado"] = licitacao_dados
+    return True
+
+
+def coletar_licitacoes(context, boletins, boletins_info=None, sessao=None):
     if boletins_info is None:
         boletins_info = {}
 
-    resultados = []
     spreadsheet = conectar_google_sheets()
     ids_existentes = obter_ids_existentes(spreadsheet)
     licitacoes_processadas = carregar_licitacoes_processadas()
@@ -794,265 +1507,210 @@ def coletar_licitacoes(context, boletins, boletins_info=None):
         "licitacoes_reprovadas": 0,
         "licitacoes_erro_ia": 0,
         "tokens_entrada": 0,
+        "tokens_entrada_cache": 0,
         "tokens_saida": 0,
         "cache_hits": 0,
+        "tokens_economizados_recorte": 0,
+        "recorte_por_edital": [],
         "custo_estimado_usd": 0.0,
     }
+    stats_lock = threading.Lock()
 
-    for idx, boletim_id in enumerate(boletins, start=1):
-
-        log_message("INFO", f"=== Boletim {idx}/{len(boletins)} — ID {boletim_id} ===")
-
-        ativar_boletim_html(context, boletim_id)
+    # Resultados indexados pela ordem de chegada para devolver na ordem original
+    resultados = {}
+    ordem = 0
 
-        session = requests.Session()
-        for c in context.cookies():
-            session.cookies.set(c["name"], c["value"], domain=c.get("domain"))
+    # Sessão criada aqui é fechada aqui (pool de conexões do requests)
+    sessao_propria = sessao is None
+    if sessao_propria:
+        sessao = SessaoPortal(context.cookies, cache=CacheHTTP())
 
-        biddings = []
-        pagina = 1
-        while True:
-            url_pag = f"{BIDDINGS_API.format(boletim_id)}?page={pagina}&per_page={BIDDINGS_PER_PAGE}"
-            try:
-                resp = session.get(url_pag, timeout=60)
-            except requests.exceptions.Timeout:
-                log_message("WARNING", f"Timeout boletim {boletim_id} página {pagina} — parando paginação")
-                break
-            except requests.exceptions.RequestException as e:
-                log_message("WARNING", f"Erro de rede boletim {boletim_id} página {pagina}: {e} — parando")
-                break
-
-            if resp.status_code != 200:
-                log_message("WARNING", f"API falhou {boletim_id} p{pagina} (status {resp.status_code})")
-                break
-
-            try:
-                dados_json = resp.json()
-            except Exception:
-                log_message("ERROR", f"Resposta inválida {boletim_id} p{pagina}: {resp.text[:200]}")
-                break
-
-            pagina_biddings = dados_json.get("biddings", [])
-            biddings.extend(pagina_biddings)
-
-            log_message("INFO", f"Boletim {boletim_id} — página {pagina}: {len(pagina_biddings)} biddings")
-
-            # Para quando vier menos que o tamanho da página (última página)
-            if len(pagina_biddings) < BIDDINGS_PER_PAGE:
-                break
-            pagina += 1
-
-        log_message("INFO", f"Boletim {boletim_id} — total: {len(biddings)} biddings em {pagina} página(s)")
-
-        for item in biddings:
+    try:
+        # Ativa todos os boletins antes para que a paginação rode em paralelo
+        ativar_boletins(sessao, context, boletins)
 
-            if MODO_TESTE and contador_teste >= TESTE_LIMITE:
-                log_message("INFO", "Modo teste ativo - encerrando")
-                stats["custo_estimado_usd"] = round(
-                    tokens_para_custo_usd(stats["tokens_entrada"], stats["tokens_saida"]), 6
-                )
-                return resultados, stats
+        biddings_por_boletim = buscar_biddings_boletins(sessao, boletins)
+    except Exception:
+        if sessao_propria:
+            sessao.close()
+        raise
+
+    escritor = EscritorPlanilha(spreadsheet, ao_gravar=_linha_gravada)
+    controle = _ControleBoletins(boletins, antes_do_checkpoint=escritor.descarregar)
+
+    def _ao_concluir(tarefa):
+        if tarefa.get("resultado") is not None:
+            resultados[tarefa["ordem"]] = tarefa["resultado"]
+        controle.concluir(tarefa["boletim_id"])
+
+    def _ao_falhar(tarefa, etapa, erro):
+        log_message("ERROR", f"Bidding {tarefa['bidding_id']} falhou na etapa {etapa}: "
+                             f"{type(erro).__name__}: {erro}")
+        controle.concluir(tarefa["boletim_id"], sucesso=False)
+
+    esteira = Esteira(
+        [
+            Etapa("download", _etapa_download, PIPELINE_WORKERS["download"], PIPELINE_TAMANHO_FILA),
+            Etapa("ia", _etapa_ia, PIPELINE_WORKERS["ia"], PIPELINE_TAMANHO_FILA),
+            Etapa("drive", _etapa_drive, PIPELINE_WORKERS["drive"], PIPELINE_TAMANHO_FILA),
+            Etapa("registro", _etapa_registro, PIPELINE_WORKERS["registro"], PIPELINE_TAMANHO_FILA),
+        ],
+        ao_concluir=_ao_concluir,
+        ao_falhar=_ao_falhar,
+        ao_aguardar=sessao.atender_renovacao,
+    )
+    esteira.iniciar()
 
-            bidding_id = item.get("bidding_id")
-            bidding_id_str = str(bidding_id).strip()
+    encerrar = False
 
-            if bidding_id_str in ids_existentes or bidding_id_str in licitacoes_processadas:
-                log_message("INFO", f"Bidding {bidding_id} ja processado, pulando")
-                resultados.append({
-                    "boletim_id": boletim_id,
-                    "bidding_id": bidding_id,
-                    "skipped": True
-                })
-                continue
+    try:
+        for idx, boletim_id in enumerate(boletins, start=1):
 
-            arquivos_edital = []
+            log_message("INFO", f"=== Boletim {idx}/{len(boletins)} — ID {boletim_id} ===")
 
-            # --------------------------------------------
-            # FILTRO POR PALAVRAS-CHAVE (antes do download)
-            # --------------------------------------------
-            # FILTRO POR PALAVRAS-CHAVE (antes do download)
-            # --------------------------------------------
-            _edital_txt = item.get("edital", "")
-            _descr_txt  = item.get("descricao", "")
-            _itens_txt  = item.get("itens", "") + " " + (item.get("objeto", "") or "")
+            biddings = biddings_por_boletim.get(boletim_id, [])
 
-            termo = motivo_match(_edital_txt, _descr_txt, _itens_txt)
-            if not termo:
-                log_message("INFO", f"Bidding {bidding_id} fora do escopo de saúde — ignorado")
-                continue
+            for item in biddings:
 
-            eh_tele = licitacao_telemedicina(_edital_txt, _descr_txt, _itens_txt)
+                if MODO_TESTE and contador_teste >= TESTE_LIMITE:
+                    log_message("INFO", "Modo teste ativo - encerrando")
+                    encerrar = True
+                    break
 
-            # Telemedicina: qualquer valor. Demais: >= R$ 1.200.000
-            if not eh_tele:
-                valor = float(item.get("valor_estimado") or 0)
-                if valor < VALOR_MINIMO:
-                    log_message("INFO", f"Bidding {bidding_id} valor R$ {valor:,.0f} < R$ 1.200.000 — ignorado")
+                bidding_id = item.get("bidding_id")
+                bidding_id_str = str(bidding_id).strip()
+
+                if bidding_id_str in ids_existentes or bidding_id_str in licitacoes_processadas:
+                    log_message("INFO", f"Bidding {bidding_id} ja processado, pulando")
+                    resultados[ordem] = {
+                        "boletim_id": boletim_id,
+                        "bidding_id": bidding_id,
+                        "skipped": True
+                    }
+                    ordem += 1
                     continue
 
-            log_message("INFO", f"Bidding {bidding_id} relevante — termo: '{termo}'"
-                        + (" [TELEMEDICINA]" if eh_tele else f" [R$ {float(item.get('valor_estimado') or 0):,.0f}]"))
-
-            # --------------------------------------------
-            # DOWNLOAD DO EDITAL
-            # --------------------------------------------
-            for arquivo in item.get("edicts", []):
-                if arquivo.get("filename", "").lower() == "edital.zip":
-                    arquivos_edital = baixar_edital_por_json(
-                        context, boletim_id, bidding_id, arquivo
-                    )
-                    break
-
-            # --------------------------------------------
-            # PROCESSAMENTO IA
-            # --------------------------------------------
-            # Inicializa sempre para evitar NameError
-            texto_ia = ""
-            status_ia = "NAO"
+                # --------------------------------------------
+                # FILTRO POR PALAVRAS-CHAVE (antes do download)
+                # --------------------------------------------
+                analise = analisar(*textos_bidding(item))
 
-            pdf_principal = next(
-                (a for a in arquivos_edital if a.lower().endswith(".pdf")),
-                None
-            )
+                termo = analise.motivo
+                if not termo:
+                    log_message("INFO", f"Bidding {bidding_id} fora do escopo de saúde — ignorado")
+                    continue
 
-            if pdf_principal:
-                _min = 1 if eh_tele else 800
-                texto_ia, status_ia, tokens_ia = gemini_queue.processar(pdf_principal, montar_prompt_gemini(), min_chars=_min)
-                log_message("INFO", f"Gemini retornou - Status: {status_ia} | Chars: {len(texto_ia or '')}")
-
-                stats["tokens_entrada"] += tokens_ia["prompt_tokens"]
-                stats["tokens_saida"] += tokens_ia["output_tokens"]
-                if tokens_ia["cache_hit"]:
-                    stats["cache_hits"] += 1
-            else:
-                log_message("WARNING", f"Nenhum PDF encontrado para bidding {bidding_id}")
-
-            # --------------------------------------------
-            # DRIVE
-            # --------------------------------------------
-            link_drive = ""
-            link_txt = ""
-
-            if status_ia in ["SIM", "NAO"]:
-
-                if status_ia == "SIM":
-                    pasta_tipo_id = criar_pasta("APROVADOS", SHARED_DRIVE_ID)
-                else:
-                    pasta_tipo_id = criar_pasta("REPROVADOS", SHARED_DRIVE_ID)
-
-                nome_pasta = montar_nome_pasta(item)
-                pasta_id = criar_pasta(nome_pasta, pasta_tipo_id)
-
-                # Gera TXT com resposta do Gemini e adiciona à lista de upload
-                if texto_ia:
-                    caminho_txt = pathlib.Path("downloads") / str(boletim_id) / str(bidding_id) / "resumo_gemini.txt"
-                    caminho_txt.parent.mkdir(parents=True, exist_ok=True)
-                    with open(caminho_txt, "w", encoding="utf-8") as f:
-                        f.write(texto_ia)
-                    arquivos_edital.append(str(caminho_txt))
-
-                # Upload de todos os arquivos (edital + TXT)
-                file_id_txt = None
-
-                for arquivo in arquivos_edital:
-
-                    # 🔥 evita erro de arquivo inválido
-                    if not arquivo or "?" in arquivo:
-                        log_message("WARNING", f"Arquivo inválido ignorado: {arquivo}")
-                        continue
+                eh_tele = analise.telemedicina
 
-                    if not os.path.exists(arquivo):
-                        log_message("WARNING", f"Arquivo não encontrado: {arquivo}")
+                # Telemedicina: qualquer valor. Demais: >= R$ 1.200.000
+                if not eh_tele:
+                    valor = float(item.get("valor_estimado") or 0)
+                    if valor < VALOR_MINIMO:
+                        log_message("INFO", f"Bidding {bidding_id} valor R$ {valor:,.0f} < R$ 1.200.000 — ignorado")
                         continue
 
-                    file_id = upload_arquivo_para_pasta(arquivo, pasta_id)
+                log_message("INFO", f"Bidding {bidding_id} relevante — termo: '{termo}'"
+                            + (" [TELEMEDICINA]" if eh_tele else f" [R$ {float(item.get('valor_estimado') or 0):,.0f}]"))
 
-                    if arquivo.endswith("resumo_gemini.txt"):
-                        file_id_txt = file_id
+                # Etapas concluídas numa execução interrompida não são refeitas
+                etapas = estado.etapas_concluidas(bidding_id)
+                if etapas:
+                    log_message("INFO", f"Bidding {bidding_id} retomado — etapas concluídas: {', '.join(sorted(etapas))}")
 
-                # Link direto para o TXT no Drive
-                if file_id_txt:
-                    link_txt = f"https://drive.google.com/file/d/{file_id_txt}/view"
-
-                link_drive = f"https://drive.google.com/drive/folders/{pasta_id}"
+                controle.adicionar(boletim_id)
+                esteira.enviar({
+                    "ordem": ordem,
+                    "boletim_id": boletim_id,
+                    "boletim_titulo": boletins_info.get(boletim_id, ""),
+                    "bidding_id": bidding_id,
+                    "item": item,
+                    "termo": termo,
+                    "eh_tele": eh_tele,
+                    "arquivos_edital": [],
+                    # Inicializa sempre para evitar KeyError nas etapas seguintes
+                    "texto_ia": "",
+                    "status_ia": "NAO",
+                    "link_drive": "",
+                    "link_txt": "",
+                    "etapas": etapas,
+                    "sessao": sessao,
+                    "spreadsheet": spreadsheet,
+                    "escritor": escritor,
+                    "ids_existentes": ids_existentes,
+                    "licitacoes_processadas": licitacoes_processadas,
+                    "stats": stats,
+                    "stats_lock": stats_lock,
+                })
+                ordem += 1
+                contador_teste += 1
 
-            else:
-                log_message("WARNING", f"IA falhou para {bidding_id}, upload ignorado.")
+            if encerrar:
+                break
 
-            _obs = item.get("observacao") or ""
-            _modo_match = re.search(r"MODO DE DISPUTA:\s*(\S+)", _obs, re.IGNORECASE)
+            # Checkpoint é salvo quando todas as licitações do boletim saírem da esteira
+            controle.fechar(boletim_id)
 
-            licitacao_dados = {
-                "boletim_id": boletim_id,
-                "boletim_titulo": boletins_info.get(boletim_id, ""),
-                "bidding_id": bidding_id,
-                "idconlicitacao": bidding_id,
-                "orgao_cidade": item.get("orgao_cidade"),
-                "orgao_estado": item.get("orgao_estado"),
-                "orgao_nome": (item.get("public_body") or {}).get("nome") or "",
-                "edital": item.get("edital"),
-                "edital_site": item.get("edital_site"),
-                "itens": item.get("itens"),
-                "descricao": item.get("descricao"),
-                "objeto": item.get("objeto"),
-                "valor_estimado": item.get("valor_estimado"),
-                "datahora_abertura": item.get("datahora_abertura"),
-                "datahora_prazo": item.get("datahora_prazo"),
-                "status_ia": "SIM" if eh_tele else status_ia,
-                "link_drive": link_drive,
-                "link_drive_edital": link_drive,
-                "link_txt": link_txt,
-                "resumo_ia": texto_ia,
-                "modalidade": (item.get("modality") or {}).get("nome") or "",
-                "modo_disputa": _modo_match.group(1).upper() if _modo_match else "",
-                "deal_id_pipedrive": None,
-            }
-
-            if eh_tele and status_ia != "SIM":
-                status_ia = "SIM"
-                log_message("INFO", f"Bidding {bidding_id} [TELEMEDICINA] forçado APROVADO")
-
-            inserido, row_idx = inserir_boletim_google_sheets(spreadsheet, licitacao_dados, ids_existentes)
-
-            importar_pip = status_ia == "SIM"
-            if inserido and importar_pip:
-                try:
-                    deal_id_pip = importar_deal_unico(licitacao_dados)
-                    if deal_id_pip:
-                        licitacao_dados["deal_id_pipedrive"] = deal_id_pip
-                        if row_idx:
-                            spreadsheet.worksheet(SHEET_APROVADOS).update_cell(row_idx, 15, "TRUE")
-                        log_message("INFO", f"Deal Pipedrive criado inline: {deal_id_pip}"
-                                    + (" [TELEMEDICINA]" if eh_tele else ""))
-                except Exception as e:
-                    log_message("ERROR", f"Falha importacao inline {bidding_id}: {type(e).__name__}: {e}")
-
-            if inserido:
-                salvar_licitacao_processada(bidding_id, licitacao_dados)
-                licitacoes_processadas[bidding_id_str] = licitacao_dados
-
-            licitacao_dados["termo_match"] = termo
-
-            stats["licitacoes_coletadas"] += 1
-            if status_ia == "SIM":
-                stats["licitacoes_aprovadas"] += 1
-            elif status_ia == "ERRO":
-                stats["licitacoes_erro_ia"] += 1
-            else:
-                stats["licitacoes_reprovadas"] += 1
-
-            resultados.append(licitacao_dados)
-            contador_teste += 1
-
-        # Salva checkpoint após cada boletim completo
-        salvar_ultimo_boletim(boletim_id)
-        log_message("INFO", f"Checkpoint salvo: boletim {boletim_id}")
-
-    stats["custo_estimado_usd"] = round(
-        tokens_para_custo_usd(stats["tokens_entrada"], stats["tokens_saida"]), 6
-    )
+    finally:
+        esteira.finalizar()
+        # Nenhuma análise em voo depois da esteira: encerra o event loop do motor
+        gemini_queue.fechar()
 
-    return resultados, stats
+        try:
+            escritor.descarregar()
+        except Exception as e:
+            log_message("ERROR", f"Falha ao gravar linhas pendentes na planilha: {type(e).__name__}: {e}")
+        controle.avancar()
+        stats["sheets_chamadas"] = escritor.chamadas_api
+        log_message("INFO", f"Google Sheets: {escritor.chamadas_api} chamada(s) de escrita/metadados")
+
+        stats["gemini_espera_ritmo_s"] = round(gemini_ritmo.governador.espera_total, 1)
+        stats["gemini_limites_429"] = gemini_ritmo.governador.limites_atingidos
+        log_message("INFO", f"Ritmo Gemini: {stats['gemini_espera_ritmo_s']}s aguardando cota, "
+                            f"{stats['gemini_limites_429']} limite(s) 429")
+        stats["gemini_cache_hits"] = cache_gemini.hits
+        stats["gemini_cache_hits_tolerantes"] = cache_gemini.hits_tolerantes
+        stats["gemini_cache_misses"] = cache_gemini.misses
+        stats["gemini_cache_bytes_lidos"] = cache_gemini.bytes_lidos
+        stats["gemini_cache_bytes_gravados"] = cache_gemini.bytes_gravados
+        log_message("INFO", f"Cache Gemini: {cache_gemini.hits} hit(s) "
+                            f"({cache_gemini.hits_tolerantes} por memória parecida), {cache_gemini.misses} miss(es)")
+        stats["gemini_contextos_criados"] = gemini_contextos.criados
+        if gemini_contextos.criados:
+            try:
+                gemini_contextos.liberar(obter_cliente())
+            except Exception as e:
+                log_message("WARNING", f"Falha ao liberar contextos do Gemini: {type(e).__name__}: {e}")
+        log_message("INFO", f"Contexto Gemini: {gemini_contextos.criados} criado(s), "
+                            f"{stats['tokens_entrada_cache']} tokens de entrada lidos do cache")
+        stats["gemini_uploads"] = gemini_arquivos.enviados
+        stats["gemini_upload_mb"] = round(gemini_arquivos.bytes_enviados / (1024 * 1024), 2)
+        stats["gemini_uploads_reaproveitados"] = gemini_arquivos.reaproveitados
+        if gemini_arquivos.enviados:
+            try:
+                gemini_arquivos.liberar_todos(obter_cliente())
+            except Exception as e:
+                log_message("WARNING", f"Falha ao remover uploads do Gemini: {type(e).__name__}: {e}")
+            log_message("INFO", f"Uploads Gemini: {gemini_arquivos.enviados} documento(s), "
+                                f"{stats['gemini_upload_mb']} MB, reaproveitados em {gemini_arquivos.reaproveitados} tentativa(s)")
+        stats["custo_estimado_usd"] = round(
+            tokens_para_custo_usd(stats["tokens_entrada"], stats["tokens_saida"], stats["tokens_entrada_cache"]), 6
+        )
+        recortados = sum(1 for r in stats["recorte_por_edital"] if r["paginas_enviadas"] < r["paginas_total"])
+        log_message("INFO", f"Recorte de PDF: {recortados}/{len(stats['recorte_por_edital'])} edital(is) recortado(s), "
+                            f"~{stats['tokens_economizados_recorte']} tokens de entrada economizados")
+        stats["portal_requisicoes"] = sessao.requisicoes
+        stats["portal_conexoes"] = sessao.conexoes_abertas()
+        log_message("INFO", f"Sessão portal: {stats['portal_requisicoes']} requisições "
+                            f"em {stats['portal_conexoes']} conexão(ões)")
+        if sessao.cache is not None:
+            stats["portal_cache_hits"] = sessao.cache.hits
+            stats["portal_cache_mb_economizados"] = round(sessao.cache.bytes_economizados / (1024 * 1024), 2)
+            log_message("INFO", f"Cache HTTP: {sessao.cache.hits} resposta(s) 304 servidas do disco "
+                                f"({stats['portal_cache_mb_economizados']} MB não baixados)")
+        if sessao_propria:
+            sessao.close()
+
+    return [resultados[k] for k in sorted(resultados)], stats
 
 # =====================================================
 # MAIN
@@ -1064,9 +1722,10 @@ def main():
     ultimo = carregar_ultimo_boletim()
 
     p, browser, context = criar_browser_autenticado()
+    sessao = SessaoPortal(context.cookies, lambda: cookies_autenticados(context), cache=CacheHTTP())
 
     try:
-        boletins, boletins_info = extrair_boletins(context)
+        boletins, boletins_info = extrair_boletins(context, sessao)
         novos = sorted([b for b in boletins if b > ultimo])
 
         log_message("INFO", f"Último salvo: {ultimo}")
@@ -1076,7 +1735,7 @@ def main():
             log_message("INFO", "Nenhum boletim novo encontrado")
             return
 
-        dados, stats = coletar_licitacoes(context, novos, boletins_info)
+        dados, stats = coletar_licitacoes(context, novos, boletins_info, sessao)
 
         if dados:
             salvar_relatorio_coleta(stats)
@@ -1098,7 +1757,16 @@ def main():
         except Exception as e:
             log_message("ERROR", f"Falha ao processar feedbacks: {type(e).__name__}: {e}")
 
+        # Mantém as abas vivas pequenas (ARQUIVAR_APOS_COLETA=1)
+        if arquivamento.ARQUIVAR_APOS_COLETA:
+            try:
+                arquivados = arquivamento.executar()
+                log_message("INFO", f"Arquivamento da planilha: {arquivados}")
+            except Exception as e:
+                log_message("ERROR", f"Falha no arquivamento da planilha: {type(e).__name__}: {e}")
+
     finally:
+        sessao.close()
         browser.close()
         p.stop()
 
@@ -1,11 +1,16 @@
 import os
 import re
+import sys
 import requests
 from datetime import datetime
 import gspread
 from google.oauth2.service_account import Credentials
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services import espelho_planilha, resumos, sheets_update_service
+
 load_dotenv()
 
 # =========================
@@ -142,16 +147,20 @@ def conectar_sheet():
 
 
 def ler_dados(sheet):
-    rows = sheet.get_all_values()
-    if len(rows) < 2:
-        return []
-    headers = rows[0]
-    return [dict(zip(headers, row)) for row in rows[1:]]
+    """Registros da aba em ordem de linha, a partir do espelho local (só relê
+    a planilha se ela mudou desde a última sincronização)."""
+    espelho_planilha.sincronizar(sheet.spreadsheet, (ABA,))
+    return espelho_planilha.linhas(ABA)
 
 
-def atualizar_flag_importado(sheet, row_index):
-    col_index = 15  # coluna "importado_pipedrive"
-    sheet.update_cell(row_index, col_index, "TRUE")
+def atualizar_flags_importado(sheet, bidding_ids):
+    """Marca importado_pipedrive=TRUE em várias licitações com um único batch_update."""
+    if not bidding_ids:
+        return
+    ausentes = sheets_update_service.indice(sheet).atualizar_status_lote(
+        {bidding_id: {"importado": "TRUE"} for bidding_id in bidding_ids}
+    )
+    print(f"importado_pipedrive marcado em {len(set(bidding_ids)) - len(ausentes)} linha(s)")
 
 
 # =========================
@@ -364,6 +373,8 @@ def importar_deal_unico(dados):
     # link_drive (interno) ↔ link_drive_edital (planilha)
     if not dados_norm.get("link_drive_edital"):
         dados_norm["link_drive_edital"] = dados_norm.get("link_drive", "")
+    # resumo_ia da planilha pode ser só o trecho (RESUMO_IA_PLANILHA=trecho)
+    dados_norm["resumo_ia"] = resumos.resumo_completo(dados_norm)
 
     bidding_id = str(dados_norm.get("idconlicitacao", "")).strip()
     if not bidding_id:
@@ -399,9 +410,21 @@ def importar_deal_unico(dados):
 
 def processar():
     sheet = conectar_sheet()
-    dados = ler_dados(sheet)
+    espelho_planilha.sincronizar(sheet.spreadsheet, (ABA,))
+    pendentes = espelho_planilha.aprovados_nao_importados()
+    print(f"{len(pendentes)} aprovado(s) sem importado_pipedrive")
+
+    # Flags acumuladas e gravadas num único batch_update no fim (ou se falhar no meio),
+    # pela linha atual de cada licitação no índice da aba
+    importados = []
+    try:
+        _processar_linhas(pendentes, importados)
+    finally:
+        atualizar_flags_importado(sheet, importados)
+
 
-    for i, linha in enumerate(dados, start=2):  # começa na linha 2
+def _processar_linhas(pendentes, importados):
+    for _, linha in pendentes:  # (linha da planilha, registro)
 
         print("\n====================")
         print("Edital:", linha.get("edital"))
@@ -420,10 +443,11 @@ def processar():
         existente = buscar_deal_existente(linha.get("idconlicitacao"))
         if existente:
             print("Já existe no Pipedrive:", existente)
-            atualizar_flag_importado(sheet, i)
+            importados.append(linha.get("idconlicitacao"))
             continue
 
-        # 4 - criar deal
+        # 4 - criar deal (título e nota usam o resumo completo)
+        linha["resumo_ia"] = resumos.resumo_completo(linha)
         criado = criar_deal(linha)
 
         if not criado.get("success"):
@@ -441,8 +465,8 @@ def processar():
         if linha.get("link_drive_edital"):
             criar_nota(deal_id, f"Pasta no Google Drive:\n{linha.get('link_drive_edital')}")
 
-        # 7 - marcar planilha
-        atualizar_flag_importado(sheet, i)
+        # 7 - marcar planilha (no batch final)
+        importados.append(linha.get("idconlicitacao"))
 
         print("FINALIZADO")
 
@@ -483,6 +507,7 @@ def testar_importacao(n=2):
         print(f"Modalidade      : {linha.get('modalidade') or '(vazio)'}")
         print(f"Modo Disputa    : {linha.get('modo_disputa') or '(vazio)'}")
 
+        linha["resumo_ia"] = resumos.resumo_completo(linha)
         existente = buscar_deal_existente(linha.get("idconlicitacao"))
 
         if existente:
@@ -0,0 +1,192 @@
+"""
+Benchmark e conferência (golden) do filtro de palavras-chave.
+
+Mede itens/s e latência p50/p99 por item de motivo_match,
+licitacao_telemedicina e licitacao_relevante sobre o corpus gravado, e
+compara os resultados com o golden: qualquer mudança de match é listada e
+o script sai com código 1.
+
+Uso:
+    python -m scripts.benchmark_filtro                  # benchmark + conferência
+    python -m scripts.benchmark_filtro --capturar       # adiciona itens reais do cache HTTP ao corpus
+    python -m scripts.benchmark_filtro --atualizar-golden
+
+O corpus inicial é sintético (campo "origem": "sintetico"). Itens
+capturados do cache HTTP das coletas (páginas biddings.json) entram com
+"origem": "cache_http".
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services.filtro_palavras import (
+    licitacao_relevante,
+    licitacao_telemedicina,
+    motivo_match,
+    textos_bidding,
+)
+from services.cache_http import CacheHTTP
+
+CORPUS_FILE = "benchmarks/filtro_corpus.jsonl"
+GOLDEN_FILE = "benchmarks/filtro_golden.json"
+CAMPOS = ("bidding_id", "edital", "descricao", "itens", "objeto")
+
+FUNCOES = {
+    "motivo_match": motivo_match,
+    "licitacao_telemedicina": licitacao_telemedicina,
+    "licitacao_relevante": licitacao_relevante,
+}
+
+
+# =========================
+# CORPUS
+# =========================
+
+def carregar_corpus():
+    if not os.path.exists(CORPUS_FILE):
+        return []
+    with open(CORPUS_FILE, "r", encoding="utf-8") as f:
+        return [json.loads(linha) for linha in f if linha.strip()]
+
+
+def capturar_do_cache(corpus):
+    """Acrescenta ao corpus os itens das páginas biddings.json do cache HTTP."""
+    conhecidos = {str(item["bidding_id"]) for item in corpus}
+    novos = []
+
+    for meta, caminho in CacheHTTP().entradas("biddings.json"):
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                biddings = json.load(f).get("biddings", [])
+        except Exception:
+            continue
+
+        for item in biddings:
+            bidding_id = str(item.get("bidding_id", "")).strip()
+            if not bidding_id or bidding_id in conhecidos:
+                continue
+            conhecidos.add(bidding_id)
+            registro = {campo: item.get(campo) or "" for campo in CAMPOS}
+            registro["origem"] = "cache_http"
+            novos.append(registro)
+
+    if novos:
+        os.makedirs(os.path.dirname(CORPUS_FILE), exist_ok=True)
+        with open(CORPUS_FILE, "a", encoding="utf-8") as f:
+            for registro in novos:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+    print(f"[CORPUS] {len(novos)} item(ns) capturado(s) do cache HTTP")
+    return corpus + novos
+
+
+# =========================
+# BENCHMARK
+# =========================
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+def medir(textos, repeticoes):
+    for nome, funcao in FUNCOES.items():
+        latencias = []
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            for edital, descricao, itens in textos:
+                t0 = time.perf_counter_ns()
+                funcao(edital, descricao, itens)
+                latencias.append(time.perf_counter_ns() - t0)
+        total = time.perf_counter() - inicio
+
+        print(
+            f"[BENCH] {nome:<24} {len(latencias) / total:>10,.0f} itens/s | "
+            f"p50 {_percentil(latencias, 50) / 1000:>7.1f} µs | "
+            f"p99 {_percentil(latencias, 99) / 1000:>7.1f} µs"
+        )
+
+
+# =========================
+# GOLDEN
+# =========================
+
+def resultados(corpus, textos):
+    return {
+        str(item["bidding_id"]): {nome: funcao(*t) for nome, funcao in FUNCOES.items()}
+        for item, t in zip(corpus, textos)
+    }
+
+
+def conferir_golden(atual):
+    if not os.path.exists(GOLDEN_FILE):
+        print(f"[GOLDEN] {GOLDEN_FILE} não existe — rode com --atualizar-golden")
+        return False
+
+    with open(GOLDEN_FILE, "r", encoding="utf-8") as f:
+        golden = json.load(f)
+
+    diferencas = 0
+    for bidding_id, esperado in golden.items():
+        obtido = atual.get(bidding_id)
+        if obtido is None:
+            continue
+        for nome, valor in esperado.items():
+            if obtido.get(nome) != valor:
+                diferencas += 1
+                print(f"[GOLDEN] {bidding_id} {nome}: esperado {valor!r}, obtido {obtido.get(nome)!r}")
+
+    sem_golden = len(set(atual) - set(golden))
+    if sem_golden:
+        print(f"[GOLDEN] {sem_golden} item(ns) do corpus sem resultado no golden (use --atualizar-golden)")
+
+    print(f"[GOLDEN] {len(golden)} item(ns) conferido(s), {diferencas} diferença(s)")
+    return diferencas == 0
+
+
+def atualizar_golden(atual):
+    with open(GOLDEN_FILE, "w", encoding="utf-8") as f:
+        json.dump(atual, f, indent=2, ensure_ascii=False, sort_keys=True)
+    print(f"[GOLDEN] {len(atual)} resultado(s) gravado(s) em {GOLDEN_FILE}")
+
+
+# =========================
+# MAIN
+# =========================
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark e golden do filtro de palavras-chave")
+    parser.add_argument("--capturar", action="store_true", help="acrescenta itens do cache HTTP ao corpus")
+    parser.add_argument("--atualizar-golden", action="store_true", help="regrava o golden com os resultados atuais")
+    parser.add_argument("--repeticoes", type=int, default=5, help="passadas sobre o corpus no benchmark")
+    args = parser.parse_args()
+
+    corpus = carregar_corpus()
+    if args.capturar:
+        corpus = capturar_do_cache(corpus)
+
+    if not corpus:
+        print(f"[CORPUS] {CORPUS_FILE} vazio")
+        return 1
+
+    textos = [textos_bidding(item) for item in corpus]
+    print(f"[CORPUS] {len(corpus)} item(ns), {args.repeticoes} repetição(ões)")
+
+    medir(textos, args.repeticoes)
+
+    atual = resultados(corpus, textos)
+    if args.atualizar_golden:
+        atualizar_golden(atual)
+        return 0
+
+    return 0 if conferir_golden(atual) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -16,6 +16,7 @@ import gspread
 from google.oauth2.service_account import Credentials
 from dotenv import load_dotenv
 
+from services import espelho_planilha
 from services.filtro_palavras import licitacao_telemedicina
 from inputData.inputDataPipedrive import importar_deal_unico
 
@@ -36,21 +37,17 @@ def _conectar():
 
 
 def _ler_aba(spreadsheet, aba):
-    sheet = spreadsheet.worksheet(aba)
-    rows  = sheet.get_all_values()
-    if len(rows) < 2:
-        return sheet, [], []
-    headers = rows[0]
-    dados   = [dict(zip(headers, row)) for row in rows[1:]]
-    return sheet, dados, rows
+    """Worksheet + registros da aba vindos do espelho local."""
+    return spreadsheet.worksheet(aba), espelho_planilha.linhas(aba)
 
 
 def recuperar():
     print("[RECUPERAR] Conectando à planilha...")
     spreadsheet = _conectar()
+    espelho_planilha.sincronizar(spreadsheet, ("reprovados", "aprovados"))
 
-    sheet_rep, reprovados, rows_rep = _ler_aba(spreadsheet, "reprovados")
-    sheet_apr, aprovados,  _        = _ler_aba(spreadsheet, "aprovados")
+    sheet_rep, reprovados = _ler_aba(spreadsheet, "reprovados")
+    sheet_apr, aprovados  = _ler_aba(spreadsheet, "aprovados")
 
     ids_aprovados = {r.get("idconlicitacao", "").strip() for r in aprovados}
 
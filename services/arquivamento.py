@@ -0,0 +1,213 @@
+import argparse
+import os
+from datetime import datetime, timedelta
+
+import gspread
+from google.oauth2.service_account import Credentials
+from dotenv import load_dotenv
+
+from services import espelho_planilha, estado, sheets_update_service
+
+load_dotenv()
+
+# Arquivamento das abas aprovados/reprovados: linhas antigas (ou já
+# encerradas) vão para abas mensais "<aba>_AAAA-MM", na própria planilha ou
+# numa planilha separada, e saem das abas vivas. Os IDs e os dados das
+# linhas movidas ficam em logs/estado.db (linhas_arquivadas) para o dedupe
+# e para a memória de feedbacks.
+SHEET_ID = os.getenv("GOOGLE_SHEET_ID")
+ARQUIVO_SHEET_ID = os.getenv("ARQUIVO_SHEET_ID")                  # vazio = mesma planilha
+HORIZONTE_DIAS = int(os.getenv("ARQUIVO_HORIZONTE_DIAS", "90"))
+ARQUIVAR_APOS_COLETA = os.getenv("ARQUIVAR_APOS_COLETA", "0") == "1"
+CREDENTIALS_FILE = "credentials/google_service_account.json"
+
+ABAS = espelho_planilha.ABAS
+CLASSIFICACOES_FINAIS = ("ouro", "prata", "bronze")
+
+_FORMATOS_DATA = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d", "%d/%m/%Y %H:%M:%S", "%d/%m/%Y")
+
+
+def _conectar(sheet_id):
+    scopes = [
+        "https://www.googleapis.com/auth/spreadsheets",
+        "https://www.googleapis.com/auth/drive",
+    ]
+    creds = Credentials.from_service_account_file(CREDENTIALS_FILE, scopes=scopes)
+    return gspread.authorize(creds).open_by_key(sheet_id)
+
+
+def _data_coleta(dados):
+    valor = str(dados.get("data_coleta") or "").strip()
+    for fmt in _FORMATOS_DATA:
+        try:
+            return datetime.strptime(valor, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+# =========================
+# CRITÉRIOS
+# =========================
+
+def _encerrada(dados, feedbacks):
+    """Importada no Pipedrive, com classificação final e feedback já aprendido."""
+    bidding_id = str(dados.get("idconlicitacao") or "").strip()
+    return (
+        str(dados.get("importado_pipedrive") or "").strip().lower() == "true"
+        and str(dados.get("classificacao") or "").strip().lower() in CLASSIFICACOES_FINAIS
+        and str(dados.get("feedback_qualitativo") or "").strip() != ""
+        and bidding_id in feedbacks
+    )
+
+
+def selecionar(registros, limite, feedbacks):
+    """[(linha, dados, mes)] a arquivar: coletadas antes de `limite` ou encerradas."""
+    selecionadas = []
+    for linha, dados in registros:
+        if not str(dados.get("idconlicitacao") or "").strip():
+            continue
+        coletada = _data_coleta(dados)
+        if (coletada and coletada < limite) or _encerrada(dados, feedbacks):
+            mes = coletada.strftime("%Y-%m") if coletada else "sem-data"
+            selecionadas.append((linha, dados, mes))
+    return selecionadas
+
+
+# =========================
+# DESTINO
+# =========================
+
+def _aba_arquivo(destino, nome, cabecalho):
+    try:
+        return destino.worksheet(nome)
+    except gspread.WorksheetNotFound:
+        sheet = destino.add_worksheet(title=nome, rows=1, cols=max(len(cabecalho), 1))
+        sheet.update([cabecalho], "A1")
+        print(f"[ARQUIVO] Aba {nome} criada")
+        return sheet
+
+
+def _faixas_decrescentes(linhas):
+    """Linhas (1-based) agrupadas em faixas contíguas, da última para a primeira."""
+    faixas = []
+    for linha in sorted(set(linhas)):
+        if faixas and faixas[-1][1] == linha - 1:
+            faixas[-1] = (faixas[-1][0], linha)
+        else:
+            faixas.append((linha, linha))
+    return list(reversed(faixas))
+
+
+def _conferir_linhas(sheet, esperadas):
+    """Relê a coluna B logo antes da exclusão e devolve as linhas que ainda
+    guardam os IDs esperados. `esperadas`: [(linha, idconlicitacao)] do
+    espelho; linhas deslocadas são remapeadas pelo ID e IDs sumidos ou
+    duplicados ficam de fora."""
+    atuais = sheet.col_values(espelho_planilha.COLUNA_ID)
+    posicoes = {}
+    for linha, valor in enumerate(atuais[1:], start=2):
+        posicoes.setdefault(str(valor).strip(), []).append(linha)
+
+    linhas, remapeadas, ignoradas = [], 0, []
+    for linha, bidding_id in esperadas:
+        bidding_id = str(bidding_id).strip()
+        if linha <= len(atuais) and str(atuais[linha - 1]).strip() == bidding_id:
+            linhas.append(linha)
+        elif len(posicoes.get(bidding_id, [])) == 1:
+            linhas.append(posicoes[bidding_id][0])
+            remapeadas += 1
+        else:
+            ignoradas.append(bidding_id)
+
+    if remapeadas:
+        print(f"[ARQUIVO] {sheet.title}: espelho desatualizado, {remapeadas} linha(s) remapeada(s) pelo ID")
+    if ignoradas:
+        print(f"[ARQUIVO] {sheet.title}: {len(ignoradas)} ID(s) ausente(s) ou duplicado(s) na aba, "
+              f"não removido(s): {ignoradas[:10]}")
+    return linhas
+
+
+def _excluir_linhas(spreadsheet, sheet, linhas):
+    """Remove as linhas numa única chamada (de baixo para cima, sem deslocar índices)."""
+    requisicoes = [
+        {"deleteDimension": {"range": {
+            "sheetId": sheet.id, "dimension": "ROWS", "startIndex": inicio - 1, "endIndex": fim,
+        }}}
+        for inicio, fim in _faixas_decrescentes(linhas)
+    ]
+    if requisicoes:
+        spreadsheet.batch_update({"requests": requisicoes})
+        sheets_update_service.registrar_exclusoes(sheet, linhas)
+
+
+# =========================
+# ARQUIVAMENTO
+# =========================
+
+def arquivar(spreadsheet, destino=None, abas=ABAS, horizonte_dias=HORIZONTE_DIAS, simular=False):
+    """Move as linhas elegíveis das abas para as abas mensais de `destino`.
+    Retorna {aba: quantidade arquivada}."""
+    destino = destino or spreadsheet
+    limite = datetime.now() - timedelta(days=horizonte_dias)
+    feedbacks = estado.feedbacks_processados()
+
+    espelho_planilha.sincronizar(spreadsheet, abas)
+    resultado = {}
+
+    for aba in abas:
+        selecionadas = selecionar(espelho_planilha.registros(aba), limite, feedbacks)
+        resultado[aba] = len(selecionadas)
+        if not selecionadas:
+            continue
+
+        print(f"[ARQUIVO] {aba}: {len(selecionadas)} linha(s) a arquivar")
+        if simular:
+            continue
+
+        sheet = spreadsheet.worksheet(aba)
+        cabecalho = sheet.row_values(1)
+        # Já copiadas numa execução interrompida antes da exclusão: só excluir
+        ja_copiadas = estado.ids_arquivados(aba)
+
+        por_mes = {}
+        for linha, dados, mes in selecionadas:
+            por_mes.setdefault(mes, []).append((linha, dados))
+
+        for mes, itens in sorted(por_mes.items()):
+            nome = f"{aba}_{mes}"
+            novos = [(l, d) for l, d in itens if d["idconlicitacao"].strip() not in ja_copiadas]
+            if novos:
+                _aba_arquivo(destino, nome, cabecalho).append_rows(
+                    [[d.get(coluna, "") for coluna in cabecalho] for _, d in novos],
+                    value_input_option="USER_ENTERED"
+                )
+                estado.registrar_arquivadas(aba, f"{destino.id}:{nome}",
+                                            [(d["idconlicitacao"], d) for _, d in novos])
+            print(f"[ARQUIVO] {aba} -> {nome}: {len(novos)} copiada(s)")
+
+        linhas = _conferir_linhas(sheet, [(linha, d["idconlicitacao"]) for linha, d, _ in selecionadas])
+        _excluir_linhas(spreadsheet, sheet, linhas)
+        print(f"[ARQUIVO] {aba}: {len(set(linhas))} linha(s) removida(s) da aba viva")
+
+    if not simular and any(resultado.values()):
+        espelho_planilha.sincronizar(spreadsheet, abas)
+    return resultado
+
+
+def executar(horizonte_dias=HORIZONTE_DIAS, simular=False):
+    if not SHEET_ID:
+        print("[ARQUIVO] GOOGLE_SHEET_ID nao definido — abortando")
+        return {}
+    spreadsheet = _conectar(SHEET_ID)
+    destino = _conectar(ARQUIVO_SHEET_ID) if ARQUIVO_SHEET_ID else spreadsheet
+    return arquivar(spreadsheet, destino, horizonte_dias=horizonte_dias, simular=simular)
+
+
+if __name__ == "__main__":
+    # python -m services.arquivamento [--dias N] [--simular]
+    parser = argparse.ArgumentParser(description="Arquiva linhas antigas/encerradas das abas da planilha")
+    parser.add_argument("--dias", type=int, default=HORIZONTE_DIAS, help="arquiva coletas mais antigas que isso")
+    parser.add_argument("--simular", action="store_true", help="só conta, sem mover nada")
+    args = parser.parse_args()
+    executar(args.dias, args.simular)
@@ -0,0 +1,96 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+
+# Armazenamento endereçado por conteúdo: cada arquivo é gravado uma vez em
+# downloads/_objetos/ab/abcd... e as pastas por licitação recebem hardlinks.
+# O mapa sha256 -> file_id no Drive fica em logs/estado.db (arquivos_drive).
+OBJETOS_DIR = os.path.join("downloads", "_objetos")
+CHUNK = 1024 * 1024
+
+_lock = threading.Lock()
+_digests = {}        # caminho -> {"sha256": ..., "md5": ..., "tamanho": ...}
+
+
+def _caminho_objeto(sha256):
+    return os.path.join(OBJETOS_DIR, sha256[:2], sha256)
+
+
+def _vincular(objeto, destino):
+    """Hardlink do objeto no destino; copia se o sistema de arquivos não suportar."""
+    if os.path.lexists(destino):
+        os.unlink(destino)
+    try:
+        os.link(objeto, destino)
+    except OSError:
+        shutil.copyfile(objeto, destino)
+
+
+def gravar_stream(origem, destino, chunk=CHUNK):
+    """Grava o conteúdo de `origem` (file-like) no armazenamento e vincula em
+    `destino`, calculando SHA-256 e MD5 numa única passada."""
+    os.makedirs(OBJETOS_DIR, exist_ok=True)
+    sha256 = hashlib.sha256()
+    md5 = hashlib.md5()
+    tamanho = 0
+
+    fd, temporario = tempfile.mkstemp(dir=OBJETOS_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                bloco = origem.read(chunk)
+                if not bloco:
+                    break
+                sha256.update(bloco)
+                md5.update(bloco)
+                tamanho += len(bloco)
+                f.write(bloco)
+
+        digest = {"sha256": sha256.hexdigest(), "md5": md5.hexdigest(), "tamanho": tamanho}
+        objeto = _caminho_objeto(digest["sha256"])
+        os.makedirs(os.path.dirname(objeto), exist_ok=True)
+
+        with _lock:
+            if os.path.exists(objeto):
+                os.unlink(temporario)
+            else:
+                os.replace(temporario, objeto)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.unlink(temporario)
+        raise
+
+    os.makedirs(os.path.dirname(destino) or ".", exist_ok=True)
+    _vincular(objeto, destino)
+
+    with _lock:
+        _digests[str(destino)] = digest
+    return digest
+
+
+def digest_de(caminho):
+    """Digest conhecido do arquivo; calcula (e memoriza) se ainda não houver."""
+    caminho = str(caminho)
+    with _lock:
+        if caminho in _digests:
+            return _digests[caminho]
+
+    sha256 = hashlib.sha256()
+    md5 = hashlib.md5()
+    tamanho = 0
+    with open(caminho, "rb") as f:
+        while True:
+            bloco = f.read(CHUNK)
+            if not bloco:
+                break
+            sha256.update(bloco)
+            md5.update(bloco)
+            tamanho += len(bloco)
+
+    digest = {"sha256": sha256.hexdigest(), "md5": md5.hexdigest(), "tamanho": tamanho}
+    with _lock:
+        _digests[caminho] = digest
+    return digest
+
@@ -0,0 +1,287 @@
+import difflib
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+# Cache de resultados do Gemini num SQLite com valores comprimidos. A chave
+# é (MD5 do PDF, hash do prompt base, hash da memória, assinatura de
+# modelos/configuração), então mudar o PROMPT_GERED, a configuração ou a
+# memória não serve veredito velho.
+CACHE_DIR = "cache_gemini"
+CACHE_DB = os.path.join(CACHE_DIR, "cache.db")
+CACHE_VERSAO = 2
+
+CACHE_MAX_MB = float(os.getenv("GEMINI_CACHE_MAX_MB", "512"))
+CACHE_TTL_DIAS = float(os.getenv("GEMINI_CACHE_TTL_DIAS", "180"))
+
+# estrita = só a mesma memória | tolerante = aceita resultado gerado com uma
+# revisão parecida da memória
+POLITICA = os.getenv("GEMINI_CACHE_POLITICA", "tolerante").lower()
+SIMILARIDADE_MINIMA = float(os.getenv("GEMINI_CACHE_SIMILARIDADE", "0.9"))
+# Os JSON antigos não registram o prompt: só valem com opt-in explícito
+USAR_LEGADO = os.getenv("GEMINI_CACHE_LEGADO", "0") == "1"
+
+# Cabeçalho que separa o prompt base da memória operacional (montar_prompt_gemini)
+CABECALHO_MEMORIA = "MEMORIA OPERACIONAL OBRIGATORIA"
+_SEPARADOR = "=" * 40 + "\n" + CABECALHO_MEMORIA
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS resultados (
+        hash_pdf TEXT NOT NULL,
+        prompt_base TEXT NOT NULL,
+        memoria TEXT NOT NULL,
+        config TEXT NOT NULL,
+        modelo TEXT,
+        valor BLOB NOT NULL,
+        tamanho INTEGER NOT NULL,
+        criado_em REAL NOT NULL,
+        acesso REAL NOT NULL,
+        PRIMARY KEY (hash_pdf, prompt_base, memoria, config)
+    )""",
+    "CREATE INDEX IF NOT EXISTS resultados_acesso ON resultados (acesso)",
+    "CREATE INDEX IF NOT EXISTS resultados_criado ON resultados (criado_em)",
+    """CREATE TABLE IF NOT EXISTS memorias (
+        hash TEXT PRIMARY KEY,
+        texto BLOB NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS meta (
+        chave TEXT PRIMARY KEY,
+        valor TEXT NOT NULL
+    )""",
+]
+
+LEGADO = "legado"   # prompt_base/memoria/config dos JSON antigos
+
+
+def _sha(texto):
+    return hashlib.sha256((texto or "").encode("utf-8")).hexdigest()
+
+
+def dividir_prompt(prompt):
+    """(prompt base, memória) — a memória é o que vem após o cabeçalho."""
+    posicao = prompt.find(_SEPARADOR)
+    if posicao == -1:
+        return prompt, ""
+    return prompt[:posicao].rstrip(), prompt[posicao:]
+
+
+class CacheGemini:
+    """Resultados (texto, status) por edital + prompt + configuração.
+
+    Despeja por TTL (criação) e, acima do tamanho máximo, pelo acesso mais
+    antigo (LRU). Contadores: hits, hits_tolerantes, misses, bytes_lidos e
+    bytes_gravados (comprimidos)."""
+
+    def __init__(self, caminho=CACHE_DB, max_bytes=CACHE_MAX_MB * 1024 * 1024,
+                 ttl_dias=CACHE_TTL_DIAS, politica=POLITICA, similaridade=SIMILARIDADE_MINIMA,
+                 usar_legado=USAR_LEGADO):
+        self.caminho = caminho
+        self.max_bytes = max_bytes
+        self.ttl = ttl_dias * 86400
+        self.politica = politica
+        self.similaridade = similaridade
+        self.usar_legado = usar_legado
+
+        self._conexao = None
+        self._lock = threading.RLock()
+        self._similaridades = {}
+
+        self.hits = 0
+        self.hits_tolerantes = 0
+        self.misses = 0
+        self.bytes_lidos = 0
+        self.bytes_gravados = 0
+
+    # -------------------------
+    # CONEXÃO
+    # -------------------------
+
+    def _conectar(self):
+        if self._conexao is None:
+            os.makedirs(os.path.dirname(self.caminho) or ".", exist_ok=True)
+            conexao = sqlite3.connect(self.caminho, check_same_thread=False, timeout=30)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            with conexao:
+                for comando in _SCHEMA:
+                    conexao.execute(comando)
+            self._conexao = conexao
+            self._importar_json()
+            self._despejar()
+        return self._conexao
+
+    def _importar_json(self):
+        """Importa uma única vez os <md5>.json do formato antigo (ficam no disco)."""
+        if self._conexao.execute("SELECT 1 FROM meta WHERE chave = 'json_importado'").fetchone():
+            return
+
+        agora = time.time()
+        linhas = []
+        for caminho in glob.glob(os.path.join(os.path.dirname(self.caminho) or ".", "*.json")):
+            try:
+                with open(caminho, "r", encoding="utf-8") as f:
+                    dados = json.load(f)
+                valor = zlib.compress(json.dumps(
+                    {"texto": dados["texto"], "status": dados["status"]}, ensure_ascii=False
+                ).encode("utf-8"))
+            except Exception:
+                continue
+            hash_pdf = os.path.splitext(os.path.basename(caminho))[0]
+            criado = os.path.getmtime(caminho)
+            linhas.append((hash_pdf, LEGADO, LEGADO, LEGADO, None, valor, len(valor), criado, agora))
+
+        with self._conexao:
+            self._conexao.executemany(
+                "INSERT OR IGNORE INTO resultados VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", linhas
+            )
+            self._conexao.execute("INSERT INTO meta (chave, valor) VALUES ('json_importado', ?)", (str(agora),))
+        if linhas:
+            print(f"[CACHE GEMINI] {len(linhas)} resultado(s) do formato antigo importado(s)")
+
+    # -------------------------
+    # LEITURA
+    # -------------------------
+
+    def _ler(self, chave):
+        self._conexao.execute(
+            "UPDATE resultados SET acesso = ? WHERE hash_pdf = ? AND prompt_base = ? AND memoria = ? AND config = ?",
+            (time.time(), *chave)
+        )
+        self._conexao.commit()
+        valor = self._conexao.execute(
+            "SELECT valor FROM resultados WHERE hash_pdf = ? AND prompt_base = ? AND memoria = ? AND config = ?",
+            chave
+        ).fetchone()[0]
+        self.bytes_lidos += len(valor)
+        return json.loads(zlib.decompress(valor))
+
+    def _memoria_parecida(self, hash_memoria, memoria_atual, hash_atual):
+        par = (hash_memoria, hash_atual)
+        if par not in self._similaridades:
+            linha = self._conexao.execute("SELECT texto FROM memorias WHERE hash = ?", (hash_memoria,)).fetchone()
+            if not linha:
+                self._similaridades[par] = 0.0
+            else:
+                anterior = zlib.decompress(linha[0]).decode("utf-8")
+                self._similaridades[par] = difflib.SequenceMatcher(
+                    None, anterior.splitlines(), memoria_atual.splitlines(), autojunk=False
+                ).ratio()
+        return self._similaridades[par] >= self.similaridade
+
+    def buscar(self, hash_pdf, prompt, config):
+        """{"texto", "status"} ou None."""
+        base, memoria = dividir_prompt(prompt)
+        hash_base, hash_memoria, hash_config = _sha(base), _sha(memoria), _sha(f"{CACHE_VERSAO}:{config}")
+
+        with self._lock:
+            conexao = self._conectar()
+            limite_ttl = time.time() - self.ttl
+
+            chave = (hash_pdf, hash_base, hash_memoria, hash_config)
+            if conexao.execute(
+                "SELECT 1 FROM resultados WHERE hash_pdf = ? AND prompt_base = ? AND memoria = ? AND config = ? "
+                "AND criado_em >= ?", (*chave, limite_ttl)
+            ).fetchone():
+                self.hits += 1
+                return self._ler(chave)
+
+            if self.politica == "tolerante":
+                candidatos = conexao.execute(
+                    """SELECT memoria FROM resultados
+                       WHERE hash_pdf = ? AND prompt_base = ? AND config = ? AND criado_em >= ?
+                       ORDER BY criado_em DESC""",
+                    (hash_pdf, hash_base, hash_config, limite_ttl)
+                ).fetchall()
+                for (hash_anterior,) in candidatos:
+                    if self._memoria_parecida(hash_anterior, memoria, hash_memoria):
+                        self.hits += 1
+                        self.hits_tolerantes += 1
+                        return self._ler((hash_pdf, hash_base, hash_anterior, hash_config))
+
+            if self.usar_legado:
+                legado = (hash_pdf, LEGADO, LEGADO, LEGADO)
+                if conexao.execute(
+                    "SELECT 1 FROM resultados WHERE hash_pdf = ? AND prompt_base = ? AND memoria = ? AND config = ? "
+                    "AND criado_em >= ?", (*legado, limite_ttl)
+                ).fetchone():
+                    self.hits += 1
+                    self.hits_tolerantes += 1
+                    return self._ler(legado)
+
+            self.misses += 1
+            return None
+
+    # -------------------------
+    # GRAVAÇÃO
+    # -------------------------
+
+    def armazenar(self, hash_pdf, prompt, config, resultado, modelo=None):
+        base, memoria = dividir_prompt(prompt)
+        hash_memoria = _sha(memoria)
+        valor = zlib.compress(json.dumps(resultado, ensure_ascii=False).encode("utf-8"))
+        agora = time.time()
+
+        with self._lock:
+            conexao = self._conectar()
+            with conexao:
+                conexao.execute(
+                    "INSERT OR IGNORE INTO memorias (hash, texto) VALUES (?, ?)",
+                    (hash_memoria, zlib.compress(memoria.encode("utf-8")))
+                )
+                conexao.execute(
+                    "INSERT OR REPLACE INTO resultados VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (hash_pdf, _sha(base), hash_memoria, _sha(f"{CACHE_VERSAO}:{config}"), modelo,
+                     valor, len(valor), agora, agora)
+                )
+            self.bytes_gravados += len(valor)
+            self._despejar()
+
+    def _despejar(self):
+        conexao = self._conexao
+        with conexao:
+            removidos = conexao.execute(
+                "DELETE FROM resultados WHERE criado_em < ?", (time.time() - self.ttl,)
+            ).rowcount
+
+            total = conexao.execute("SELECT COALESCE(SUM(tamanho), 0) FROM resultados").fetchone()[0]
+            if total > self.max_bytes:
+                excesso = total - self.max_bytes
+                for rowid, tamanho in conexao.execute(
+                    "SELECT rowid, tamanho FROM resultados ORDER BY acesso"
+                ).fetchall():
+                    if excesso <= 0:
+                        break
+                    conexao.execute("DELETE FROM resultados WHERE rowid = ?", (rowid,))
+                    excesso -= tamanho
+                    removidos += 1
+
+            if removidos:
+                conexao.execute(
+                    "DELETE FROM memorias WHERE hash NOT IN (SELECT DISTINCT memoria FROM resultados)"
+                )
+        if removidos:
+            print(f"[CACHE GEMINI] {removidos} resultado(s) despejado(s)")
+
+    def estatisticas(self):
+        with self._lock:
+            conexao = self._conectar()
+            entradas, total = conexao.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM resultados"
+            ).fetchone()
+        return {
+            "entradas": entradas,
+            "mb": round(total / (1024 * 1024), 2),
+            "hits": self.hits,
+            "hits_tolerantes": self.hits_tolerantes,
+            "misses": self.misses,
+            "bytes_lidos": self.bytes_lidos,
+            "bytes_gravados": self.bytes_gravados,
+        }
+
+
+cache = CacheGemini()
@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Cache HTTP em disco para respostas do portal (biddings.json, edital.zip).
+# Cada entrada fica em cache_http/ab/<sha256 da url> com um .json ao lado
+# guardando ETag, Last-Modified e Content-Length para revalidação.
+CACHE_DIR = os.getenv("CACHE_HTTP_DIR", "cache_http")
+CACHE_MAX_MB = int(os.getenv("CACHE_HTTP_MAX_MB", "2048"))
+CHUNK = 1024 * 1024
+
+# Cabeçalhos que deixam de valer para o corpo já decodificado salvo em disco
+_CABECALHOS_DESCARTADOS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+class _Corpo:
+    """Arquivo do cache exposto como `response.raw` (aceita seek, então serve
+    direto para o zipfile)."""
+
+    def __init__(self, caminho):
+        self._arquivo = open(caminho, "rb")
+        self.decode_content = True
+
+    def read(self, tamanho=-1, **kwargs):
+        return self._arquivo.read(tamanho)
+
+    def seek(self, *args):
+        return self._arquivo.seek(*args)
+
+    def tell(self):
+        return self._arquivo.tell()
+
+    def seekable(self):
+        return True
+
+    def close(self):
+        self._arquivo.close()
+
+    @property
+    def closed(self):
+        return self._arquivo.closed
+
+
+class CacheHTTP:
+    """Armazena respostas 200 com validadores e responde 304 a partir do disco.
+
+    Limite por tamanho total (`max_bytes`): ao gravar, as entradas acessadas
+    há mais tempo são removidas até caber."""
+
+    def __init__(self, diretorio=CACHE_DIR, max_bytes=CACHE_MAX_MB * 1024 * 1024):
+        self.diretorio = diretorio
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entradas = None  # chave -> metadados
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_economizados = 0
+
+    # -------------------------
+    # ÍNDICE
+    # -------------------------
+
+    def _chave(self, url):
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, chave[:2], chave)
+
+    def _carregar(self):
+        """Monta o índice em memória a partir dos .json (chamar com o lock)."""
+        if self._entradas is not None:
+            return self._entradas
+
+        self._entradas = {}
+        if not os.path.isdir(self.diretorio):
+            return self._entradas
+
+        for raiz, _, arquivos in os.walk(self.diretorio):
+            for nome in arquivos:
+                if not nome.endswith(".json"):
+                    continue
+                try:
+                    with open(os.path.join(raiz, nome), "r", encoding="utf-8") as f:
+                        meta = json.load(f)
+                except Exception:
+                    continue
+                self._entradas[nome[:-5]] = meta
+        return self._entradas
+
+    def _gravar_meta(self, chave, meta):
+        caminho = self._caminho(chave) + ".json"
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    def _remover(self, chave):
+        self._entradas.pop(chave, None)
+        for caminho in (self._caminho(chave), self._caminho(chave) + ".json"):
+            if os.path.exists(caminho):
+                os.unlink(caminho)
+
+    def _despejar(self, manter=None):
+        """Remove as entradas menos usadas até o total caber em max_bytes."""
+        total = sum(m.get("tamanho", 0) for m in self._entradas.values())
+        if total <= self.max_bytes:
+            return
+        for chave, meta in sorted(self._entradas.items(), key=lambda kv: kv[1].get("acesso", 0)):
+            if total <= self.max_bytes:
+                break
+            if chave == manter:
+                continue
+            total -= meta.get("tamanho", 0)
+            self._remover(chave)
+
+    # -------------------------
+    # CONSULTA
+    # -------------------------
+
+    def buscar(self, url):
+        """Metadados da entrada se o corpo ainda estiver íntegro em disco."""
+        chave = self._chave(url)
+        with self._lock:
+            meta = self._carregar().get(chave)
+            if meta is None:
+                return None
+            caminho = self._caminho(chave)
+            if not os.path.exists(caminho) or os.path.getsize(caminho) != meta.get("tamanho"):
+                self._remover(chave)
+                return None
+            return meta
+
+    def cabecalhos_condicionais(self, url):
+        meta = self.buscar(url)
+        if meta is None:
+            return {}
+        cabecalhos = {}
+        if meta.get("etag"):
+            cabecalhos["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            cabecalhos["If-Modified-Since"] = meta["last_modified"]
+        return cabecalhos
+
+    def abrir(self, url, revalidado=True):
+        """Devolve (metadados, corpo) da entrada e marca o acesso."""
+        chave = self._chave(url)
+        with self._lock:
+            meta = self._carregar().get(chave)
+            if meta is None:
+                return None, None
+            meta["acesso"] = time.time()
+            self._gravar_meta(chave, meta)
+            if revalidado:
+                self.hits += 1
+                self.bytes_economizados += meta.get("tamanho", 0)
+            corpo = _Corpo(self._caminho(chave))
+        return meta, corpo
+
+    def entradas(self, trecho_url=""):
+        """(metadados, caminho do corpo) das entradas cuja URL contém `trecho_url`."""
+        with self._lock:
+            itens = [
+                (meta, self._caminho(chave))
+                for chave, meta in self._carregar().items()
+                if trecho_url in meta.get("url", "")
+            ]
+        return [(meta, caminho) for meta, caminho in itens if os.path.exists(caminho)]
+
+    # -------------------------
+    # GRAVAÇÃO
+    # -------------------------
+
+    @staticmethod
+    def armazenavel(resp):
+        if resp.status_code != 200:
+            return False
+        if "no-store" in resp.headers.get("Cache-Control", "").lower():
+            return False
+        return bool(resp.headers.get("ETag") or resp.headers.get("Last-Modified"))
+
+    def armazenar(self, url, resp):
+        """Grava o corpo de `resp` (lendo em streaming) e devolve os metadados,
+        ou None se a resposta veio truncada."""
+        chave = self._chave(url)
+        destino = self._caminho(chave)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+
+        with self._lock:
+            self.misses += 1
+
+        fd, temporario = tempfile.mkstemp(dir=os.path.dirname(destino), suffix=".tmp")
+        tamanho = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for bloco in resp.iter_content(CHUNK):
+                    f.write(bloco)
+                    tamanho += len(bloco)
+        except BaseException:
+            os.unlink(temporario)
+            raise
+
+        # Content-Length só confere com o corpo quando não há compressão
+        esperado = resp.headers.get("Content-Length")
+        if esperado and not resp.headers.get("Content-Encoding") and int(esperado) != tamanho:
+            os.unlink(temporario)
+            return None
+
+        meta = {
+            "url": url,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "content_length": esperado,
+            "tamanho": tamanho,
+            "cabecalhos": {
+                k: v for k, v in resp.headers.items()
+                if k.lower() not in _CABECALHOS_DESCARTADOS
+            },
+            "acesso": time.time(),
+        }
+
+        with self._lock:
+            self._carregar()
+            os.replace(temporario, destino)
+            self._gravar_meta(chave, meta)
+            self._entradas[chave] = meta
+            self._despejar(manter=chave)
+        return meta
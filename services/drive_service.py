@@ -101,7 +101,28 @@ def criar_pasta(nome, parent_id):
     return pasta.get("id")
 
 
-def upload_arquivo_para_pasta(caminho_arquivo, pasta_id):
+def baixar_texto(file_id):
+    """Conteúdo de um arquivo de texto do Drive."""
+    service = conectar_drive()
+    conteudo = service.files().get_media(fileId=file_id, supportsAllDrives=True).execute()
+    return conteudo.decode("utf-8", errors="replace")
+
+
+def copiar_arquivo_para_pasta(file_id, pasta_id, nome):
+    """Cópia server-side de um arquivo já existente no Drive (sem reenviar bytes)."""
+    service = conectar_drive()
+
+    copia = service.files().copy(
+        fileId=file_id,
+        body={"name": nome, "parents": [pasta_id]},
+        fields="id",
+        supportsAllDrives=True
+    ).execute()
+
+    return copia.get("id")
+
+
+def upload_arquivo_para_pasta(caminho_arquivo, pasta_id, copiar_de=None):
     service = conectar_drive()
     nome_arquivo = pathlib.Path(caminho_arquivo).name
     arquivo_existente = buscar_arquivo_por_nome(nome_arquivo, pasta_id)
@@ -110,6 +131,14 @@ def upload_arquivo_para_pasta(caminho_arquivo, pasta_id):
         print(f"Arquivo ja existe no Drive: {nome_arquivo}")
         return arquivo_existente
 
+    if copiar_de:
+        try:
+            file_id = copiar_arquivo_para_pasta(copiar_de, pasta_id, nome_arquivo)
+            print(f"Conteúdo já no Drive, copiado: {nome_arquivo}")
+            return file_id
+        except Exception as e:
+            print(f"Cópia no Drive falhou ({type(e).__name__}: {e}), enviando arquivo")
+
     file_metadata = {
         "name": nome_arquivo,
         "parents": [pasta_id]
@@ -0,0 +1,282 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+from gspread.utils import rowcol_to_a1
+
+# Espelho local das abas aprovados/reprovados num SQLite. A sincronização é
+# incremental: se o modifiedTime da planilha no Drive não mudou não lê nada;
+# senão lê a coluna B, relê só as colunas editáveis das linhas já conhecidas
+# e busca por inteiro (com resumo_ia) apenas as linhas novas.
+ESPELHO_DB = os.getenv("ESPELHO_PLANILHA_DB", "logs/espelho_planilha.db")
+
+ABA_APROVADOS = "aprovados"
+ABA_REPROVADOS = "reprovados"
+ABAS = (ABA_APROVADOS, ABA_REPROVADOS)
+
+COLUNA_ID = 2   # B: idconlicitacao
+
+# Colunas que mudam depois da inserção (fluxo, importador ou equipe)
+COLUNAS_EDITAVEIS = (
+    "aprovado_ia",
+    "link_drive_edital",
+    "importado_pipedrive",
+    "classificacao",
+    "feedback_qualitativo",
+)
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS abas (
+        aba TEXT PRIMARY KEY,
+        cabecalho TEXT NOT NULL,
+        sincronizada_em TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS linhas (
+        aba TEXT NOT NULL,
+        linha INTEGER NOT NULL,
+        bidding_id TEXT NOT NULL,
+        dados TEXT NOT NULL,
+        PRIMARY KEY (aba, linha)
+    )""",
+    "CREATE INDEX IF NOT EXISTS linhas_bidding ON linhas (aba, bidding_id)",
+    """CREATE TABLE IF NOT EXISTS planilha (
+        chave TEXT PRIMARY KEY,
+        valor TEXT NOT NULL
+    )""",
+]
+
+_conexao = None
+_lock = threading.RLock()
+
+
+# =========================
+# CONEXÃO
+# =========================
+
+def conectar():
+    global _conexao
+    with _lock:
+        if _conexao is None:
+            os.makedirs(os.path.dirname(ESPELHO_DB) or ".", exist_ok=True)
+            conexao = sqlite3.connect(ESPELHO_DB, check_same_thread=False, timeout=30)
+            conexao.row_factory = sqlite3.Row
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            with conexao:
+                for comando in _SCHEMA:
+                    conexao.execute(comando)
+            _conexao = conexao
+        return _conexao
+
+
+def _consultar(sql, parametros=()):
+    with _lock:
+        return conectar().execute(sql, parametros).fetchall()
+
+
+def _valor(chave):
+    linhas = _consultar("SELECT valor FROM planilha WHERE chave = ?", (chave,))
+    return linhas[0]["valor"] if linhas else None
+
+
+# =========================
+# SINCRONIZAÇÃO
+# =========================
+
+def _letra(coluna):
+    return re.sub(r"\d", "", rowcol_to_a1(1, coluna))
+
+
+def _faixas_editaveis(cabecalho):
+    """Colunas editáveis agrupadas em faixas contíguas: [(inicio, fim)] (1-based)."""
+    colunas = sorted(cabecalho.index(nome) + 1 for nome in COLUNAS_EDITAVEIS if nome in cabecalho)
+    faixas = []
+    for coluna in colunas:
+        if faixas and faixas[-1][1] == coluna - 1:
+            faixas[-1] = (faixas[-1][0], coluna)
+        else:
+            faixas.append((coluna, coluna))
+    return faixas
+
+
+def _registro(cabecalho, valores):
+    valores = list(valores) + [""] * (len(cabecalho) - len(valores))
+    return dict(zip(cabecalho, valores))
+
+
+def _faixas_linhas(indices):
+    """Índices (0-based, ordenados) agrupados em faixas contíguas: [(inicio, fim)]."""
+    faixas = []
+    for i in indices:
+        if faixas and faixas[-1][1] == i - 1:
+            faixas[-1] = (faixas[-1][0], i)
+        else:
+            faixas.append((i, i))
+    return faixas
+
+
+def _sincronizar_aba(conexao, spreadsheet, aba):
+    sheet = spreadsheet.worksheet(aba)
+    ids_planilha = [str(v).strip() for v in sheet.col_values(COLUNA_ID)[1:]]
+    total = len(ids_planilha)
+
+    salvo = conexao.execute("SELECT cabecalho FROM abas WHERE aba = ?", (aba,)).fetchone()
+    cabecalho_salvo = json.loads(salvo["cabecalho"]) if salvo else None
+    espelhadas = {}
+    for r in conexao.execute("SELECT bidding_id, dados FROM linhas WHERE aba = ? ORDER BY linha", (aba,)):
+        if r["bidding_id"]:
+            espelhadas.setdefault(r["bidding_id"], r["dados"])
+
+    # Cabeçalho + colunas editáveis de todas as linhas numa única leitura
+    faixas = _faixas_editaveis(cabecalho_salvo) if cabecalho_salvo and total else []
+    respostas = sheet.batch_get(
+        ["1:1"] + [f"{_letra(inicio)}2:{_letra(fim)}{total + 1}" for inicio, fim in faixas]
+    )
+    cabecalho = list(respostas[0][0]) if respostas and respostas[0] else []
+    if cabecalho != cabecalho_salvo:
+        espelhadas, faixas = {}, []
+
+    # Linhas já conhecidas (mesmo que tenham mudado de posição) reaproveitam
+    # o espelho; só as colunas editáveis são atualizadas
+    registros = [None] * total
+    usados = set()
+    for i, bidding_id in enumerate(ids_planilha):
+        if bidding_id in espelhadas and bidding_id not in usados:
+            registros[i] = json.loads(espelhadas[bidding_id])
+            usados.add(bidding_id)
+
+    for (inicio, fim), valores in zip(faixas, respostas[1:]):
+        for i, dados in enumerate(registros):
+            if dados is None:
+                continue
+            linha_valores = list(valores[i]) if i < len(valores) else []
+            linha_valores += [""] * (fim - inicio + 1 - len(linha_valores))
+            for coluna, valor in zip(range(inicio, fim + 1), linha_valores):
+                dados[cabecalho[coluna - 1]] = valor
+
+    atualizadas = sum(
+        1 for i, dados in enumerate(registros)
+        if dados is not None and json.dumps(dados, ensure_ascii=False) != espelhadas[ids_planilha[i]]
+    )
+
+    # Linhas desconhecidas são lidas por inteiro, todas numa única chamada
+    faltantes = _faixas_linhas([i for i, dados in enumerate(registros) if dados is None])
+    if faltantes and cabecalho:
+        ultima_coluna = _letra(len(cabecalho))
+        respostas = sheet.batch_get([f"A{inicio + 2}:{ultima_coluna}{fim + 2}" for inicio, fim in faltantes])
+        for (inicio, fim), valores in zip(faltantes, respostas):
+            for deslocamento in range(fim - inicio + 1):
+                linha_valores = valores[deslocamento] if deslocamento < len(valores) else []
+                registros[inicio + deslocamento] = _registro(cabecalho, linha_valores)
+
+    with conexao:
+        conexao.execute("DELETE FROM linhas WHERE aba = ?", (aba,))
+        conexao.executemany(
+            "INSERT INTO linhas (aba, linha, bidding_id, dados) VALUES (?, ?, ?, ?)",
+            [
+                (aba, i + 2, ids_planilha[i], json.dumps(dados or {}, ensure_ascii=False))
+                for i, dados in enumerate(registros)
+            ]
+        )
+        conexao.execute(
+            "INSERT OR REPLACE INTO abas (aba, cabecalho, sincronizada_em) VALUES (?, ?, ?)",
+            (aba, json.dumps(cabecalho, ensure_ascii=False), datetime.now().isoformat())
+        )
+
+    return {
+        "linhas": total,
+        "novas": sum(fim - inicio + 1 for inicio, fim in faltantes),
+        "atualizadas": atualizadas,
+        "removidas": len(set(espelhadas) - usados),
+    }
+
+
+def sincronizar(spreadsheet, abas=ABAS):
+    """Atualiza o espelho das abas. Retorna {aba: contagens} das abas
+    relidas, ou {} quando nenhuma mudou desde a sua última sincronização."""
+    with _lock:
+        conexao = conectar()
+
+        try:
+            modificada_em = spreadsheet.get_lastUpdateTime()
+        except Exception as e:
+            print(f"[ESPELHO] modifiedTime indisponível ({type(e).__name__}): sincronizando mesmo assim")
+            modificada_em = None
+
+        # Marca d'água por aba: sincronizar só "aprovados" não vale para "reprovados"
+        conhecidas = {r["aba"] for r in conexao.execute("SELECT aba FROM abas")}
+        pendentes = [
+            aba for aba in abas
+            if not (modificada_em and aba in conhecidas
+                    and modificada_em == _valor(f"modificada_em:{spreadsheet.id}:{aba}"))
+        ]
+        if not pendentes:
+            return {}
+
+        resultado = {aba: _sincronizar_aba(conexao, spreadsheet, aba) for aba in pendentes}
+
+        if modificada_em:
+            with conexao:
+                conexao.executemany(
+                    "INSERT OR REPLACE INTO planilha (chave, valor) VALUES (?, ?)",
+                    [(f"modificada_em:{spreadsheet.id}:{aba}", modificada_em) for aba in pendentes]
+                )
+
+        for aba, contagem in resultado.items():
+            print(f"[ESPELHO] {aba}: {contagem['linhas']} linha(s) | {contagem['novas']} nova(s), "
+                  f"{contagem['atualizadas']} atualizada(s), {contagem['removidas']} removida(s)")
+        return resultado
+
+
+# =========================
+# CONSULTAS
+# =========================
+
+def linhas(aba):
+    """Registros da aba em ordem de linha (mesmo formato de get_all_values + cabeçalho)."""
+    return [json.loads(r["dados"]) for r in _consultar("SELECT dados FROM linhas WHERE aba = ? ORDER BY linha", (aba,))]
+
+
+def registros(aba):
+    """[(linha, dados)] da aba em ordem de linha."""
+    return [(r["linha"], json.loads(r["dados"]))
+            for r in _consultar("SELECT linha, dados FROM linhas WHERE aba = ? ORDER BY linha", (aba,))]
+
+
+def ids(aba):
+    return {r["bidding_id"] for r in _consultar("SELECT bidding_id FROM linhas WHERE aba = ? AND bidding_id != ''", (aba,))}
+
+
+def linha_de(aba, bidding_id):
+    r = _consultar("SELECT linha FROM linhas WHERE aba = ? AND bidding_id = ? ORDER BY linha LIMIT 1",
+                   (aba, str(bidding_id).strip()))
+    return r[0]["linha"] if r else None
+
+
+def aprovados_nao_importados():
+    """[(linha, dados)] aprovados pela IA e ainda sem importado_pipedrive."""
+    consulta = _consultar(
+        """SELECT linha, dados FROM linhas
+           WHERE aba = ?
+             AND lower(trim(json_extract(dados, '$.aprovado_ia'))) IN ('true', '1', 'sim', 'yes')
+             AND lower(trim(coalesce(json_extract(dados, '$.importado_pipedrive'), ''))) != 'true'
+           ORDER BY linha""",
+        (ABA_APROVADOS,)
+    )
+    return [(r["linha"], json.loads(r["dados"])) for r in consulta]
+
+
+def linhas_com_feedback(aba=ABA_APROVADOS, ignorar=()):
+    """[(linha, dados)] com feedback_qualitativo preenchido, exceto IDs em `ignorar`
+    (ex.: feedbacks já processados, para obter só os novos)."""
+    ignorar = {str(i).strip() for i in ignorar}
+    consulta = _consultar(
+        """SELECT linha, bidding_id, dados FROM linhas
+           WHERE aba = ? AND trim(coalesce(json_extract(dados, '$.feedback_qualitativo'), '')) != ''
+           ORDER BY linha""",
+        (aba,)
+    )
+    return [(r["linha"], json.loads(r["dados"])) for r in consulta if r["bidding_id"] not in ignorar]
@@ -0,0 +1,383 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+# Estado da coleta num SQLite em modo WAL: checkpoint de boletim, licitações
+# processadas, resumos do Gemini, feedbacks processados e histórico de
+# relatórios. Cada gravação é uma transação curta, então uma queda no meio
+# não corrompe o resto.
+ESTADO_DB = os.getenv("ESTADO_DB", "logs/estado.db")
+
+# Arquivos JSON usados antes do SQLite; importados uma única vez
+LEGADO_ULTIMO_BOLETIM = "logs/ultimo_boletim.json"
+LEGADO_LICITACOES = "logs/licitacoes_processadas.json"
+LEGADO_FEEDBACKS = "logs/feedbacks_processados.json"
+LEGADO_RELATORIO = "logs/relatorio_coleta.json"
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS checkpoint (
+        chave TEXT PRIMARY KEY,
+        valor TEXT NOT NULL,
+        atualizado_em TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS licitacoes_processadas (
+        bidding_id TEXT PRIMARY KEY,
+        boletim_id INTEGER,
+        status_ia TEXT,
+        link_drive TEXT,
+        link_txt TEXT,
+        data_processamento TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS feedbacks_processados (
+        idconlicitacao TEXT PRIMARY KEY,
+        classificacao TEXT,
+        feedback TEXT,
+        edital TEXT,
+        processado_em TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS relatorio_coleta (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        data TEXT,
+        dados TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS etapas_licitacao (
+        bidding_id TEXT NOT NULL,
+        etapa TEXT NOT NULL,
+        dados TEXT,
+        concluida_em TEXT NOT NULL,
+        PRIMARY KEY (bidding_id, etapa)
+    )""",
+    """CREATE TABLE IF NOT EXISTS resumos_ia (
+        bidding_id TEXT PRIMARY KEY,
+        texto TEXT NOT NULL,
+        link_txt TEXT,
+        registrado_em TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS linhas_arquivadas (
+        aba TEXT NOT NULL,
+        bidding_id TEXT NOT NULL,
+        destino TEXT NOT NULL,
+        dados TEXT NOT NULL,
+        arquivada_em TEXT NOT NULL,
+        PRIMARY KEY (aba, bidding_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS arquivos_drive (
+        sha256 TEXT PRIMARY KEY,
+        file_id TEXT NOT NULL,
+        registrado_em TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS migracoes (
+        nome TEXT PRIMARY KEY,
+        executada_em TEXT NOT NULL
+    )""",
+]
+
+_conexao = None
+_lock = threading.RLock()
+
+
+# =========================
+# CONEXÃO
+# =========================
+
+def conectar():
+    """Conexão única do processo (as threads da esteira serializam pelo lock)."""
+    global _conexao
+    with _lock:
+        if _conexao is None:
+            os.makedirs(os.path.dirname(ESTADO_DB) or ".", exist_ok=True)
+            conexao = sqlite3.connect(ESTADO_DB, check_same_thread=False, timeout=30)
+            conexao.row_factory = sqlite3.Row
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            with conexao:
+                for comando in _SCHEMA:
+                    conexao.execute(comando)
+            _conexao = conexao
+            _migrar_json()
+        return _conexao
+
+
+def _executar(sql, parametros=()):
+    with _lock:
+        conexao = conectar()
+        with conexao:
+            return conexao.execute(sql, parametros)
+
+
+def _consultar(sql, parametros=()):
+    with _lock:
+        return conectar().execute(sql, parametros).fetchall()
+
+
+# =========================
+# MIGRAÇÃO DOS JSON
+# =========================
+
+def _ler_json(caminho):
+    if not os.path.exists(caminho):
+        return None
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"[ESTADO] {caminho} ilegível, não migrado: {type(e).__name__}: {e}")
+        return None
+
+
+def _migrar_json():
+    """Importa os JSON antigos uma única vez (registrado em `migracoes`).
+
+    Arquivo existente mas ilegível não é registrado: a migração fica
+    pendente para a próxima execução, em vez de descartar os dados."""
+    legados = (LEGADO_ULTIMO_BOLETIM, LEGADO_LICITACOES, LEGADO_FEEDBACKS, LEGADO_RELATORIO)
+    feitas = {r["nome"] for r in _conexao.execute("SELECT nome FROM migracoes")}
+    lidos = {nome: _ler_json(nome) for nome in legados if nome not in feitas}
+    agora = datetime.now().isoformat()
+
+    with _conexao:
+        if LEGADO_ULTIMO_BOLETIM in lidos:
+            dados = lidos[LEGADO_ULTIMO_BOLETIM]
+            if isinstance(dados, dict) and dados.get("ultimo_id"):
+                _conexao.execute(
+                    "INSERT OR IGNORE INTO checkpoint (chave, valor, atualizado_em) VALUES ('ultimo_boletim', ?, ?)",
+                    (str(int(dados["ultimo_id"])), dados.get("data_processamento") or agora)
+                )
+
+        if LEGADO_LICITACOES in lidos:
+            dados = lidos[LEGADO_LICITACOES]
+            if isinstance(dados, dict):
+                _conexao.executemany(
+                    """INSERT OR IGNORE INTO licitacoes_processadas
+                       (bidding_id, boletim_id, status_ia, link_drive, link_txt, data_processamento)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    [
+                        (str(bid), d.get("boletim_id"), d.get("status_ia"), d.get("link_drive"),
+                         d.get("link_txt"), d.get("data_processamento"))
+                        for bid, d in dados.items() if isinstance(d, dict)
+                    ]
+                )
+
+        if LEGADO_FEEDBACKS in lidos:
+            dados = lidos[LEGADO_FEEDBACKS]
+            if isinstance(dados, dict):
+                _conexao.executemany(
+                    """INSERT OR IGNORE INTO feedbacks_processados
+                       (idconlicitacao, classificacao, feedback, edital, processado_em)
+                       VALUES (?, ?, ?, ?, ?)""",
+                    [
+                        (str(uid), d.get("classificacao"), d.get("feedback"), d.get("edital"), d.get("processado_em"))
+                        for uid, d in dados.items() if isinstance(d, dict)
+                    ]
+                )
+
+        if LEGADO_RELATORIO in lidos:
+            dados = lidos[LEGADO_RELATORIO]
+            if isinstance(dados, list):
+                _conexao.executemany(
+                    "INSERT INTO relatorio_coleta (data, dados) VALUES (?, ?)",
+                    [(s.get("data"), json.dumps(s, ensure_ascii=False)) for s in dados if isinstance(s, dict)]
+                )
+
+        for nome, dados in lidos.items():
+            existe = os.path.exists(nome)
+            if existe and dados is None:
+                print(f"[ESTADO] ERRO: {nome} não pôde ser lido; migração pendente para a próxima execução")
+                continue
+            _conexao.execute("INSERT INTO migracoes (nome, executada_em) VALUES (?, ?)", (nome, agora))
+            if existe:
+                print(f"[ESTADO] {nome} migrado para {ESTADO_DB}")
+
+
+# =========================
+# ÚLTIMO BOLETIM
+# =========================
+
+def obter_ultimo_boletim():
+    linhas = _consultar("SELECT valor FROM checkpoint WHERE chave = 'ultimo_boletim'")
+    return int(linhas[0]["valor"]) if linhas else 0
+
+
+def salvar_ultimo_boletim(boletim_id):
+    _executar(
+        """INSERT INTO checkpoint (chave, valor, atualizado_em) VALUES ('ultimo_boletim', ?, ?)
+           ON CONFLICT(chave) DO UPDATE SET valor = excluded.valor, atualizado_em = excluded.atualizado_em""",
+        (str(int(boletim_id)), datetime.now().isoformat())
+    )
+
+
+# =========================
+# LICITAÇÕES PROCESSADAS
+# =========================
+
+def licitacoes_processadas():
+    """bidding_id -> dados, no mesmo formato do antigo licitacoes_processadas.json."""
+    return {
+        r["bidding_id"]: {
+            "boletim_id": r["boletim_id"],
+            "status_ia": r["status_ia"],
+            "link_drive": r["link_drive"],
+            "link_txt": r["link_txt"],
+            "data_processamento": r["data_processamento"],
+        }
+        for r in _consultar("SELECT * FROM licitacoes_processadas")
+    }
+
+
+def licitacao_processada(bidding_id):
+    return bool(_consultar("SELECT 1 FROM licitacoes_processadas WHERE bidding_id = ?", (str(bidding_id),)))
+
+
+def registrar_licitacao_processada(bidding_id, dados):
+    _executar(
+        """INSERT OR REPLACE INTO licitacoes_processadas
+           (bidding_id, boletim_id, status_ia, link_drive, link_txt, data_processamento)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        (str(bidding_id), dados.get("boletim_id"), dados.get("status_ia"), dados.get("link_drive"),
+         dados.get("link_txt"), datetime.now().isoformat())
+    )
+
+
+# =========================
+# ETAPAS POR LICITAÇÃO
+# =========================
+
+# Etapas da esteira registradas por licitação, para retomar após uma queda
+ETAPA_BAIXADO = "baixado"
+ETAPA_ANALISADO = "analisado"
+ETAPA_PASTA_DRIVE = "pasta_drive"        # pasta criada; arquivos enviados até agora
+ETAPA_ENVIADO_DRIVE = "enviado_drive"
+ETAPA_PLANILHA = "planilha"
+ETAPA_PIPEDRIVE = "pipedrive"
+
+
+def etapas_concluidas(bidding_id):
+    """etapa -> dados das etapas já concluídas da licitação."""
+    return {
+        r["etapa"]: json.loads(r["dados"]) if r["dados"] else {}
+        for r in _consultar("SELECT etapa, dados FROM etapas_licitacao WHERE bidding_id = ?", (str(bidding_id),))
+    }
+
+
+def registrar_etapa(bidding_id, etapa, dados=None):
+    _executar(
+        """INSERT OR REPLACE INTO etapas_licitacao (bidding_id, etapa, dados, concluida_em)
+           VALUES (?, ?, ?, ?)""",
+        (str(bidding_id), etapa, json.dumps(dados or {}, ensure_ascii=False), datetime.now().isoformat())
+    )
+
+
+# =========================
+# RESUMOS DO GEMINI
+# =========================
+
+def registrar_resumo(bidding_id, texto, link_txt=None):
+    _executar(
+        "INSERT OR REPLACE INTO resumos_ia (bidding_id, texto, link_txt, registrado_em) VALUES (?, ?, ?, ?)",
+        (str(bidding_id).strip(), texto, link_txt, datetime.now().isoformat())
+    )
+
+
+def resumo_salvo(bidding_id):
+    linhas = _consultar("SELECT texto FROM resumos_ia WHERE bidding_id = ?", (str(bidding_id).strip(),))
+    return linhas[0]["texto"] if linhas else None
+
+
+# =========================
+# ARQUIVOS NO DRIVE
+# =========================
+
+def drive_id_de(sha256):
+    """file_id de um upload anterior do mesmo conteúdo, se houver."""
+    linhas = _consultar("SELECT file_id FROM arquivos_drive WHERE sha256 = ?", (sha256,))
+    return linhas[0]["file_id"] if linhas else None
+
+
+def registrar_drive(sha256, file_id):
+    if not file_id:
+        return
+    _executar(
+        "INSERT OR REPLACE INTO arquivos_drive (sha256, file_id, registrado_em) VALUES (?, ?, ?)",
+        (sha256, file_id, datetime.now().isoformat())
+    )
+
+
+# =========================
+# LINHAS ARQUIVADAS
+# =========================
+
+def registrar_arquivadas(aba, destino, registros):
+    """Grava [(bidding_id, dados)] movidos da aba para `destino`."""
+    agora = datetime.now().isoformat()
+    with _lock:
+        conexao = conectar()
+        with conexao:
+            conexao.executemany(
+                """INSERT OR REPLACE INTO linhas_arquivadas (aba, bidding_id, destino, dados, arquivada_em)
+                   VALUES (?, ?, ?, ?, ?)""",
+                [(aba, str(bid).strip(), destino, json.dumps(dados, ensure_ascii=False), agora)
+                 for bid, dados in registros]
+            )
+
+
+def ids_arquivados(aba=None):
+    if aba:
+        linhas = _consultar("SELECT bidding_id FROM linhas_arquivadas WHERE aba = ?", (aba,))
+    else:
+        linhas = _consultar("SELECT bidding_id FROM linhas_arquivadas")
+    return {r["bidding_id"] for r in linhas}
+
+
+def linhas_arquivadas(aba):
+    return [json.loads(r["dados"]) for r in _consultar(
+        "SELECT dados FROM linhas_arquivadas WHERE aba = ? ORDER BY arquivada_em, rowid", (aba,)
+    )]
+
+
+# =========================
+# FEEDBACKS PROCESSADOS
+# =========================
+
+def feedbacks_processados():
+    return {
+        r["idconlicitacao"]: {
+            "classificacao": r["classificacao"],
+            "feedback": r["feedback"],
+            "edital": r["edital"],
+            "processado_em": r["processado_em"],
+        }
+        for r in _consultar("SELECT * FROM feedbacks_processados")
+    }
+
+
+def registrar_feedbacks(feedbacks):
+    """Grava {idconlicitacao: dados} numa única transação."""
+    with _lock:
+        conexao = conectar()
+        with conexao:
+            conexao.executemany(
+                """INSERT OR REPLACE INTO feedbacks_processados
+                   (idconlicitacao, classificacao, feedback, edital, processado_em)
+                   VALUES (?, ?, ?, ?, ?)""",
+                [
+                    (str(uid), d.get("classificacao"), d.get("feedback"), d.get("edital"), d.get("processado_em"))
+                    for uid, d in feedbacks.items()
+                ]
+            )
+
+
+# =========================
+# RELATÓRIOS
+# =========================
+
+def registrar_relatorio(stats):
+    _executar(
+        "INSERT INTO relatorio_coleta (data, dados) VALUES (?, ?)",
+        (stats.get("data"), json.dumps(stats, ensure_ascii=False))
+    )
+
+
+def relatorios():
+    return [json.loads(r["dados"]) for r in _consultar("SELECT dados FROM relatorio_coleta ORDER BY id")]
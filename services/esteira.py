@@ -0,0 +1,88 @@
+import queue
+import threading
+
+_FIM = object()
+INTERVALO_ESPERA = 0.5  # segundos entre chamadas de ao_aguardar na thread produtora
+
+
+class Etapa:
+    """Uma etapa da esteira: função aplicada por um pool de workers.
+
+    A função recebe a tarefa (dict) e devolve True para seguir para a
+    próxima etapa ou False para encerrar a tarefa ali mesmo."""
+
+    def __init__(self, nome, funcao, workers=1, tamanho_fila=10):
+        self.nome = nome
+        self.funcao = funcao
+        self.workers = workers
+        self.fila = queue.Queue(maxsize=tamanho_fila)
+        self.threads = []
+
+
+class Esteira:
+    """Pipeline produtor/consumidor com filas limitadas entre etapas.
+
+    `ao_concluir(tarefa)` é chamado quando a tarefa sai da esteira (última
+    etapa ou encerrada antes); `ao_falhar(tarefa, nome_etapa, erro)` quando
+    uma etapa levanta exceção. Ambos rodam nas threads dos workers.
+
+    `ao_aguardar()` roda na thread produtora enquanto ela espera espaço na
+    fila ou o fim dos workers (ex.: atender renovação de sessão)."""
+
+    def __init__(self, etapas, ao_concluir=None, ao_falhar=None, ao_aguardar=None):
+        self.etapas = etapas
+        self.ao_concluir = ao_concluir or (lambda tarefa: None)
+        self.ao_falhar = ao_falhar or (lambda tarefa, etapa, erro: None)
+        self.ao_aguardar = ao_aguardar or (lambda: None)
+
+    def iniciar(self):
+        for i, etapa in enumerate(self.etapas):
+            proxima = self.etapas[i + 1] if i + 1 < len(self.etapas) else None
+            for n in range(etapa.workers):
+                t = threading.Thread(
+                    target=self._worker,
+                    args=(etapa, proxima),
+                    name=f"esteira-{etapa.nome}-{n}",
+                    daemon=True
+                )
+                t.start()
+                etapa.threads.append(t)
+
+    def enviar(self, tarefa):
+        """Coloca a tarefa na primeira etapa (bloqueia se a fila estiver cheia)."""
+        self._colocar(self.etapas[0].fila, tarefa)
+
+    def finalizar(self):
+        """Drena as etapas em ordem e aguarda todos os workers terminarem."""
+        for etapa in self.etapas:
+            for _ in etapa.threads:
+                self._colocar(etapa.fila, _FIM)
+            for t in etapa.threads:
+                while t.is_alive():
+                    t.join(timeout=INTERVALO_ESPERA)
+                    self.ao_aguardar()
+
+    def _colocar(self, fila, tarefa):
+        while True:
+            try:
+                fila.put(tarefa, timeout=INTERVALO_ESPERA)
+                return
+            except queue.Full:
+                self.ao_aguardar()
+
+    def _worker(self, etapa, proxima):
+        while True:
+            tarefa = etapa.fila.get()
+            if tarefa is _FIM:
+                return
+
+            try:
+                seguir = etapa.funcao(tarefa)
+            except Exception as e:
+                self.ao_falhar(tarefa, etapa.nome, e)
+                continue
+
+            if seguir and proxima is not None:
+                proxima.fila.put(tarefa)
+            else:
+                self.ao_concluir(tarefa)
@@ -1,15 +1,15 @@
 import os
-import json
 from datetime import datetime
 import gspread
 from google.oauth2.service_account import Credentials
 from dotenv import load_dotenv
 
+from services import espelho_planilha, estado, resumos
+
 load_dotenv()
 
 SHEET_ID         = os.getenv("GOOGLE_SHEET_ID")
 CREDENTIALS_FILE = "credentials/google_service_account.json"
-CHECKPOINT_FILE  = "logs/feedbacks_processados.json"
 MEMORIA_FILE     = "memory/gemini_memoria.md"
 
 MARCADOR_OURO   = "## Padroes aprendidos — Editais OURO"
@@ -29,34 +29,29 @@ _NIVEL_DESC = {
 # CONEXÃO
 # =========================
 
-def _conectar_sheet(aba="aprovados"):
+def _conectar_planilha():
     scopes = [
         "https://www.googleapis.com/auth/spreadsheets",
         "https://www.googleapis.com/auth/drive",
     ]
     creds = Credentials.from_service_account_file(CREDENTIALS_FILE, scopes=scopes)
     client = gspread.authorize(creds)
-    return client.open_by_key(SHEET_ID).worksheet(aba)
+    return client.open_by_key(SHEET_ID)
+
 
 
 # =========================
 # CHECKPOINT
 # =========================
 
+# Feedbacks já processados ficam no SQLite de services/estado.py
+
 def _carregar_checkpoint():
-    if os.path.exists(CHECKPOINT_FILE):
-        try:
-            with open(CHECKPOINT_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return {}
-    return {}
+    return estado.feedbacks_processados()
 
 
 def _salvar_checkpoint(dados):
-    os.makedirs("logs", exist_ok=True)
-    with open(CHECKPOINT_FILE, "w", encoding="utf-8") as f:
-        json.dump(dados, f, indent=2, ensure_ascii=False)
+    estado.registrar_feedbacks(dados)
 
 
 # =========================
@@ -64,13 +59,15 @@ def _salvar_checkpoint(dados):
 # =========================
 
 def _ler_todos_feedbacks():
-    sheet = _conectar_sheet("aprovados")
-    rows  = sheet.get_all_values()
-    if len(rows) < 2:
-        return []
-    headers   = rows[0]
-    registros = [dict(zip(headers, row)) for row in rows[1:]]
-    return [r for r in registros if r.get("feedback_qualitativo", "").strip()]
+    # Espelho local: só relê a planilha se ela mudou desde a última leitura
+    espelho_planilha.sincronizar(_conectar_planilha())
+    vivos = [dados for _, dados in espelho_planilha.linhas_com_feedback("aprovados")]
+    # Linhas já arquivadas continuam no histórico usado para reconstruir as seções
+    arquivados = [
+        dados for dados in estado.linhas_arquivadas("aprovados")
+        if str(dados.get("feedback_qualitativo") or "").strip()
+    ]
+    return arquivados + vivos
 
 
 # =========================
@@ -122,7 +119,7 @@ def _bloco_edital(fb):
     valor      = fb.get("valor_estimado", "")
     modalidade = fb.get("modalidade", "")
     feedback   = fb.get("feedback_qualitativo", "").strip()
-    resumo     = (fb.get("resumo_ia") or "")[:200].strip()
+    resumo     = resumos.resumo_completo(fb)[:200].strip()
 
     bloco = (
         f"### {edital} — {cidade}/{uf}\n"
@@ -1,6 +1,6 @@
 import re
 import unicodedata
-from typing import List, Tuple
+from typing import Iterable, List, NamedTuple, Tuple
 
 
 def _normalizar(texto: str) -> str:
@@ -102,46 +102,114 @@ _AND: List[Tuple[re.Pattern, re.Pattern]] = [
 ]
 
 
-def licitacao_relevante(edital: str, descricao: str = "", itens: str = "") -> bool:
-    """Retorna True se a licitação é da área de saúde e não está na lista de exclusões."""
-    texto = _normalizar(f"{edital} {descricao} {itens}")
+# =====================================================
+# MATCHER COMPILADO — uma normalização e uma varredura
+# por padrão combinado, com resultado idêntico às
+# buscas individuais acima
+# =====================================================
+def _fatorar(padroes: List[re.Pattern]) -> Tuple[str, List[str]]:
+    """Tira o \\b inicial comum e devolve (prefixo, corpos).
 
-    for pattern in _EXCLUSOES:
-        if pattern.search(texto):
-            return False
+    Com todos os padrões no formato \\b<letra>..., o prefixo vira
+    \\b(?=[letras]) e o motor descarta de cara as posições que não são início
+    de palavra com uma dessas letras."""
+    corpos = [p.pattern[2:] for p in padroes]
+    if all(p.pattern.startswith(r"\b") for p in padroes) and all(c[:1].isalpha() for c in corpos):
+        iniciais = "".join(sorted({c[0] for c in corpos}))
+        return rf"\b(?=[{iniciais}])", corpos
+    return "", [p.pattern for p in padroes]
 
-    for pattern in _SIMPLES:
-        if pattern.search(texto):
-            return True
 
-    for p1, p2 in _AND:
-        if p1.search(texto) and p2.search(texto):
-            return True
+def _alternancia(padroes: List[re.Pattern]) -> re.Pattern:
+    prefixo, corpos = _fatorar(padroes)
+    return re.compile(prefixo + "(?:" + "|".join(corpos) + ")")
 
-    return False
 
+def _alternancia_nomeada(padroes: List[re.Pattern]) -> re.Pattern:
+    # Lookahead de largura zero: testa todas as posições sem consumir texto,
+    # então nenhum padrão fica escondido por outro. Em cada posição vence o
+    # primeiro padrão da lista, e o menor índice encontrado é o mesmo que o
+    # loop em ordem devolveria.
+    prefixo, corpos = _fatorar(padroes)
+    return re.compile(prefixo + "(?=" + "|".join(f"(?P<s{i}>{c})" for i, c in enumerate(corpos)) + ")")
 
-def licitacao_telemedicina(edital: str, descricao: str = "", itens: str = "") -> bool:
-    """Retorna True se o texto contém termos de telemedicina/teleconsulta."""
-    texto = _normalizar(f"{edital} {descricao} {itens}")
-    return any(p.search(texto) for p in _TELEMEDICINA)
 
+_EXCLUSOES_RE = _alternancia(_EXCLUSOES)
+_TELEMEDICINA_RE = _alternancia(_TELEMEDICINA)
+_SIMPLES_RE = _alternancia_nomeada(_SIMPLES)
 
-def motivo_match(edital: str, descricao: str = "", itens: str = "") -> str:
-    """Retorna o padrão que gerou o match, ou string vazia se excluído ou irrelevante."""
-    texto = _normalizar(f"{edital} {descricao} {itens}")
 
-    for pattern in _EXCLUSOES:
-        if pattern.search(texto):
+class Analise(NamedTuple):
+    excluida: bool
+    termo: str          # primeiro padrão simples na ordem de _SIMPLES ("" se nenhum)
+    par_and: str        # "p1 & p2" do primeiro par _AND presente ("" se nenhum)
+    telemedicina: bool
+
+    @property
+    def motivo(self) -> str:
+        if self.excluida:
             return ""
+        return self.termo or self.par_and
+
+    @property
+    def relevante(self) -> bool:
+        return bool(self.motivo)
 
-    for pattern in _SIMPLES:
-        m = pattern.search(texto)
-        if m:
-            return m.group(0)
 
+def _primeiro_simples(texto: str) -> str:
+    melhor, termo = len(_SIMPLES), ""
+    for m in _SIMPLES_RE.finditer(texto):
+        indice = int(m.lastgroup[1:])
+        if indice < melhor:
+            melhor, termo = indice, m.group(m.lastgroup)
+            if indice == 0:
+                break
+    return termo
+
+
+def _primeiro_and(texto: str) -> str:
     for p1, p2 in _AND:
         if p1.search(texto) and p2.search(texto):
             return f"{p1.pattern} & {p2.pattern}"
-
     return ""
+
+
+def analisar(edital: str, descricao: str = "", itens: str = "") -> Analise:
+    """Exclusão, termo positivo, par AND e telemedicina numa única chamada."""
+    texto = _normalizar(f"{edital} {descricao} {itens}")
+    telemedicina = bool(_TELEMEDICINA_RE.search(texto))
+
+    if _EXCLUSOES_RE.search(texto):
+        return Analise(True, "", "", telemedicina)
+
+    termo = _primeiro_simples(texto)
+    return Analise(False, termo, "" if termo else _primeiro_and(texto), telemedicina)
+
+
+def textos_bidding(item: dict) -> Tuple[str, str, str]:
+    """(edital, descricao, itens) de um item do biddings.json, como o coletor monta."""
+    edital = item.get("edital", "") or ""
+    descricao = item.get("descricao", "") or ""
+    itens = (item.get("itens", "") or "") + " " + (item.get("objeto", "") or "")
+    return edital, descricao, itens
+
+
+def analisar_lote(biddings: Iterable[dict]) -> List[Analise]:
+    """Analisa todos os itens de um boletim (ou de um backfill), na mesma ordem."""
+    return [analisar(*textos_bidding(item)) for item in biddings]
+
+
+def licitacao_relevante(edital: str, descricao: str = "", itens: str = "") -> bool:
+    """Retorna True se a licitação é da área de saúde e não está na lista de exclusões."""
+    return analisar(edital, descricao, itens).relevante
+
+
+def licitacao_telemedicina(edital: str, descricao: str = "", itens: str = "") -> bool:
+    """Retorna True se o texto contém termos de telemedicina/teleconsulta."""
+    texto = _normalizar(f"{edital} {descricao} {itens}")
+    return bool(_TELEMEDICINA_RE.search(texto))
+
+
+def motivo_match(edital: str, descricao: str = "", itens: str = "") -> str:
+    """Retorna o padrão que gerou o match, ou string vazia se excluído ou irrelevante."""
+    return analisar(edital, descricao, itens).motivo
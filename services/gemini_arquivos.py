@@ -0,0 +1,100 @@
+import io
+import os
+import threading
+import time
+
+from google.genai import types
+
+# Documentos grandes vão uma única vez pela Files API do Gemini e o mesmo
+# arquivo é referenciado em todas as tentativas, fallbacks de modelo e na
+# nova pergunta após truncamento. Os pequenos continuam inline.
+MODO = os.getenv("GEMINI_UPLOAD", "auto").lower()            # auto | sempre | nunca
+UPLOAD_ACIMA_MB = float(os.getenv("GEMINI_UPLOAD_ACIMA_MB", "4"))
+LIMITE_INLINE_MB = 20         # limite da requisição inline (documento + prompt)
+VALIDADE_S = 47 * 3600        # a API apaga o arquivo em 48 h
+ESPERA_PROCESSAMENTO_S = 60
+
+
+class ArquivosGemini:
+    """Arquivos enviados pela Files API, por hash do documento.
+
+    `parte` devolve o Part a enviar (inline ou referência ao arquivo). Os
+    arquivos só são apagados em `liberar_todos`, no fim da coleta: licitações
+    que compartilham o edital podem estar usando o mesmo arquivo. Contadores:
+    enviados, bytes_enviados e reaproveitados."""
+
+    def __init__(self, modo=MODO, upload_acima_mb=UPLOAD_ACIMA_MB):
+        self.modo = modo
+        self.upload_acima = upload_acima_mb * 1024 * 1024
+        self._arquivos = {}       # chave -> (nome, uri, mime_type, enviado_em)
+        self._travas = {}
+        self._lock = threading.Lock()
+
+        self.enviados = 0
+        self.bytes_enviados = 0
+        self.reaproveitados = 0
+
+    def usa_upload(self, tamanho, prompt_chars=0):
+        if self.modo == "nunca":
+            return False
+        if self.modo == "sempre":
+            return True
+        return tamanho >= self.upload_acima or tamanho + prompt_chars >= LIMITE_INLINE_MB * 1024 * 1024
+
+    def _trava(self, chave):
+        with self._lock:
+            return self._travas.setdefault(chave, threading.Lock())
+
+    def _aguardar_ativo(self, client, arquivo):
+        limite = time.monotonic() + ESPERA_PROCESSAMENTO_S
+        while arquivo.state == types.FileState.PROCESSING and time.monotonic() < limite:
+            time.sleep(1)
+            arquivo = client.files.get(name=arquivo.name)
+        if arquivo.state != types.FileState.ACTIVE and arquivo.state is not None:
+            raise Exception(f"Upload do documento não ficou ativo ({arquivo.state}): {arquivo.name}")
+        return arquivo
+
+    def parte(self, client, chave, dados, mime_type, prompt_chars=0):
+        """Part do documento: referência ao arquivo enviado (uma vez) ou bytes inline."""
+        if not self.usa_upload(len(dados), prompt_chars):
+            return types.Part.from_bytes(data=dados, mime_type=mime_type)
+
+        with self._trava(chave):
+            atual = self._arquivos.get(chave)
+            if atual and time.time() - atual[3] < VALIDADE_S:
+                self.reaproveitados += 1
+                return types.Part.from_uri(file_uri=atual[1], mime_type=atual[2])
+
+            inicio = time.monotonic()
+            arquivo = client.files.upload(
+                file=io.BytesIO(dados),
+                config=types.UploadFileConfig(mime_type=mime_type, display_name=f"edital-{chave}")
+            )
+            arquivo = self._aguardar_ativo(client, arquivo)
+            self._arquivos[chave] = (arquivo.name, arquivo.uri, mime_type, time.time())
+            self.enviados += 1
+            self.bytes_enviados += len(dados)
+            print(f"[GEMINI UPLOAD] {len(dados) / 1024 / 1024:.1f} MB enviados como {arquivo.name} "
+                  f"em {time.monotonic() - inicio:.1f}s")
+            return types.Part.from_uri(file_uri=arquivo.uri, mime_type=mime_type)
+
+    def descartar(self, chave):
+        """Esquece um arquivo que a API não reconhece mais (será reenviado)."""
+        with self._lock:
+            self._arquivos.pop(chave, None)
+
+    def liberar_todos(self, client):
+        """Remove os arquivos enviados neste processo (fim da coleta, sem
+        análises em voo). As travas ficam: podem estar em uso."""
+        with self._lock:
+            nomes = [atual[0] for atual in self._arquivos.values()]
+            self._arquivos.clear()
+        for nome in nomes:
+            try:
+                client.files.delete(name=nome)
+            except Exception as e:
+                print(f"[GEMINI UPLOAD] Falha ao remover {nome} ({type(e).__name__}): expira em 48 h")
+        return len(nomes)
+
+
+arquivos = ArquivosGemini()
@@ -0,0 +1,112 @@
+import hashlib
+import os
+import threading
+import time
+
+from google.genai import types
+
+from services.gemini_ritmo import eh_limite
+
+# Contexto explícito (cached content) do Gemini: o PROMPT_GERED + memória
+# operacional vira a system_instruction de um cache criado uma vez por modelo
+# e revisão do prompt, e cada análise envia só o PDF referenciando esse cache.
+CONTEXTO_ATIVO = os.getenv("GEMINI_CONTEXTO_CACHE", "1") == "1"
+CONTEXTO_TTL_S = int(os.getenv("GEMINI_CONTEXTO_TTL_S", "3600"))
+TOKENS_MINIMOS = int(os.getenv("GEMINI_CONTEXTO_TOKENS_MINIMOS", "1024"))  # a API recusa caches menores
+MARGEM_RENOVACAO_S = 120   # renova o TTL quando faltar menos que isso
+
+
+def _hash_prompt(prompt):
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class ContextosGemini:
+    """Cached contents por (modelo, prompt), reaproveitados entre editais.
+
+    Modelos que recusam o cache ficam marcados e seguem com o prompt inline;
+    falhas transitórias (429/503) só pulam o cache naquela chamada."""
+
+    def __init__(self, ativo=CONTEXTO_ATIVO, ttl_s=CONTEXTO_TTL_S):
+        self.ativo = ativo
+        self.ttl_s = ttl_s
+        self._contextos = {}        # (modelo, hash do prompt) -> (nome, expira_em)
+        self._sem_suporte = set()
+        self._travas = {}           # uma por chave: criação/renovação sem segurar as demais
+        self._lock = threading.Lock()
+
+        self.criados = 0
+
+    def _trava(self, chave):
+        with self._lock:
+            return self._travas.setdefault(chave, threading.Lock())
+
+    def obter(self, client, modelo, prompt):
+        """Nome do cached content com `prompt`, ou None para enviar inline."""
+        if not self.ativo or modelo in self._sem_suporte or len(prompt) // 4 < TOKENS_MINIMOS:
+            return None
+
+        chave = (modelo, _hash_prompt(prompt))
+        with self._trava(chave):
+            if modelo in self._sem_suporte:
+                return None
+            agora = time.monotonic()
+            with self._lock:
+                atual = self._contextos.get(chave)
+            if atual and atual[1] - agora > MARGEM_RENOVACAO_S:
+                return atual[0]
+
+            if atual:
+                try:
+                    client.caches.update(name=atual[0], config=types.UpdateCachedContentConfig(ttl=f"{self.ttl_s}s"))
+                    with self._lock:
+                        self._contextos[chave] = (atual[0], agora + self.ttl_s)
+                    return atual[0]
+                except Exception as e:
+                    print(f"[GEMINI CONTEXTO] Falha ao renovar {atual[0]} ({type(e).__name__}): recriando")
+                    with self._lock:
+                        self._contextos.pop(chave, None)
+
+            try:
+                contexto = client.caches.create(
+                    model=modelo,
+                    config=types.CreateCachedContentConfig(
+                        system_instruction=prompt,
+                        ttl=f"{self.ttl_s}s",
+                        display_name=f"gered-{chave[1][:12]}",
+                    )
+                )
+            except Exception as e:
+                erro_str = str(e)
+                if not (eh_limite(e) or "503" in erro_str or "UNAVAILABLE" in erro_str):
+                    self._sem_suporte.add(modelo)
+                print(f"[GEMINI CONTEXTO] {modelo} sem cache de contexto ({type(e).__name__}: {erro_str[:200]}): "
+                      f"prompt inline")
+                return None
+
+            with self._lock:
+                self._contextos[chave] = (contexto.name, agora + self.ttl_s)
+                self.criados += 1
+            print(f"[GEMINI CONTEXTO] {modelo}: contexto {contexto.name} criado (TTL {self.ttl_s}s)")
+            return contexto.name
+
+    def descartar(self, nome):
+        """Esquece um contexto que a API não reconhece mais (expirado/removido)."""
+        with self._lock:
+            for chave, (atual, _) in list(self._contextos.items()):
+                if atual == nome:
+                    del self._contextos[chave]
+
+    def liberar(self, client):
+        """Remove os contextos criados neste processo (fim da coleta)."""
+        with self._lock:
+            nomes = [nome for nome, _ in self._contextos.values()]
+            self._contextos.clear()
+        for nome in nomes:
+            try:
+                client.caches.delete(name=nome)
+            except Exception as e:
+                print(f"[GEMINI CONTEXTO] Falha ao remover {nome} ({type(e).__name__}): expira pelo TTL")
+        return len(nomes)
+
+
+contextos = ContextosGemini()
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import threading
+
+from services.gemini_ritmo import backoff
+from services.gemini_service import analisar_edital_async
+
+# Análises simultâneas em voo. O ritmo em si (RPM/TPM por modelo) é
+# controlado pelo governador em services/gemini_ritmo.py.
+CONCORRENCIA = int(os.getenv("GEMINI_CONCORRENCIA", "4"))
+MAX_TENTATIVAS = 3
+
+
+def _tokens_zerado():
+    return {"prompt_tokens": 0, "output_tokens": 0, "cached_tokens": 0, "cache_hit": False}
+
+
+class MotorGemini:
+    """Motor assíncrono de análise sobre o client.aio.
+
+    Um event loop próprio roda numa thread em segundo plano; `processar`
+    (uma análise) e `processar_lote` (várias) podem ser chamados de qualquer
+    thread e bloqueiam só quem chamou. No máximo `concorrencia` análises
+    ficam em voo ao mesmo tempo, somando todas as chamadas."""
+
+    def __init__(self, concorrencia=CONCORRENCIA, max_tentativas=MAX_TENTATIVAS):
+        self.concorrencia = max(1, concorrencia)
+        self.max_tentativas = max_tentativas
+        self._loop = None
+        self._thread = None
+        self._semaforo = None
+        self._lock = threading.Lock()
+
+    def _iniciar(self):
+        with self._lock:
+            if self._loop is not None:
+                return self._loop
+            self._loop = asyncio.new_event_loop()
+            self._semaforo = asyncio.Semaphore(self.concorrencia)
+            self._thread = threading.Thread(target=self._loop.run_forever, name="gemini-motor", daemon=True)
+            self._thread.start()
+            return self._loop
+
+    def fechar(self):
+        with self._lock:
+            if self._loop is None:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = self._thread = self._semaforo = None
+
+    # -------------------------
+    # ANÁLISE
+    # -------------------------
+
+    async def _analisar(self, pdf_path, prompt, min_chars=800, hash_arquivo=None):
+        async with self._semaforo:
+            for tentativa in range(1, self.max_tentativas + 1):
+                try:
+                    return await analisar_edital_async(
+                        pdf_path, prompt, min_chars=min_chars, hash_arquivo=hash_arquivo
+                    )
+                except Exception as e:
+                    espera = backoff(tentativa, base=5)
+                    print(f"[GEMINI MOTOR] Erro na tentativa {tentativa}/{self.max_tentativas}: "
+                          f"{type(e).__name__}: {e}")
+                    if tentativa < self.max_tentativas:
+                        print(f"[GEMINI MOTOR] Aguardando {espera:.1f}s...")
+                        await asyncio.sleep(espera)
+
+        print(f"[GEMINI MOTOR] Todas as tentativas falharam para: {pdf_path}")
+        return "", "ERRO", _tokens_zerado()
+
+    def _executar(self, corrotina):
+        loop = self._iniciar()
+        return asyncio.run_coroutine_threadsafe(corrotina, loop).result()
+
+    def processar(self, pdf_path, prompt, min_chars=800, hash_arquivo=None):
+        """(texto, status, tokens_info) de um edital."""
+        return self._executar(self._analisar(pdf_path, prompt, min_chars, hash_arquivo))
+
+    def processar_lote(self, itens):
+        """Analisa vários editais de uma vez (ex.: todos os PDFs de um boletim).
+
+        `itens`: {bidding_id: (pdf_path, prompt, min_chars, hash_arquivo)}.
+        Retorna {bidding_id: (texto, status, tokens_info)}."""
+        async def _lote():
+            resultados = await asyncio.gather(*(self._analisar(*args) for args in itens.values()))
+            return dict(zip(itens, resultados))
+
+        if not itens:
+            return {}
+        return self._executar(_lote())
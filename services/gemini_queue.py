@@ -1,33 +1,22 @@
-import time
-from services.gemini_service import analisar_edital
+from services.gemini_motor import CONCORRENCIA, MotorGemini
 
 
 class GeminiQueue:
+    """Interface usada pelo coletor. As análises vão para o MotorGemini:
+    até `concorrencia` em paralelo e sem espera fixa entre envios."""
 
-    def __init__(self, delay=10, max_retries=3):
-        self.delay = delay
-        self.max_retries = max_retries
+    def __init__(self, concorrencia=CONCORRENCIA, max_retries=3):
+        self.motor = MotorGemini(concorrencia=concorrencia, max_tentativas=max_retries)
 
-    def processar(self, pdf_path, prompt, min_chars=800):
+    @property
+    def concorrencia(self):
+        return self.motor.concorrencia
 
-        tentativa = 0
+    def processar(self, pdf_path, prompt, min_chars=800, hash_arquivo=None):
+        return self.motor.processar(pdf_path, prompt, min_chars=min_chars, hash_arquivo=hash_arquivo)
 
-        _tokens_zerado = {"prompt_tokens": 0, "output_tokens": 0, "cache_hit": False}
+    def processar_lote(self, itens):
+        return self.motor.processar_lote(itens)
 
-        while tentativa < self.max_retries:
-            try:
-                texto, status, tokens_info = analisar_edital(pdf_path, prompt, min_chars=min_chars)
-
-                time.sleep(self.delay)
-
-                return texto, status, tokens_info
-
-            except Exception as e:
-                tentativa += 1
-                espera = 5 * tentativa
-                print(f"[GEMINI QUEUE] Erro na tentativa {tentativa}/{self.max_retries}: {type(e).__name__}: {e}")
-                print(f"[GEMINI QUEUE] Aguardando {espera}s...")
-                time.sleep(espera)
-
-        print(f"[GEMINI QUEUE] Todas as tentativas falharam para: {pdf_path}")
-        return "", "ERRO", _tokens_zerado
\ No newline at end of file
+    def fechar(self):
+        self.motor.fechar()
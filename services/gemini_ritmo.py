@@ -0,0 +1,133 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+# Governador de ritmo das chamadas ao Gemini: baldes de requisições e tokens
+# por minuto, por modelo. Só chamadas reais à API passam por aqui — respostas
+# do cache_gemini não consomem nada.
+RPM_PADRAO = int(os.getenv("GEMINI_RPM", "60"))
+TPM_PADRAO = int(os.getenv("GEMINI_TPM", "1000000"))
+
+FATOR_MINIMO = 0.2          # orçamento mínimo após 429 seguidos (20% do configurado)
+REDUCAO_429 = 0.5           # cada 429 corta o orçamento pela metade
+RECUPERACAO_POR_MINUTO = 0.1  # sem 429, o orçamento volta 10% por minuto
+
+BACKOFF_MAXIMO = 60
+
+
+class _Balde:
+    """Token bucket que enche `capacidade` por minuto."""
+
+    def __init__(self, capacidade):
+        self.capacidade = capacidade
+        self.nivel = float(capacidade)
+        self.atualizado = time.monotonic()
+
+    def repor(self, agora, fator):
+        limite = self.capacidade * fator
+        self.nivel = min(limite, self.nivel + (agora - self.atualizado) * limite / 60)
+        self.atualizado = agora
+
+    def espera(self, quantidade, fator):
+        """Segundos até haver `quantidade` no balde (0 = já há)."""
+        limite = self.capacidade * fator
+        quantidade = min(quantidade, limite)   # pedido maior que o balde espera ele encher
+        falta = quantidade - self.nivel
+        return 0 if falta <= 0 else falta * 60 / limite
+
+
+class _LimiteModelo:
+    def __init__(self, rpm, tpm):
+        self.requisicoes = _Balde(rpm)
+        self.tokens = _Balde(tpm)
+        self.fator = 1.0
+        self.ultimo_ajuste = time.monotonic()
+
+    def repor(self, agora):
+        if self.fator < 1.0:
+            self.fator = min(1.0, self.fator + (agora - self.ultimo_ajuste) / 60 * RECUPERACAO_POR_MINUTO)
+        self.ultimo_ajuste = agora
+        self.requisicoes.repor(agora, self.fator)
+        self.tokens.repor(agora, self.fator)
+
+
+class GovernadorGemini:
+    """Reserva requisição + tokens estimados antes de cada chamada, acerta
+    com o usage_metadata depois e reduz o orçamento do modelo a cada 429."""
+
+    def __init__(self, rpm=RPM_PADRAO, tpm=TPM_PADRAO):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._modelos = {}
+        self._lock = threading.Lock()
+
+        self.espera_total = 0.0
+        self.limites_atingidos = 0
+
+    def _modelo(self, modelo):
+        if modelo not in self._modelos:
+            self._modelos[modelo] = _LimiteModelo(self.rpm, self.tpm)
+        return self._modelos[modelo]
+
+    def _reservar(self, modelo, tokens):
+        """Reserva se houver orçamento; senão devolve quantos segundos esperar."""
+        with self._lock:
+            limite = self._modelo(modelo)
+            limite.repor(time.monotonic())
+            espera = max(
+                limite.requisicoes.espera(1, limite.fator),
+                limite.tokens.espera(tokens, limite.fator),
+            )
+            if espera == 0:
+                limite.requisicoes.nivel -= 1
+                limite.tokens.nivel -= tokens
+            return espera
+
+    async def aguardar(self, modelo, tokens_estimados):
+        while True:
+            espera = self._reservar(modelo, tokens_estimados)
+            if espera == 0:
+                return
+            espera += random.uniform(0, 0.25)
+            self.espera_total += espera
+            await asyncio.sleep(espera)
+
+    def registrar_uso(self, modelo, tokens_estimados, tokens_reais):
+        """Acerta o balde de tokens com o consumo informado pela API."""
+        if not tokens_reais:
+            return
+        with self._lock:
+            self._modelo(modelo).tokens.nivel -= tokens_reais - tokens_estimados
+
+    def registrar_limite(self, modelo):
+        """429/RESOURCE_EXHAUSTED: corta o orçamento do modelo e esvazia os baldes."""
+        with self._lock:
+            limite = self._modelo(modelo)
+            limite.repor(time.monotonic())
+            limite.fator = max(FATOR_MINIMO, limite.fator * REDUCAO_429)
+            limite.requisicoes.nivel = min(limite.requisicoes.nivel, 0)
+            limite.tokens.nivel = min(limite.tokens.nivel, 0)
+            self.limites_atingidos += 1
+        print(f"[GEMINI RITMO] Limite atingido em {modelo}: orçamento reduzido a {limite.fator:.0%}")
+
+    def orcamento(self, modelo):
+        """(rpm, tpm) efetivos do modelo neste momento."""
+        with self._lock:
+            limite = self._modelo(modelo)
+            limite.repor(time.monotonic())
+            return round(self.rpm * limite.fator), round(self.tpm * limite.fator)
+
+
+def backoff(tentativa, base=2, maximo=BACKOFF_MAXIMO):
+    """Espera com jitter completo: uniforme entre 0 e base * 2^(tentativa-1)."""
+    return random.uniform(0, min(maximo, base * 2 ** max(tentativa - 1, 0)))
+
+
+def eh_limite(erro):
+    erro_str = str(erro)
+    return "429" in erro_str or "RESOURCE_EXHAUSTED" in erro_str or "quota" in erro_str.lower()
+
+
+governador = GovernadorGemini()
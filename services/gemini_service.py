@@ -1,12 +1,19 @@
 from google import genai
 from google.genai import types
+import asyncio
 import json
 import logging
 import re
-import time
+import threading
 import hashlib
 import os
 
+from services import gemini_ritmo
+from services.cache_gemini import cache
+from services.gemini_arquivos import arquivos
+from services.gemini_contexto import contextos
+from services.pdf_preprocessador import BYTES_POR_TOKEN, MODO_RECORTE, TOKENS_POR_PAGINA, preparar_pdf, nota_recorte
+
 logger = logging.getLogger("gemini_service")
 
 # =========================
@@ -21,14 +28,16 @@ MODELOS_FALLBACK = [
 
 
 MAX_OUTPUT_TOKENS = 4096
+TEMPERATURA = 0.0
 TEMPO_RETRY = 2
 MAX_RETRIES = 2
 
-CACHE_DIR = "cache_gemini"
+BYTES_POR_PAGINA_ESTIMADO = 60000   # só para estimar tokens quando o PDF não pôde ser lido
 
 # Preços gemini-2.5-flash (USD por milhão de tokens)
 PRECO_INPUT_USD_POR_MILHAO = 0.15
 PRECO_OUTPUT_USD_POR_MILHAO = 0.60
+PRECO_INPUT_CACHE_USD_POR_MILHAO = 0.0375   # tokens lidos de um contexto em cache
 
 
 # =========================
@@ -49,24 +58,6 @@ def gerar_hash(pdf_bytes):
     return hashlib.md5(pdf_bytes).hexdigest()
 
 
-def salvar_cache(hash_arquivo, resultado):
-    os.makedirs(CACHE_DIR, exist_ok=True)
-    caminho = os.path.join(CACHE_DIR, f"{hash_arquivo}.json")
-
-    with open(caminho, "w", encoding="utf-8") as f:
-        json.dump(resultado, f, ensure_ascii=False, indent=2)
-
-
-def carregar_cache(hash_arquivo):
-    caminho = os.path.join(CACHE_DIR, f"{hash_arquivo}.json")
-
-    if os.path.exists(caminho):
-        with open(caminho, "r", encoding="utf-8") as f:
-            return json.load(f)
-
-    return None
-
-
 # =========================
 # CLASSIFICAÇÃO
 # =========================
@@ -87,122 +78,279 @@ def _classificar_status(texto: str) -> str:
 
 
 # =========================
-# FUNÇÃO PRINCIPAL
+# CLIENTE
 # =========================
 
-def analisar_edital(caminho_pdf, prompt, min_chars=500):
+_cliente = None
+_cliente_lock = threading.Lock()
+
+
+def _novo_cliente():
     creds = carregar_credenciais()
     api_key = creds.get("gemini_api_key")
 
     if not api_key:
         raise Exception("GEMINI API KEY não encontrada no credentials.json")
 
-    client = genai.Client(api_key=api_key)
+    return genai.Client(api_key=api_key)
+
+
+def obter_cliente():
+    """genai.Client único do processo: credenciais lidas uma vez e conexões
+    reaproveitadas (o mesmo cliente atende client.models e client.aio)."""
+    global _cliente
+    with _cliente_lock:
+        if _cliente is None:
+            _cliente = _novo_cliente()
+        return _cliente
+
+
+# =========================
+# PREPARO E RESPOSTA
+# =========================
+
+def assinatura_config():
+    """Modelos e parâmetros que mudam o veredito: entram na chave do cache."""
+    return json.dumps({
+        "modelos": MODELOS_FALLBACK,
+        "temperature": TEMPERATURA,
+        "max_output_tokens": MAX_OUTPUT_TOKENS,
+        "recorte": MODO_RECORTE,
+    }, sort_keys=True)
+
+
+def _resposta_cache(hash_arquivo, prompt):
+    em_cache = cache.buscar(hash_arquivo, prompt, assinatura_config()) if hash_arquivo else None
+    if not em_cache:
+        return None
+    print("[GEMINI] Cache encontrado, evitando custo")
+    tokens_cache = {"prompt_tokens": 0, "output_tokens": 0, "cached_tokens": 0, "cache_hit": True}
+    return em_cache["texto"], em_cache["status"], tokens_cache
+
+
+def _preparar(caminho_pdf, prompt, hash_arquivo):
+    """Consulta o cache e, se não houver resultado, lê e recorta o PDF.
+
+    `hash_arquivo` (MD5 já calculado no download) permite consultar o cache
+    sem ler o PDF do disco. Retorna (resultado_do_cache, None) ou
+    (None, envio)."""
+    em_cache = _resposta_cache(hash_arquivo, prompt)
+    if em_cache:
+        return em_cache, None
 
     with open(caminho_pdf, "rb") as f:
         pdf_bytes = f.read()
 
     print(f"[GEMINI] PDF: {caminho_pdf} ({len(pdf_bytes)} bytes)")
 
-    # =========================
-    # CACHE
-    # =========================
-    hash_arquivo = gerar_hash(pdf_bytes)
-    cache = carregar_cache(hash_arquivo)
+    if not hash_arquivo:
+        hash_arquivo = gerar_hash(pdf_bytes)
+        em_cache = _resposta_cache(hash_arquivo, prompt)
+        if em_cache:
+            return em_cache, None
+
+    # Recorte das páginas relevantes; o cache continua pelo hash do PDF original
+    dados_envio, mime_type, recorte = preparar_pdf(pdf_bytes)
+
+    return None, {
+        "hash": hash_arquivo,
+        "prompt": prompt,
+        "recorte": recorte,
+        "tokens_estimados": _estimar_tokens(prompt, dados_envio, mime_type, recorte),
+        "nota": nota_recorte(recorte),
+        "dados": dados_envio,
+        "mime_type": mime_type,
+    }
+
+
+def _estimar_tokens(prompt, dados, mime_type, recorte):
+    """Tokens de entrada previstos, para reservar no governador antes da chamada."""
+    if mime_type == "text/plain":
+        documento = len(dados) // BYTES_POR_TOKEN
+    elif recorte["paginas_enviadas"]:
+        documento = recorte["paginas_enviadas"] * TOKENS_POR_PAGINA
+    else:
+        documento = max(1, len(dados) // BYTES_POR_PAGINA_ESTIMADO) * TOKENS_POR_PAGINA
+    return documento + len(prompt) // 4
+
+
+def _config(contexto=None):
+    return types.GenerateContentConfig(
+        temperature=TEMPERATURA,
+        max_output_tokens=MAX_OUTPUT_TOKENS,
+        cached_content=contexto
+    )
 
-    if cache:
-        print("[GEMINI] Cache encontrado, evitando custo")
-        tokens_cache = {"prompt_tokens": 0, "output_tokens": 0, "cache_hit": True}
-        return cache["texto"], cache["status"], tokens_cache
 
-    ultimo_erro = None
+def _requisicao(client, modelo, envio):
+    """(contents, config, contexto) da chamada. Com contexto em cache o prompt
+    já está na system_instruction e só o documento (e a nota do recorte) vai.
+    Documentos grandes são enviados uma vez pela Files API e reaproveitados
+    nas tentativas seguintes."""
+    contexto = contextos.obter(client, modelo, envio["prompt"])
+    prompt_inline = "" if contexto else envio["prompt"]
+    documento = arquivos.parte(client, envio["hash"], envio["dados"], envio["mime_type"], len(prompt_inline))
+    if contexto:
+        contents = [envio["nota"].strip(), documento] if envio["nota"] else [documento]
+    else:
+        contents = [prompt_inline + envio["nota"], documento]
+    return contents, _config(contexto), contexto
+
+
+# Respostas da API para contexto/arquivo expirado ou apagado
+_STATUS_REFERENCIA = ("NOT_FOUND", "PERMISSION_DENIED")
+
+
+def _falha_referencia(contexto, envio, erro):
+    """Contexto ou arquivo que a API não reconhece mais é recriado na próxima tentativa."""
+    codigo = getattr(erro, "code", None)
+    status = getattr(erro, "status", None) or ""
+    if codigo not in (403, 404) and status not in _STATUS_REFERENCIA:
+        return
+
+    # O 404 também vale para modelo inexistente: só descarta o recurso citado na mensagem
+    mensagem = str(getattr(erro, "message", None) or erro)
+    if contexto and ("CachedContent" in mensagem or contexto in mensagem):
+        print(f"[GEMINI CONTEXTO] {contexto} recusado pela API ({codigo} {status}): sera recriado")
+        contextos.descartar(contexto)
+    if re.search(r"\bFile\b|files/", mensagem):
+        arquivos.descartar(envio["hash"])
+
+
+def _processar_resposta(response, envio, min_chars, modelo=None):
+    texto = getattr(response, "text", "") or ""
+
+    if not texto:
+        raise Exception("Resposta vazia do Gemini")
+
+    # Resposta muito curta = provavelmente truncada ou bloqueada pelo modelo
+    if min_chars > 0 and len(texto) < min_chars:
+        print(f"[GEMINI] Resposta curta recebida ({len(texto)} chars): {texto[:300]!r}")
+        raise Exception(f"truncamento: resposta com apenas {len(texto)} chars")
+
+    recorte = envio["recorte"]
+    usage = getattr(response, "usage_metadata", None)
+    tokens_info = {
+        "prompt_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+        "output_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+        "cached_tokens": getattr(usage, "cached_content_token_count", 0) or 0,
+        "cache_hit": False,
+        "paginas_total": recorte["paginas_total"],
+        "paginas_enviadas": recorte["paginas_enviadas"],
+        "tokens_economizados": recorte["tokens_economizados"],
+    }
+
+    print(f"[GEMINI] OK | {len(texto)} chars | "
+          f"tokens entrada={tokens_info['prompt_tokens']} (cache={tokens_info['cached_tokens']}) "
+          f"saida={tokens_info['output_tokens']}")
+
+    status = _classificar_status(texto)
+    print(f"[GEMINI] Status: {status}")
+
+    cache.armazenar(envio["hash"], envio["prompt"], assinatura_config(),
+                    {"texto": texto, "status": status}, modelo=modelo)
+
+    return texto, status, tokens_info
+
+
+def _tratar_erro(modelo, tentativa, erro):
+    """Decide o que fazer após uma falha: "repetir", "proximo" (modelo) ou "falhar"."""
+    erro_str = str(erro)
+    logger.error(f"[ERRO GEMINI] modelo={modelo} tentativa={tentativa+1} {type(erro).__name__}: {erro_str}")
+    print(f"[ERRO GEMINI] {type(erro).__name__}: {erro_str}")
+
+    # Retry antes de fallback
+    if tentativa < MAX_RETRIES - 1:
+        return "repetir"
+
+    # Modelo indisponível, cota ou resposta truncada → tenta próximo
+    _pular = (
+        "429" in erro_str
+        or "503" in erro_str
+        or "UNAVAILABLE" in erro_str
+        or "RESOURCE_EXHAUSTED" in erro_str
+        or "quota" in erro_str.lower()
+        or "404" in erro_str
+        or "NOT_FOUND" in erro_str
+        or "truncamento" in erro_str
+    )
+    if _pular:
+        logger.warning(f"[GEMINI] Modelo {modelo} indisponível, tentando próximo...")
+        print(f"[GEMINI] Modelo {modelo} indisponível, tentando próximo...")
+        return "proximo"
 
-    # =========================
-    # LOOP DE MODELOS + RETRY
-    # =========================
-    for modelo in MODELOS_FALLBACK:
-        for tentativa in range(MAX_RETRIES):
-            try:
-                print(f"[GEMINI] Modelo: {modelo} | Tentativa: {tentativa + 1}")
+    return "falhar"
 
-                response = client.models.generate_content(
-                    model=modelo,
-                    contents=[
-                        prompt,
-                        types.Part.from_bytes(
-                            data=pdf_bytes,
-                            mime_type="application/pdf"
-                        )
-                    ],
-                    config=types.GenerateContentConfig(
-                        temperature=0.0,
-                        max_output_tokens=MAX_OUTPUT_TOKENS
-                    )
-                )
 
-                texto = getattr(response, "text", "") or ""
+# =========================
+# FUNÇÃO PRINCIPAL
+# =========================
 
-                if not texto:
-                    raise Exception("Resposta vazia do Gemini")
+def analisar_edital(caminho_pdf, prompt, min_chars=500, hash_arquivo=None):
+    """Versão síncrona de `analisar_edital_async` (scripts e chamadas avulsas).
 
-                # Resposta muito curta = provavelmente truncada ou bloqueada pelo modelo
-                if min_chars > 0 and len(texto) < min_chars:
-                    print(f"[GEMINI] Resposta curta recebida ({len(texto)} chars): {texto[:300]!r}")
-                    raise Exception(f"truncamento: resposta com apenas {len(texto)} chars")
+    Usa um cliente próprio, fechado ao fim: o pool HTTP do client.aio fica
+    preso ao event loop em que foi usado (o do motor, ou um asyncio.run anterior)."""
+    async def _analisar():
+        client = _novo_cliente()
+        try:
+            return await analisar_edital_async(caminho_pdf, prompt, min_chars, hash_arquivo, client=client)
+        finally:
+            await client.aio.aclose()
 
-                usage = getattr(response, "usage_metadata", None)
-                tokens_info = {
-                    "prompt_tokens": getattr(usage, "prompt_token_count", 0) or 0,
-                    "output_tokens": getattr(usage, "candidates_token_count", 0) or 0,
-                    "cache_hit": False
-                }
+    return asyncio.run(_analisar())
 
-                print(f"[GEMINI] OK | {len(texto)} chars | "
-                      f"tokens entrada={tokens_info['prompt_tokens']} "
-                      f"saida={tokens_info['output_tokens']}")
 
-                status = _classificar_status(texto)
-                print(f"[GEMINI] Status: {status}")
+async def analisar_edital_async(caminho_pdf, prompt, min_chars=500, hash_arquivo=None, client=None):
+    """Análise de um edital pelo client.aio: várias chamadas podem ficar em
+    voo ao mesmo tempo no mesmo event loop."""
+    # Leitura do disco e recorte do PDF ficam fora do event loop
+    resultado, envio = await asyncio.to_thread(_preparar, caminho_pdf, prompt, hash_arquivo)
+    if resultado:
+        return resultado
 
-                salvar_cache(hash_arquivo, {"texto": texto, "status": status})
+    client = client or obter_cliente()
+    ultimo_erro = None
 
-                return texto, status, tokens_info
+    for modelo in MODELOS_FALLBACK:
+        for tentativa in range(MAX_RETRIES):
+            contexto = None
+            try:
+                # Criar o contexto e enviar o documento são chamadas síncronas, feitas uma vez
+                contents, config, contexto = await asyncio.to_thread(_requisicao, client, modelo, envio)
+                await gemini_ritmo.governador.aguardar(modelo, envio["tokens_estimados"])
+                print(f"[GEMINI] Modelo: {modelo} | Tentativa: {tentativa + 1}")
 
-            except Exception as e:
-                erro_str = str(e)
-                logger.error(f"[ERRO GEMINI] modelo={modelo} tentativa={tentativa+1} {type(e).__name__}: {erro_str}")
-                print(f"[ERRO GEMINI] {type(e).__name__}: {erro_str}")
+                response = await client.aio.models.generate_content(
+                    model=modelo,
+                    contents=contents,
+                    config=config
+                )
+                resultado = _processar_resposta(response, envio, min_chars, modelo)
+                gemini_ritmo.governador.registrar_uso(modelo, envio["tokens_estimados"], resultado[2]["prompt_tokens"])
+                return resultado
 
-                # Retry antes de fallback
-                if tentativa < MAX_RETRIES - 1:
-                    time.sleep(TEMPO_RETRY)
+            except Exception as e:
+                _falha_referencia(contexto, envio, e)
+                if gemini_ritmo.eh_limite(e):
+                    gemini_ritmo.governador.registrar_limite(modelo)
+                acao = _tratar_erro(modelo, tentativa, e)
+                if acao == "repetir":
+                    await asyncio.sleep(gemini_ritmo.backoff(tentativa + 1, base=TEMPO_RETRY))
                     continue
-
-                # Modelo indisponível, cota ou resposta truncada → tenta próximo
-                _pular = (
-                    "429" in erro_str
-                    or "503" in erro_str
-                    or "UNAVAILABLE" in erro_str
-                    or "RESOURCE_EXHAUSTED" in erro_str
-                    or "quota" in erro_str.lower()
-                    or "404" in erro_str
-                    or "NOT_FOUND" in erro_str
-                    or "truncamento" in erro_str
-                )
-                if _pular:
-                    logger.warning(f"[GEMINI] Modelo {modelo} indisponível, tentando próximo...")
-                    print(f"[GEMINI] Modelo {modelo} indisponível, tentando próximo...")
+                if acao == "proximo":
                     ultimo_erro = e
                     break
-
                 raise
 
     raise Exception(f"Cota esgotada em todos os modelos. Último erro: {ultimo_erro}")
 
 
-def tokens_para_custo_usd(prompt_tokens: int, output_tokens: int) -> float:
+def tokens_para_custo_usd(prompt_tokens: int, output_tokens: int, cached_tokens: int = 0) -> float:
+    # prompt_tokens inclui os tokens lidos do contexto em cache
     return (
-        prompt_tokens * PRECO_INPUT_USD_POR_MILHAO / 1_000_000
+        (prompt_tokens - cached_tokens) * PRECO_INPUT_USD_POR_MILHAO / 1_000_000
+        + cached_tokens * PRECO_INPUT_CACHE_USD_POR_MILHAO / 1_000_000
         + output_tokens * PRECO_OUTPUT_USD_POR_MILHAO / 1_000_000
     )
 
@@ -215,13 +363,7 @@ if __name__ == "__main__":
     print("Testando Gemini...")
 
     try:
-        creds = carregar_credenciais()
-        api_key = creds.get("gemini_api_key")
-
-        if not api_key:
-            raise Exception("gemini_api_key não encontrada")
-
-        client = genai.Client(api_key=api_key)
+        client = obter_cliente()
 
         for modelo in MODELOS_FALLBACK:
             try:
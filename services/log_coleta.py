@@ -0,0 +1,183 @@
+import atexit
+import gzip
+import json
+import os
+import queue
+import shutil
+import sys
+import threading
+from datetime import datetime
+
+# Log da coleta em JSONL (uma entrada por linha), gravado por uma thread em
+# segundo plano. O arquivo é rotacionado quando passa de LOG_ROTACAO_MB ou
+# quando o dia muda, e o rotacionado é comprimido com gzip.
+LOG_FILE = os.path.join("logs", "coleta_log.jsonl")
+LOG_LEGADO_FILE = os.path.join("logs", "coleta_log.json")   # formato antigo (lista JSON)
+LOG_ROTACAO_MB = float(os.getenv("LOG_ROTACAO_MB", "20"))
+
+_FIM = object()
+
+
+class EscritorLog:
+    """Recebe entradas de qualquer thread e grava em lote, sem bloquear quem loga."""
+
+    def __init__(self, caminho=LOG_FILE, rotacao_bytes=LOG_ROTACAO_MB * 1024 * 1024):
+        self.caminho = caminho
+        self.rotacao_bytes = rotacao_bytes
+        self._fila = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._dia = None
+
+    def registrar(self, entrada):
+        if self._thread is None:
+            self._iniciar()
+        self._fila.put(entrada)
+
+    def _iniciar(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._executar, name="log-coleta", daemon=True)
+            self._thread.start()
+            atexit.register(self.fechar)
+
+    def fechar(self):
+        """Grava o que estiver pendente e encerra a thread."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._fila.put(_FIM)
+        self._thread.join()
+
+    # -------------------------
+    # GRAVAÇÃO
+    # -------------------------
+
+    def _executar(self):
+        os.makedirs(os.path.dirname(self.caminho) or ".", exist_ok=True)
+        self._dia = _dia_do_arquivo(self.caminho)
+
+        while True:
+            lote = [self._fila.get()]
+            # Junta o que já estiver na fila para gravar numa única escrita
+            while True:
+                try:
+                    lote.append(self._fila.get_nowait())
+                except queue.Empty:
+                    break
+
+            encerrar = any(entrada is _FIM for entrada in lote)
+            entradas = [entrada for entrada in lote if entrada is not _FIM]
+
+            try:
+                if entradas:
+                    self._gravar(entradas)
+            except Exception as e:
+                print(f"[LOG] Falha ao gravar {self.caminho}: {type(e).__name__}: {e}", file=sys.stderr)
+
+            if encerrar:
+                return
+
+    def _gravar(self, entradas):
+        hoje = datetime.now().strftime("%Y-%m-%d")
+        if self._dia and self._dia != hoje:
+            self._rotacionar()
+        elif os.path.exists(self.caminho) and os.path.getsize(self.caminho) >= self.rotacao_bytes:
+            self._rotacionar()
+
+        with open(self.caminho, "a", encoding="utf-8") as f:
+            for entrada in entradas:
+                f.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+        self._dia = self._dia or hoje
+
+    def _rotacionar(self):
+        if not os.path.exists(self.caminho):
+            self._dia = None
+            return
+
+        base, _ = os.path.splitext(self.caminho)
+        carimbo = datetime.now().strftime("%Y%m%d-%H%M%S")
+        destino = f"{base}-{carimbo}.jsonl.gz"
+        n = 1
+        while os.path.exists(destino):
+            destino = f"{base}-{carimbo}-{n:03d}.jsonl.gz"
+            n += 1
+        with open(self.caminho, "rb") as origem, gzip.open(destino, "wb") as saida:
+            shutil.copyfileobj(origem, saida)
+        os.unlink(self.caminho)
+        self._dia = None
+
+
+def _dia_do_arquivo(caminho):
+    """Dia (AAAA-MM-DD) da primeira entrada do arquivo atual, se houver."""
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            return json.loads(f.readline()).get("timestamp", "")[:10] or None
+    except Exception:
+        return None
+
+
+# =========================
+# LEITURA
+# =========================
+
+def _ler_arquivo(caminho):
+    if caminho.endswith(".json"):
+        # Formato antigo: lista JSON única
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                dados = json.load(f)
+        except Exception:
+            return
+        yield from (dados if isinstance(dados, list) else [])
+        return
+
+    abrir = gzip.open if caminho.endswith(".gz") else open
+    with abrir(caminho, "rt", encoding="utf-8") as f:
+        for linha in f:
+            linha = linha.strip()
+            if not linha:
+                continue
+            try:
+                yield json.loads(linha)
+            except json.JSONDecodeError:
+                continue  # linha truncada por queda no meio da escrita
+
+
+def arquivos_log(caminho=LOG_FILE, legado=LOG_LEGADO_FILE):
+    """Arquivos de log em ordem cronológica: legado, rotacionados e o atual."""
+    pasta = os.path.dirname(caminho) or "."
+    base = os.path.splitext(os.path.basename(caminho))[0]
+
+    rotacionados = []
+    if os.path.isdir(pasta):
+        rotacionados = sorted(
+            (os.path.join(pasta, nome) for nome in os.listdir(pasta)
+             if nome.startswith(base + "-") and nome.endswith(".jsonl.gz")),
+            key=os.path.getmtime
+        )
+
+    arquivos = [legado] if legado and os.path.exists(legado) else []
+    arquivos += rotacionados
+    if os.path.exists(caminho):
+        arquivos.append(caminho)
+    return arquivos
+
+
+def ler_log(caminho=LOG_FILE, legado=LOG_LEGADO_FILE):
+    """Itera todas as entradas, do formato antigo ao arquivo atual."""
+    for arquivo in arquivos_log(caminho, legado):
+        yield from _ler_arquivo(arquivo)
+
+
+# =========================
+# USO DIRETO
+# =========================
+
+if __name__ == "__main__":
+    # python -m services.log_coleta [NIVEL] — imprime o histórico como JSONL
+    nivel = sys.argv[1].upper() if len(sys.argv) > 1 else None
+    for entrada in ler_log():
+        if nivel and entrada.get("level") != nivel:
+            continue
+        print(json.dumps(entrada, ensure_ascii=False))
@@ -0,0 +1,186 @@
+import io
+import os
+import re
+import unicodedata
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # pypdf é opcional: sem ele o PDF segue inteiro
+    PdfReader = PdfWriter = None
+
+# =========================
+# CONFIGURAÇÕES
+# =========================
+
+# pdf = envia PDF só com as páginas selecionadas | texto = envia o texto delas
+# desligado = envia sempre o PDF completo
+MODO_RECORTE = os.getenv("GEMINI_PDF_RECORTE", "pdf").lower()
+
+TOKENS_POR_PAGINA = 258        # custo de entrada do Gemini por página de PDF
+BYTES_POR_TOKEN = 4            # estimativa para texto puro (modo "texto")
+PAGINAS_MINIMAS = 12           # abaixo disso não compensa recortar
+PAGINAS_INICIO = 3             # capa/preâmbulo: órgão, modalidade, datas
+PAGINAS_APOS_TITULO = 2        # seções costumam continuar nas páginas seguintes
+CHARS_MINIMOS_POR_PAGINA = 200 # média abaixo disso = PDF escaneado, sem texto
+PROPORCAO_MAXIMA = 0.8         # recorte com mais que isso das páginas não vale
+
+# Grupos de conteúdo que o GERED usa. Os obrigatórios precisam aparecer para o
+# recorte ser considerado confiável.
+_GRUPOS = {
+    "objeto": r"\bdo objeto\b|\bobjeto da (licitacao|contratacao)|\bobjeto\s*:",
+    "termo_referencia": r"termo de referencia|projeto basico|especificac(ao|oes) do(s)? servico",
+    "valores": r"valor (estimado|global|total|maximo|anual|mensal|unitario)|preco (unitario|maximo|de referencia)"
+               r"|planilha (de custos|orcamentaria|de precos)|orcamento estimado|r\$\s*\d",
+    "habilitacao": r"habilitacao|qualificacao tecnica|atestado(s)? de capacidade",
+    "execucao": r"especialidade|plant(ao|oes)|carga horaria|\bhoras\b|quantitativo|local de (execucao|prestacao)"
+                r"|telemedicina|teleconsulta",
+    "datas": r"sessao publica|abertura d(a|as) (sessao|propostas)|data de abertura|recebimento das propostas",
+}
+_OBRIGATORIOS = ("objeto", "valores", "habilitacao")
+
+_GRUPOS_RE = {nome: re.compile(padrao) for nome, padrao in _GRUPOS.items()}
+
+# Títulos de seção no início da página
+_TITULO_RE = re.compile(
+    r"termo de referencia|projeto basico|do objeto|da habilitacao|dos documentos de habilitacao"
+    r"|qualificacao tecnica|do valor|do preco|estimativa de (custos|precos)|planilha"
+)
+# Anexos de modelo/minuta: texto padrão que não muda a análise
+_BOILERPLATE_RE = re.compile(
+    r"minuta (do|de) contrato|minuta da ata|modelo de (declaracao|proposta|procuracao|carta)"
+    r"|declaracao de (inexistencia|cumprimento|que nao emprega)|ata da sessao"
+)
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize("NFKD", texto or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", texto.lower())
+
+
+def disponivel():
+    return PdfReader is not None and MODO_RECORTE != "desligado"
+
+
+# =========================
+# SELEÇÃO DE PÁGINAS
+# =========================
+
+def selecionar_paginas(textos):
+    """Escolhe as páginas relevantes a partir do texto de cada página.
+
+    Retorna (indices, grupos_encontrados). Lista vazia = sem confiança
+    para recortar."""
+    total = len(textos)
+    normalizados = [_normalizar(t) for t in textos]
+
+    if total < PAGINAS_MINIMAS:
+        return [], set()
+    if sum(len(t) for t in normalizados) / total < CHARS_MINIMOS_POR_PAGINA:
+        return [], set()
+
+    selecionadas = set(range(min(PAGINAS_INICIO, total)))
+    encontrados = set()
+    em_boilerplate = False
+
+    for i, texto in enumerate(normalizados):
+        cabecalho = texto[:400]
+        titulo = bool(_TITULO_RE.search(cabecalho))
+
+        if _BOILERPLATE_RE.search(cabecalho):
+            em_boilerplate = True
+        elif titulo:
+            em_boilerplate = False
+        if em_boilerplate:
+            continue
+
+        grupos = {nome for nome, padrao in _GRUPOS_RE.items() if padrao.search(texto)}
+        encontrados |= grupos
+
+        if titulo:
+            selecionadas.update(range(i, min(i + 1 + PAGINAS_APOS_TITULO, total)))
+        elif len(grupos) >= 2:
+            selecionadas.add(i)
+
+    if not all(g in encontrados for g in _OBRIGATORIOS):
+        return [], encontrados
+    if len(selecionadas) > total * PROPORCAO_MAXIMA:
+        return [], encontrados
+
+    return sorted(selecionadas), encontrados
+
+
+# =========================
+# PREPARO
+# =========================
+
+def preparar_pdf(pdf_bytes):
+    """Reduz o PDF às páginas que o GERED usa.
+
+    Retorna (dados, mime_type, info). Em qualquer dúvida devolve o PDF
+    completo; `info` traz páginas totais/enviadas e tokens economizados
+    (estimativa conforme o modo)."""
+    info = {"recortado": False, "paginas_total": 0, "paginas_enviadas": 0, "tokens_economizados": 0}
+
+    if not disponivel():
+        return pdf_bytes, "application/pdf", info
+
+    try:
+        leitor = PdfReader(io.BytesIO(pdf_bytes))
+        total = len(leitor.pages)
+        textos = [pagina.extract_text() or "" for pagina in leitor.pages]
+    except Exception as e:
+        print(f"[PDF] Não foi possível ler o texto do PDF ({type(e).__name__}): enviando completo")
+        return pdf_bytes, "application/pdf", info
+
+    info["paginas_total"] = info["paginas_enviadas"] = total
+    indices, _ = selecionar_paginas(textos)
+
+    if not indices:
+        return pdf_bytes, "application/pdf", info
+
+    if MODO_RECORTE == "texto":
+        dados = "\n\n".join(f"[PÁGINA {i + 1}/{total}]\n{textos[i]}" for i in indices).encode("utf-8")
+        mime_type = "text/plain"
+    else:
+        try:
+            escritor = PdfWriter()
+            for i in indices:
+                escritor.add_page(leitor.pages[i])
+            saida = io.BytesIO()
+            escritor.write(saida)
+            dados = saida.getvalue()
+        except Exception as e:
+            print(f"[PDF] Falha ao montar recorte ({type(e).__name__}): enviando completo")
+            return pdf_bytes, "application/pdf", info
+        mime_type = "application/pdf"
+
+    # PDF recortado: páginas a menos x custo por página. Texto: o PDF completo
+    # custaria total x custo por página; o texto enviado custa ~1 token a cada 4 bytes
+    if mime_type == "text/plain":
+        economizados = max(0, total * TOKENS_POR_PAGINA - len(dados) // BYTES_POR_TOKEN)
+    else:
+        economizados = (total - len(indices)) * TOKENS_POR_PAGINA
+
+    info.update({
+        "recortado": True,
+        "paginas_enviadas": len(indices),
+        "paginas": [i + 1 for i in indices],
+        "tokens_economizados": economizados,
+    })
+    print(f"[PDF] Recorte: {len(indices)}/{total} páginas "
+          f"(~{info['tokens_economizados']} tokens a menos)")
+    return dados, mime_type, info
+
+
+def nota_recorte(info):
+    """Aviso anexado ao prompt quando o documento foi recortado."""
+    if not info.get("recortado"):
+        return ""
+    paginas = ", ".join(str(p) for p in info["paginas"])
+    return (
+        "\n\nOBSERVAÇÃO: o documento enviado contém apenas as páginas "
+        f"{paginas} de {info['paginas_total']} do edital original, selecionadas por "
+        "conterem objeto, termo de referência, valores, habilitação e execução. "
+        "Anexos de minuta e modelos de declaração foram omitidos."
+    )
@@ -0,0 +1,70 @@
+import os
+import re
+
+from services import estado
+
+# completo = resumo_ia inteiro na coluna 16 | trecho = só o início + link do
+# TXT no Drive; o texto completo fica em logs/estado.db (tabela resumos_ia)
+MODO_PLANILHA = os.getenv("RESUMO_IA_PLANILHA", "completo").lower()
+
+TRECHO_CHARS = 600        # tamanho do trecho gravado na planilha
+LIMITE_CELULA = 50000     # limite de caracteres por célula do Google Sheets
+
+_MARCADOR = "[resumo completo: {link}]"
+_MARCADOR_RE = re.compile(r"\s*\[resumo completo: ([^\]]*)\]\s*$")
+_FILE_ID_RE = re.compile(r"/d/([\w-]+)")
+
+
+def valor_planilha(texto, link_txt=None):
+    """O que vai para a coluna resumo_ia conforme RESUMO_IA_PLANILHA. Mesmo no
+    modo completo, texto acima do limite da célula vira trecho."""
+    texto = texto or ""
+    marcador = _MARCADOR.format(link=link_txt or "sem link")
+    if MODO_PLANILHA != "trecho" and len(texto) < LIMITE_CELULA - len(marcador) - 2:
+        return texto
+    if len(texto) <= TRECHO_CHARS:
+        return texto
+
+    trecho = texto[:TRECHO_CHARS].rsplit(" ", 1)[0].rstrip()
+    return f"{trecho} …\n\n{marcador}"
+
+
+def eh_trecho(valor):
+    return bool(_MARCADOR_RE.search(valor or ""))
+
+
+def resumo_completo(dados):
+    """resumo_ia completo de um registro (linha da planilha ou dict interno).
+
+    Se a planilha guarda só o trecho, busca o texto no estado local e, se
+    não estiver lá, baixa o TXT do Drive (e guarda para a próxima vez)."""
+    valor = dados.get("resumo_ia") or ""
+    marcador = _MARCADOR_RE.search(valor)
+    if not marcador:
+        return valor
+
+    trecho = valor[:marcador.start()]
+    bidding_id = str(dados.get("idconlicitacao") or dados.get("bidding_id") or "").strip()
+    if not bidding_id:
+        return trecho
+
+    texto = estado.resumo_salvo(bidding_id)
+    if texto:
+        return texto
+
+    link = marcador.group(1)
+    file_id = _FILE_ID_RE.search(link)
+    if not file_id:
+        return trecho
+
+    try:
+        # Import tardio: drive_service exige GOOGLE_SHARED_DRIVE_ID, que só
+        # é necessário quando o resumo não está no estado local
+        from services.drive_service import baixar_texto
+        texto = baixar_texto(file_id.group(1))
+    except Exception as e:
+        print(f"[RESUMO] Não foi possível baixar o resumo de {bidding_id}: {type(e).__name__}: {e}")
+        return trecho
+
+    estado.registrar_resumo(bidding_id, texto, link)
+    return texto
@@ -0,0 +1,185 @@
+import re
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+TAMANHO_POOL = 10          # conexões keep-alive mantidas por host
+TIMEOUT_RENOVACAO = 60     # segundos que um worker espera a renovação dos cookies
+
+# Último segmento do caminho (sem query string) de um endpoint de login
+_LOGIN_RE = re.compile(r"(?:^|/)(?:login|sign_in|entrar|acessar)/?$", re.IGNORECASE)
+_HOST_LOGIN = "conlicitacao.com.br"
+
+
+def url_de_login(url):
+    """True se a URL aponta para a tela de login do portal."""
+    partes = urlparse(url)
+    host = partes.netloc.lower().split(":")[0]
+    if host.startswith("www."):
+        host = host[4:]
+    return host == _HOST_LOGIN or bool(_LOGIN_RE.search(partes.path))
+
+
+def pediu_login(resp):
+    """True se o portal respondeu 401 ou redirecionou para a tela de login."""
+    if resp.status_code == 401:
+        return True
+    if not resp.history:
+        return False
+    return url_de_login(resp.url)
+
+
+class SessaoPortal:
+    """Sessão HTTP autenticada única para todas as chamadas ao ConLicitação.
+
+    Mantém um pool de conexões keep-alive e copia os cookies do Playwright uma
+    única vez. Se o portal pedir login (401 ou redirect), os cookies são
+    obtidos de novo via `renovar_cookies` (padrão: `obter_cookies`) e a
+    requisição é repetida.
+
+    Os callbacks usam o Playwright e só podem rodar na thread que criou a
+    sessão. Workers que encontram a sessão expirada pedem a renovação e
+    aguardam a thread dona chamar `atender_renovacao()`.
+
+    Com um `CacheHTTP`, chamadas `get(..., cache=True)` enviam If-None-Match /
+    If-Modified-Since e um 304 é respondido com o corpo salvo em disco."""
+
+    def __init__(self, obter_cookies, renovar_cookies=None, tamanho_pool=TAMANHO_POOL, cache=None):
+        self._obter_cookies = obter_cookies
+        self._renovar_cookies = renovar_cookies or obter_cookies
+        self._thread_dona = threading.get_ident()
+
+        self.session = requests.Session()
+        self._adapter = HTTPAdapter(pool_maxsize=tamanho_pool)
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+
+        self._lock = threading.Lock()
+        self._renovada = threading.Condition(self._lock)
+        self._pedido_renovacao = threading.Event()
+        self._geracao = 0
+        self.cache = cache
+
+        self.requisicoes = 0
+        self.renovacoes = 0
+
+        self._copiar_cookies(self._obter_cookies())
+
+    # -------------------------
+    # COOKIES
+    # -------------------------
+
+    def _copiar_cookies(self, cookies):
+        self.session.cookies.clear()
+        for c in cookies:
+            self.session.cookies.set(c["name"], c["value"], domain=c.get("domain"))
+
+    def renovar(self, geracao=None):
+        """Recopia os cookies (thread dona). Ignora se outra renovação já ocorreu."""
+        with self._renovada:
+            if geracao is not None and geracao != self._geracao:
+                return
+            self._copiar_cookies(self._renovar_cookies())
+            self._geracao += 1
+            self.renovacoes += 1
+            self._renovada.notify_all()
+
+    def atender_renovacao(self):
+        """Atende pedidos de renovação feitos por workers. Chamar na thread dona."""
+        if self._pedido_renovacao.is_set():
+            self._pedido_renovacao.clear()
+            self.renovar()
+
+    def _aguardar_renovacao(self, geracao):
+        if threading.get_ident() == self._thread_dona:
+            self.renovar(geracao)
+            return True
+
+        self._pedido_renovacao.set()
+        with self._renovada:
+            return self._renovada.wait_for(lambda: self._geracao != geracao, timeout=TIMEOUT_RENOVACAO)
+
+    # -------------------------
+    # REQUISIÇÕES
+    # -------------------------
+
+    def _contar(self):
+        with self._lock:
+            self.requisicoes += 1
+
+    def _get(self, url, **kwargs):
+        geracao = self._geracao
+        self._contar()
+        resp = self.session.get(url, **kwargs)
+
+        if pediu_login(resp) and self._aguardar_renovacao(geracao):
+            resp.close()
+            self._contar()
+            resp = self.session.get(url, **kwargs)
+
+        return resp
+
+    def get(self, url, cache=False, **kwargs):
+        if not cache or self.cache is None:
+            return self._get(url, **kwargs)
+
+        cabecalhos = dict(kwargs.pop("headers", None) or {})
+        kwargs["stream"] = True
+
+        resp = self._get(url, headers={**cabecalhos, **self.cache.cabecalhos_condicionais(url)}, **kwargs)
+
+        if resp.status_code == 304:
+            resp.close()
+            meta, corpo = self.cache.abrir(url)
+            if meta is not None:
+                return self._resposta_do_cache(url, resp, meta, corpo)
+            # Entrada despejada entre a consulta e o 304: busca sem condicional
+            resp = self._get(url, headers=cabecalhos, **kwargs)
+
+        if not self.cache.armazenavel(resp):
+            return resp
+
+        with resp:
+            meta = self.cache.armazenar(url, resp)
+        if meta is None:
+            raise requests.exceptions.ChunkedEncodingError(f"Resposta truncada: {url}")
+
+        _, corpo = self.cache.abrir(url, revalidado=False)
+        if corpo is None:
+            return self._get(url, headers=cabecalhos, **kwargs)
+        return self._resposta_do_cache(url, resp, meta, corpo)
+
+    @staticmethod
+    def _resposta_do_cache(url, original, meta, corpo):
+        resp = requests.models.Response()
+        resp.status_code = 200
+        resp.reason = "OK"
+        resp.url = url
+        resp.request = original.request
+        resp.headers = CaseInsensitiveDict(meta.get("cabecalhos") or {})
+        resp.headers["Content-Length"] = str(meta["tamanho"])
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        resp.raw = corpo
+        resp.do_cache = True
+        return resp
+
+    # -------------------------
+    # MÉTRICAS
+    # -------------------------
+
+    def conexoes_abertas(self):
+        """Total de conexões TCP/TLS abertas pelo pool desde o início da sessão."""
+        pools = self._adapter.poolmanager.pools
+        total = 0
+        for chave in list(pools.keys()):
+            pool = pools.get(chave)
+            if pool is not None:
+                total += pool.num_connections
+        return total
+
+    def close(self):
+        self.session.close()
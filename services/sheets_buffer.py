@@ -0,0 +1,170 @@
+import re
+import threading
+import time
+
+from gspread.utils import rowcol_to_a1
+
+from services import sheets_update_service
+
+# Escrita agrupada na planilha: linhas ficam em memória por aba e vão num
+# único append_rows; flags de importado_pipedrive vão num único batch_update.
+LOTE_LINHAS = 20            # descarrega ao juntar tantas linhas pendentes
+INTERVALO_MAXIMO = 60       # segundos máximos que uma linha espera no buffer
+COLUNA_IMPORTADO = 15       # importado_pipedrive
+
+_RANGE_RE = re.compile(r"!A(\d+):")
+
+
+class EscritorPlanilha:
+    """Buffer de inserções no Google Sheets.
+
+    `adicionar` guarda a linha; a gravação acontece ao atingir LOTE_LINHAS,
+    em `descarregar()` ou, por um timer, INTERVALO_MAXIMO depois da primeira
+    linha pendente (mesmo que não cheguem outras). Depois de gravar, chama
+    `ao_gravar(contexto, nome_aba, linha)` com o índice real da linha para
+    cada inserção, na mesma ordem em que foram adicionadas."""
+
+    def __init__(self, spreadsheet, ao_gravar=None, lote=LOTE_LINHAS, intervalo=INTERVALO_MAXIMO):
+        self.spreadsheet = spreadsheet
+        self.ao_gravar = ao_gravar or (lambda contexto, aba, linha: None)
+        self.lote = lote
+        self.intervalo = intervalo
+
+        self._abas = {}
+        self._pendentes = {}      # aba -> [(bidding_id, valores, contexto)]
+        self._flags = {}          # aba -> {linha} com importado já gravado, aguardando TRUE
+        self._linhas = {}         # bidding_id -> (aba, linha) já gravados
+        self._desde = None
+        self._timer = None
+        self._lock = threading.RLock()
+
+        self.chamadas_api = 0
+
+    # -------------------------
+    # ABAS
+    # -------------------------
+
+    def aba(self, nome):
+        """Worksheet em cache (spreadsheet.worksheet() custa uma leitura de metadados)."""
+        with self._lock:
+            if nome not in self._abas:
+                self._abas[nome] = self.spreadsheet.worksheet(nome)
+                self.chamadas_api += 1
+            return self._abas[nome]
+
+    # -------------------------
+    # ESCRITA
+    # -------------------------
+
+    def adicionar(self, nome_aba, bidding_id, valores, contexto=None):
+        with self._lock:
+            self._pendentes.setdefault(nome_aba, []).append((str(bidding_id), list(valores), contexto))
+            if self._desde is None:
+                self._desde = time.monotonic()
+                self._agendar(self.intervalo)
+            if self._total_pendente() >= self.lote or time.monotonic() - self._desde >= self.intervalo:
+                self.descarregar()
+
+    def _agendar(self, segundos):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(segundos, self._descarregar_vencido)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _descarregar_vencido(self):
+        """Timer: grava o que está pendente há INTERVALO_MAXIMO; se falhar, tenta de novo."""
+        with self._lock:
+            self._timer = None
+            if not self._total_pendente():
+                return
+            try:
+                self.descarregar()
+            except Exception as e:
+                print(f"[SHEETS] Falha ao gravar linhas pendentes por tempo: {type(e).__name__}: {e}")
+                self._agendar(self.intervalo)
+
+    def marcar_importado(self, bidding_id, aba=None, linha=None):
+        """Marca importado_pipedrive=TRUE: direto na linha se ainda estiver no
+        buffer, senão entra no próximo batch_update. `aba`/`linha` informam
+        onde está uma linha gravada por outra execução (retomada)."""
+        bidding_id = str(bidding_id)
+        with self._lock:
+            for pendentes in self._pendentes.values():
+                for pid, valores, _ in pendentes:
+                    if pid == bidding_id:
+                        valores[COLUNA_IMPORTADO - 1] = "TRUE"
+                        return True
+            if bidding_id in self._linhas:
+                aba, linha = self._linhas[bidding_id]
+            if not (aba and linha):
+                print(f"[SHEETS] AVISO: linha do bidding {bidding_id} desconhecida; "
+                      f"importado_pipedrive não marcado")
+                return False
+            self._flags.setdefault(aba, set()).add(int(linha))
+            return True
+
+    def linha_de(self, bidding_id):
+        """(aba, linha) de uma inserção já gravada, ou None se ainda pendente."""
+        with self._lock:
+            return self._linhas.get(str(bidding_id))
+
+    def pendentes(self):
+        with self._lock:
+            return self._total_pendente()
+
+    def _total_pendente(self):
+        return sum(len(p) for p in self._pendentes.values())
+
+    def descarregar(self):
+        """Grava as linhas pendentes (um append_rows por aba) e as flags (um batch_update)."""
+        with self._lock:
+            for nome_aba in list(self._pendentes):
+                pendentes = self._pendentes[nome_aba]
+                if not pendentes:
+                    continue
+
+                resp = self.aba(nome_aba).append_rows(
+                    [valores for _, valores, _ in pendentes],
+                    value_input_option="USER_ENTERED"
+                )
+                self.chamadas_api += 1
+                del self._pendentes[nome_aba]
+
+                inicio = None
+                m = _RANGE_RE.search((resp or {}).get("updates", {}).get("updatedRange", ""))
+                if m:
+                    inicio = int(m.group(1))
+
+                sheets_update_service.registrar_insercao(
+                    self.aba(nome_aba), [bidding_id for bidding_id, _, _ in pendentes], inicio
+                )
+                print(f"{len(pendentes)} linha(s) inserida(s) na aba {nome_aba}"
+                      + (f" (linhas {inicio}-{inicio + len(pendentes) - 1})" if inicio else ""))
+
+                for offset, (bidding_id, _, contexto) in enumerate(pendentes):
+                    linha = inicio + offset if inicio else None
+                    if linha:
+                        self._linhas[bidding_id] = (nome_aba, linha)
+                    try:
+                        self.ao_gravar(contexto, nome_aba, linha)
+                    except Exception as e:
+                        print(f"[SHEETS] Falha pós-gravação do bidding {bidding_id}: {type(e).__name__}: {e}")
+
+            self._desde = None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._gravar_flags()
+
+    def _gravar_flags(self):
+        dados = [
+            {"range": f"{aba}!{rowcol_to_a1(linha, COLUNA_IMPORTADO)}", "values": [["TRUE"]]}
+            for aba, linhas in self._flags.items()
+            for linha in sorted(linhas)
+        ]
+        if not dados:
+            return
+        self.spreadsheet.values_batch_update({"valueInputOption": "USER_ENTERED", "data": dados})
+        self.chamadas_api += 1
+        self._flags = {}
@@ -1,9 +1,176 @@
+import threading
+
+from gspread.utils import rowcol_to_a1
+
+# Colunas de status das abas aprovados/reprovados
+COLUNA_ID = 2               # B: idconlicitacao / bidding_id
+COLUNA_APROVADO = 13        # M: aprovado_ia
+COLUNA_LINK_DRIVE = 14      # N: link_drive_edital
+COLUNA_IMPORTADO = 15       # O: importado_pipedrive
+
+_CAMPOS_COLUNAS = {
+    "aprovado": COLUNA_APROVADO,
+    "link_drive": COLUNA_LINK_DRIVE,
+    "importado": COLUNA_IMPORTADO,
+}
+
+_indices = {}               # (planilha, aba) -> IndiceLinhas
+_lock_indices = threading.Lock()
+
+
+def _chave(sheet):
+    return getattr(sheet, "spreadsheet_id", None), getattr(sheet, "title", None)
+
+
+class IndiceLinhas:
+    """Mapa bidding_id -> linha de uma aba, lido uma única vez.
+
+    A coluna B é carregada na primeira consulta; depois disso inserções
+    (`registrar_insercao`) e exclusões (`registrar_exclusoes`) mantêm o mapa
+    válido sem reler a planilha."""
+
+    def __init__(self, sheet):
+        self.sheet = sheet
+        self._linhas = None
+        self._total = 0           # última linha ocupada (inclui o cabeçalho)
+        self._lock = threading.RLock()
+
+    @property
+    def carregado(self):
+        return self._linhas is not None
+
+    def carregar(self):
+        """(Re)lê a coluna B — 1 chamada à API."""
+        with self._lock:
+            valores = self.sheet.col_values(COLUNA_ID)
+            self._linhas = {}
+            for linha, valor in enumerate(valores[1:], start=2):
+                valor = str(valor).strip()
+                if valor:
+                    self._linhas.setdefault(valor, linha)   # duplicado: vale a primeira
+            self._total = len(valores)
+        return self
+
+    def _mapa(self):
+        if self._linhas is None:
+            self.carregar()
+        return self._linhas
+
+    def linha(self, bidding_id):
+        with self._lock:
+            return self._mapa().get(str(bidding_id).strip())
+
+    def __contains__(self, bidding_id):
+        return self.linha(bidding_id) is not None
+
+    def registrar_insercao(self, bidding_ids, primeira_linha=None):
+        """Registra linhas acrescentadas por append (em ordem). Sem
+        `primeira_linha`, assume que foram para o fim da aba. Índice ainda não
+        lido não precisa de ajuste: a primeira leitura já verá as linhas."""
+        with self._lock:
+            if self._linhas is None:
+                return
+            linha = primeira_linha or self._total + 1
+            for bidding_id in bidding_ids:
+                self._linhas.setdefault(str(bidding_id).strip(), linha)
+                linha += 1
+            self._total = max(self._total, linha - 1)
+
+    def registrar_exclusoes(self, linhas):
+        """Ajusta o mapa a linhas removidas da aba (números anteriores à remoção)."""
+        with self._lock:
+            if self._linhas is None:
+                return
+            for removida in sorted(set(linhas), reverse=True):
+                for bidding_id, atual in list(self._linhas.items()):
+                    if atual == removida:
+                        del self._linhas[bidding_id]
+                    elif atual > removida:
+                        self._linhas[bidding_id] = atual - 1
+                self._total = max(self._total - 1, 1)
+
+    def excluir(self, bidding_id):
+        """Remove a linha da aba e desloca o índice das linhas abaixo."""
+        with self._lock:
+            linha = self.linha(bidding_id)
+            if linha is None:
+                return False
+            self.sheet.delete_rows(linha)
+            self.registrar_exclusoes([linha])
+            return True
+
+    # -------------------------
+    # ATUALIZAÇÃO EM LOTE
+    # -------------------------
+
+    def atualizar_status_lote(self, atualizacoes):
+        """Grava M/N/O de várias licitações num único batch_update.
+
+        `atualizacoes`: {bidding_id: {"aprovado": ..., "link_drive": ...,
+        "importado": ...}} (qualquer subconjunto das chaves). Retorna os
+        bidding_ids que não estão na aba."""
+        with self._lock:
+            por_linha = {}
+            ausentes = []
+            for bidding_id, campos in atualizacoes.items():
+                linha = self.linha(bidding_id)
+                if linha is None:
+                    ausentes.append(bidding_id)
+                else:
+                    por_linha.setdefault(linha, {}).update(campos)
+
+            atualizar_status_linhas(self.sheet, por_linha)
+            if ausentes:
+                print(f"[SHEETS] {len(ausentes)} licitação(ões) fora da aba {self.sheet.title}: {ausentes[:10]}")
+            return ausentes
+
+
+# =========================
+# ÍNDICES COMPARTILHADOS
+# =========================
+
+def indice(sheet):
+    """Índice único por aba no processo, compartilhado com quem insere e exclui linhas."""
+    with _lock_indices:
+        chave = _chave(sheet)
+        if chave not in _indices:
+            _indices[chave] = IndiceLinhas(sheet)
+        return _indices[chave]
+
+
+def registrar_insercao(sheet, bidding_ids, primeira_linha=None):
+    with _lock_indices:
+        atual = _indices.get(_chave(sheet))
+    if atual:
+        atual.registrar_insercao(bidding_ids, primeira_linha)
+
+
+def registrar_exclusoes(sheet, linhas):
+    with _lock_indices:
+        atual = _indices.get(_chave(sheet))
+    if atual:
+        atual.registrar_exclusoes(linhas)
+
+
+# =========================
+# ESCRITA
+# =========================
+
+def atualizar_status_linhas(sheet, atualizacoes):
+    """Grava M/N/O de várias linhas num único batch_update.
+
+    `atualizacoes`: {linha: {"aprovado": ..., "link_drive": ...,
+    "importado": ...}} (qualquer subconjunto das chaves)."""
+    dados = [
+        {"range": rowcol_to_a1(linha, _CAMPOS_COLUNAS[campo]), "values": [[valor]]}
+        for linha, campos in sorted(atualizacoes.items())
+        for campo, valor in campos.items()
+    ]
+    if dados:
+        sheet.batch_update(dados, value_input_option="USER_ENTERED")
+    return len(atualizacoes)
+
+
 def atualizar_status_planilha(sheet, bidding_id, aprovado, link_drive):
-    col_ids = sheet.col_values(2)
-
-    for i, val in enumerate(col_ids):
-        if val == str(bidding_id):
-            linha = i + 1
-            sheet.update(f"M{linha}", aprovado)  # aprovado_ia
-            sheet.update(f"N{linha}", link_drive)  # link_drive_edital
-            break
+    """Atualiza aprovado_ia e link_drive_edital de uma licitação pelo índice da aba."""
+    indice(sheet).atualizar_status_lote({bidding_id: {"aprovado": aprovado, "link_drive": link_drive}})
@@ -0,0 +1,143 @@
+import os
+import re
+import sys
+
+import gspread
+import pytest
+from gspread.utils import a1_to_rowcol
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services import arquivamento, espelho_planilha, estado, sheets_update_service  # noqa: E402
+
+CABECALHO = ["boletim_id", "idconlicitacao", "data_coleta", "importado_pipedrive", "classificacao",
+             "feedback_qualitativo"]
+_FAIXA_RE = re.compile(r"^([A-Z]*)(\d*):([A-Z]*)(\d*)$")
+
+
+class _Aba:
+    def __init__(self, planilha, titulo, linhas, sheet_id):
+        self.planilha = planilha
+        self.title = titulo
+        self.id = sheet_id
+        self.spreadsheet_id = planilha.id
+        self.grade = [list(CABECALHO)] + [list(linha) for linha in linhas]
+
+    def col_values(self, coluna):
+        return [linha[coluna - 1] for linha in self.grade]
+
+    def row_values(self, linha):
+        return list(self.grade[linha - 1])
+
+    def batch_get(self, faixas):
+        respostas = []
+        for faixa in faixas:
+            c1, l1, c2, l2 = _FAIXA_RE.match(faixa).groups()
+            c1 = a1_to_rowcol(f"{c1}1")[1] if c1 else 1
+            c2 = a1_to_rowcol(f"{c2}1")[1] if c2 else len(CABECALHO)
+            respostas.append([linha[c1 - 1:c2] for linha in self.grade[int(l1) - 1:int(l2 or l1)]])
+        return respostas
+
+    def update(self, valores, faixa):
+        self.grade = [list(v) for v in valores]
+
+    def append_rows(self, linhas, value_input_option=None):
+        self.grade.extend(list(linha) for linha in linhas)
+        self.planilha.ao_copiar()
+
+
+class _Planilha:
+    id = "planilha"
+
+    def __init__(self, linhas):
+        self.abas = {"aprovados": _Aba(self, "aprovados", linhas, 1)}
+        self.ao_copiar = lambda: None
+
+    def get_lastUpdateTime(self):
+        return None
+
+    def worksheet(self, nome):
+        if nome not in self.abas:
+            raise gspread.WorksheetNotFound(nome)
+        return self.abas[nome]
+
+    def add_worksheet(self, title, rows, cols):
+        self.abas[title] = _Aba(self, title, [], len(self.abas) + 1)
+        return self.abas[title]
+
+    def batch_update(self, corpo):
+        for requisicao in corpo["requests"]:
+            faixa = requisicao["deleteDimension"]["range"]
+            aba = next(a for a in self.abas.values() if a.id == faixa["sheetId"])
+            del aba.grade[faixa["startIndex"]:faixa["endIndex"]]
+
+
+def _ids(aba):
+    return [linha[1] for linha in aba.grade[1:]]
+
+
+@pytest.fixture
+def bancos(monkeypatch, tmp_path):
+    for modulo, atributo in ((estado, "ESTADO_DB"), (espelho_planilha, "ESPELHO_DB")):
+        monkeypatch.setattr(modulo, atributo, str(tmp_path / f"{atributo}.db"))
+        monkeypatch.setattr(modulo, "_conexao", None)
+    monkeypatch.setattr(sheets_update_service, "_indices", {})
+    monkeypatch.chdir(tmp_path)
+    yield
+    for modulo in (estado, espelho_planilha):
+        if modulo._conexao is not None:
+            modulo._conexao.close()
+
+
+ANTIGA, RECENTE = "2020-01-15", "2999-01-01"
+
+
+def test_arquiva_antigas_por_mes(bancos):
+    planilha = _Planilha([["1", "10", ANTIGA], ["1", "11", RECENTE], ["1", "12", "2020-02-03"]])
+    indice = sheets_update_service.indice(planilha.abas["aprovados"]).carregar()
+
+    resultado = arquivamento.arquivar(planilha, abas=("aprovados",), horizonte_dias=90)
+
+    assert resultado == {"aprovados": 2}
+    assert _ids(planilha.abas["aprovados"]) == ["11"]
+    assert _ids(planilha.abas["aprovados_2020-01"]) == ["10"]
+    assert _ids(planilha.abas["aprovados_2020-02"]) == ["12"]
+    assert estado.ids_arquivados("aprovados") == {"10", "12"}
+    assert indice.linha("11") == 2 and "10" not in indice      # índice de linhas acompanha a exclusão
+
+
+def test_linhas_deslocadas_sao_remapeadas_antes_da_exclusao(bancos):
+    planilha = _Planilha([["1", "10", ANTIGA], ["1", "11", RECENTE], ["1", "12", ANTIGA]])
+    viva = planilha.abas["aprovados"]
+
+    # Alguém insere uma linha no topo depois da sincronização do espelho
+    def inserir_no_topo():
+        if "99" not in _ids(viva):
+            viva.grade.insert(1, ["2", "99", RECENTE])
+
+    planilha.ao_copiar = inserir_no_topo
+    arquivamento.arquivar(planilha, abas=("aprovados",), horizonte_dias=90)
+
+    assert _ids(viva) == ["99", "11"]
+
+
+def test_conferir_ignora_ausentes_e_duplicados():
+    planilha = _Planilha([["1", "10"], ["1", "13"], ["1", "12"], ["1", "13"]])
+
+    linhas = arquivamento._conferir_linhas(
+        planilha.abas["aprovados"], [(2, "10"), (2, "12"), (6, "13"), (9, "14")]
+    )
+
+    # 12 mudou para a linha 4; 13 está duplicado fora da posição esperada; 14 sumiu
+    assert linhas == [2, 4]
+
+
+def test_execucao_interrompida_nao_copia_de_novo(bancos):
+    planilha = _Planilha([["1", "10", ANTIGA]])
+    estado.registrar_arquivadas("aprovados", "planilha:aprovados_2020-01",
+                                [("10", dict(zip(CABECALHO, ["1", "10", ANTIGA])))])
+
+    arquivamento.arquivar(planilha, abas=("aprovados",), horizonte_dias=90)
+
+    assert _ids(planilha.abas["aprovados"]) == []
+    assert "aprovados_2020-01" not in planilha.abas
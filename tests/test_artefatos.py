@@ -0,0 +1,63 @@
+import hashlib
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services import artefatos  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def armazenamento(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(artefatos, "_digests", {})
+
+
+def test_conteudo_igual_vira_um_objeto_so():
+    conteudo = b"edital" * 1000
+
+    a = artefatos.gravar_stream(io.BytesIO(conteudo), os.path.join("downloads", "1", "edital.pdf"), chunk=777)
+    b = artefatos.gravar_stream(io.BytesIO(conteudo), os.path.join("downloads", "2", "anexo.pdf"))
+
+    assert a == b == {
+        "sha256": hashlib.sha256(conteudo).hexdigest(),
+        "md5": hashlib.md5(conteudo).hexdigest(),
+        "tamanho": len(conteudo),
+    }
+    objetos = [os.path.join(raiz, nome) for raiz, _, nomes in os.walk(artefatos.OBJETOS_DIR) for nome in nomes]
+    assert objetos == [artefatos._caminho_objeto(a["sha256"])]
+    assert os.path.samefile(os.path.join("downloads", "1", "edital.pdf"), os.path.join("downloads", "2", "anexo.pdf"))
+
+
+def test_regravar_destino_troca_o_vinculo():
+    destino = os.path.join("downloads", "1", "edital.pdf")
+    artefatos.gravar_stream(io.BytesIO(b"versao 1"), destino)
+    artefatos.gravar_stream(io.BytesIO(b"versao 2"), destino)
+
+    with open(destino, "rb") as f:
+        assert f.read() == b"versao 2"
+    assert artefatos.digest_de(destino)["sha256"] == hashlib.sha256(b"versao 2").hexdigest()
+
+
+def test_falha_na_leitura_nao_deixa_temporario():
+    class _Quebrado:
+        def read(self, tamanho):
+            raise IOError("conexão caiu")
+
+    with pytest.raises(IOError):
+        artefatos.gravar_stream(_Quebrado(), os.path.join("downloads", "1", "edital.pdf"))
+    assert not [nome for _, _, nomes in os.walk(artefatos.OBJETOS_DIR) for nome in nomes]
+
+
+def test_digest_de_arquivo_externo_e_memorizado(tmp_path):
+    caminho = tmp_path / "solto.pdf"
+    caminho.write_bytes(b"conteudo avulso")
+
+    digest = artefatos.digest_de(caminho)
+    caminho.write_bytes(b"mudou depois")
+
+    assert digest["md5"] == hashlib.md5(b"conteudo avulso").hexdigest()
+    assert artefatos.digest_de(caminho) is digest
@@ -0,0 +1,122 @@
+import io
+import os
+import sys
+import time
+
+import pytest
+import requests
+from requests.structures import CaseInsensitiveDict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.cache_http import CacheHTTP  # noqa: E402
+from services.sessao_portal import SessaoPortal  # noqa: E402
+
+
+def _resposta(status, corpo=b"", **cabecalhos):
+    resp = requests.models.Response()
+    resp.status_code = status
+    resp.headers = CaseInsensitiveDict(cabecalhos)
+    resp.raw = io.BytesIO(corpo)
+    resp.url = "https://portal/x"
+    return resp
+
+
+class _Portal:
+    """Servidor falso: responde 304 quando o validador enviado confere."""
+
+    def __init__(self):
+        self.arquivos = {}      # url -> (corpo, etag)
+        self.pedidos = []
+        self.truncar = False
+
+    def get(self, url, headers=None, **kwargs):
+        headers = headers or {}
+        self.pedidos.append(dict(headers))
+        corpo, etag = self.arquivos[url]
+        if etag and headers.get("If-None-Match") == etag:
+            return _resposta(304)
+        cabecalhos = {"Content-Length": str(len(corpo) + (5 if self.truncar else 0))}
+        if etag:
+            cabecalhos.update({"ETag": etag, "Last-Modified": "Mon, 01 Jan 2026 00:00:00 GMT"})
+        return _resposta(200, corpo, **cabecalhos)
+
+
+@pytest.fixture
+def sessao(tmp_path):
+    portal = _Portal()
+    sessao = SessaoPortal(lambda: [], cache=CacheHTTP(str(tmp_path / "cache"), max_bytes=1024 * 1024))
+    sessao.session.get = portal.get
+    sessao.portal = portal
+    yield sessao
+    sessao.close()
+
+
+def test_revalida_e_serve_304_do_disco(sessao):
+    sessao.portal.arquivos["u"] = (b"edital" * 100, '"v1"')
+
+    primeira = sessao.get("u", cache=True)
+    assert primeira.content == b"edital" * 100
+    assert sessao.portal.pedidos[0] == {}
+
+    segunda = sessao.get("u", cache=True)
+    assert segunda.content == b"edital" * 100
+    assert segunda.do_cache
+    assert sessao.portal.pedidos[1]["If-None-Match"] == '"v1"'
+    assert sessao.portal.pedidos[1]["If-Modified-Since"] == "Mon, 01 Jan 2026 00:00:00 GMT"
+    assert (sessao.cache.hits, sessao.cache.misses, sessao.cache.bytes_economizados) == (1, 1, 600)
+
+
+def test_conteudo_novo_substitui_a_entrada(sessao):
+    sessao.portal.arquivos["u"] = (b"antigo", '"v1"')
+    sessao.get("u", cache=True).content
+    sessao.portal.arquivos["u"] = (b"novo", '"v2"')
+
+    assert sessao.get("u", cache=True).content == b"novo"
+    assert sessao.get("u", cache=True).content == b"novo"
+    assert sessao.cache.hits == 1
+
+
+def test_sem_validador_nao_armazena(sessao):
+    sessao.portal.arquivos["u"] = (b"dinamico", None)
+
+    assert sessao.get("u", cache=True).content == b"dinamico"
+    assert sessao.cache.buscar("u") is None
+    assert sessao.cache.cabecalhos_condicionais("u") == {}
+
+
+def test_resposta_truncada_nao_entra_no_cache(sessao):
+    sessao.portal.arquivos["u"] = (b"pela metade", '"v1"')
+    sessao.portal.truncar = True
+
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        sessao.get("u", cache=True)
+    assert sessao.cache.buscar("u") is None
+
+
+def test_304_de_entrada_despejada_busca_de_novo(sessao):
+    sessao.portal.arquivos["u"] = (b"conteudo", '"v1"')
+    sessao.get("u", cache=True).content
+    sessao.cache.abrir = lambda url, revalidado=True: (None, None)   # despejada após a consulta
+
+    resp = sessao.get("u", cache=True)
+
+    assert resp.status_code == 200
+    assert sessao.portal.pedidos[-1] == {}
+
+
+def test_despejo_por_tamanho_remove_o_acesso_mais_antigo(tmp_path):
+    cache = CacheHTTP(str(tmp_path / "cache"), max_bytes=250)
+    for url in ("a", "b"):
+        cache.armazenar(url, _resposta(200, b"x" * 100, ETag=f'"{url}"'))
+        time.sleep(0.01)
+    cache.abrir("a")[1].close()          # "a" passa a ser a mais recente
+    time.sleep(0.01)
+
+    cache.armazenar("c", _resposta(200, b"x" * 100, ETag='"c"'))
+
+    assert cache.buscar("a") and cache.buscar("c")
+    assert cache.buscar("b") is None
+
+    # Índice reconstruído do disco por outra instância
+    assert {meta["url"] for meta, _ in CacheHTTP(str(tmp_path / "cache")).entradas()} == {"a", "c"}
@@ -0,0 +1,110 @@
+import os
+import re
+import sys
+
+import pytest
+from gspread.utils import a1_to_rowcol
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services import espelho_planilha  # noqa: E402
+
+CABECALHO = ["boletim_id", "idconlicitacao", "edital", "resumo_ia", "aprovado_ia", "importado_pipedrive"]
+_FAIXA_RE = re.compile(r"^([A-Z]*)(\d*):([A-Z]*)(\d*)$")
+
+
+def _coluna(letra, padrao):
+    return a1_to_rowcol(f"{letra}1")[1] if letra else padrao
+
+
+class _Aba:
+    def __init__(self, linhas):
+        self.grade = [list(CABECALHO)] + [list(linha) for linha in linhas]
+        self.leituras = []
+
+    def col_values(self, coluna):
+        self.leituras.append(f"col {coluna}")
+        return [linha[coluna - 1] for linha in self.grade]
+
+    def batch_get(self, faixas):
+        self.leituras.extend(faixas)
+        respostas = []
+        for faixa in faixas:
+            c1, l1, c2, l2 = _FAIXA_RE.match(faixa).groups()
+            c1, c2 = _coluna(c1, 1), _coluna(c2, len(CABECALHO))
+            linhas = self.grade[int(l1) - 1:int(l2 or l1)]
+            respostas.append([linha[c1 - 1:c2] for linha in linhas])
+        return respostas
+
+
+class _Planilha:
+    id = "planilha"
+
+    def __init__(self):
+        self.modificada_em = "t1"
+        self.abas = {
+            "aprovados": _Aba([["1", "10", "edital 10", "resumo longo", "SIM", "FALSE"],
+                               ["1", "11", "edital 11", "resumo longo", "SIM", "FALSE"]]),
+            "reprovados": _Aba([["1", "20", "edital 20", "resumo", "NAO", ""]]),
+        }
+
+    def get_lastUpdateTime(self):
+        return self.modificada_em
+
+    def worksheet(self, nome):
+        return self.abas[nome]
+
+
+@pytest.fixture
+def planilha(monkeypatch, tmp_path):
+    monkeypatch.setattr(espelho_planilha, "ESPELHO_DB", str(tmp_path / "espelho.db"))
+    monkeypatch.setattr(espelho_planilha, "_conexao", None)
+    yield _Planilha()
+    espelho_planilha._conexao.close()
+
+
+def test_planilha_inalterada_nao_e_lida(planilha):
+    assert set(espelho_planilha.sincronizar(planilha)) == {"aprovados", "reprovados"}
+    leituras = len(planilha.abas["aprovados"].leituras)
+
+    assert espelho_planilha.sincronizar(planilha) == {}
+    assert len(planilha.abas["aprovados"].leituras) == leituras
+    assert espelho_planilha.ids("aprovados") == {"10", "11"}
+
+
+def test_marca_dagua_por_aba(planilha):
+    espelho_planilha.sincronizar(planilha, ("aprovados",))
+
+    # Mesmo modifiedTime: "reprovados" ainda não foi espelhada e precisa ser lida
+    resultado = espelho_planilha.sincronizar(planilha)
+
+    assert list(resultado) == ["reprovados"]
+    assert espelho_planilha.ids("reprovados") == {"20"}
+    assert espelho_planilha.sincronizar(planilha) == {}
+
+
+def test_incremental_le_so_editaveis_e_linhas_novas(planilha):
+    espelho_planilha.sincronizar(planilha, ("aprovados",))
+    aba = planilha.abas["aprovados"]
+    aba.grade[2][5] = "TRUE"                                   # 11 importada
+    aba.grade.insert(1, ["2", "12", "edital 12", "resumo novo", "SIM", ""])   # nova, desloca as demais
+    del aba.grade[2]                                           # 10 removida
+    aba.leituras.clear()
+    planilha.modificada_em = "t2"
+
+    contagem = espelho_planilha.sincronizar(planilha, ("aprovados",))["aprovados"]
+
+    assert contagem == {"linhas": 2, "novas": 1, "atualizadas": 1, "removidas": 1}
+    assert aba.leituras == ["col 2", "1:1", "E2:F3", "A2:F2"]  # resumo_ia da 11 não é relido
+    assert espelho_planilha.registros("aprovados") == [
+        (2, dict(zip(CABECALHO, ["2", "12", "edital 12", "resumo novo", "SIM", ""]))),
+        (3, dict(zip(CABECALHO, ["1", "11", "edital 11", "resumo longo", "SIM", "TRUE"]))),
+    ]
+    assert espelho_planilha.aprovados_nao_importados() == [(2, espelho_planilha.registros("aprovados")[0][1])]
+
+
+def test_sem_modifiedtime_sempre_sincroniza(planilha):
+    planilha.get_lastUpdateTime = lambda: (_ for _ in ()).throw(RuntimeError("drive fora do ar"))
+
+    espelho_planilha.sincronizar(planilha, ("reprovados",))
+    assert espelho_planilha.sincronizar(planilha, ("reprovados",)) != {}
@@ -0,0 +1,88 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services import estado  # noqa: E402
+
+
+def _gravar(caminho, conteudo):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, "w", encoding="utf-8") as f:
+        f.write(conteudo if isinstance(conteudo, str) else json.dumps(conteudo))
+
+
+@pytest.fixture
+def reabrir(monkeypatch, tmp_path):
+    """Banco novo em tmp_path; cada chamada simula um novo processo."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(estado, "ESTADO_DB", str(tmp_path / "logs" / "estado.db"))
+    monkeypatch.setattr(estado, "_conexao", None)
+
+    def _reabrir():
+        if estado._conexao is not None:
+            estado._conexao.close()
+        estado._conexao = None
+        return estado.conectar()
+
+    yield _reabrir
+    if estado._conexao is not None:
+        estado._conexao.close()
+
+
+def test_migra_json_antigos_uma_vez(reabrir):
+    _gravar(estado.LEGADO_ULTIMO_BOLETIM, {"ultimo_id": 42, "data_processamento": "2026-01-01T00:00:00"})
+    _gravar(estado.LEGADO_LICITACOES, {"7": {"boletim_id": 42, "status_ia": "SIM", "link_drive": "d"}})
+    _gravar(estado.LEGADO_FEEDBACKS, {"7": {"classificacao": "ouro", "feedback": "bom"}})
+    _gravar(estado.LEGADO_RELATORIO, [{"data": "2026-01-01", "licitacoes_coletadas": 3}])
+
+    reabrir()
+
+    assert estado.obter_ultimo_boletim() == 42
+    assert estado.licitacoes_processadas()["7"]["status_ia"] == "SIM"
+    assert "7" in estado.feedbacks_processados()
+    assert len(estado.relatorios()) == 1
+
+    # O JSON continua no disco, mas não é importado de novo
+    estado.salvar_ultimo_boletim(50)
+    reabrir()
+    assert estado.obter_ultimo_boletim() == 50
+    assert len(estado.relatorios()) == 1
+
+
+def test_json_ilegivel_fica_pendente(reabrir):
+    _gravar(estado.LEGADO_LICITACOES, '{"7": {"status_ia": "SIM"')     # gravação interrompida
+
+    reabrir()
+    assert estado.licitacoes_processadas() == {}
+
+    _gravar(estado.LEGADO_LICITACOES, {"7": {"status_ia": "SIM"}})
+    reabrir()
+    assert "7" in estado.licitacoes_processadas()
+
+
+def test_sem_json_antigo_registra_migracao(reabrir):
+    conexao = reabrir()
+    feitas = {r["nome"] for r in conexao.execute("SELECT nome FROM migracoes")}
+    assert estado.LEGADO_RELATORIO in feitas
+
+    # JSON que aparece depois não é importado
+    _gravar(estado.LEGADO_ULTIMO_BOLETIM, {"ultimo_id": 99})
+    reabrir()
+    assert estado.obter_ultimo_boletim() == 0
+
+
+def test_etapas_e_mapa_do_drive(reabrir):
+    reabrir()
+    estado.registrar_etapa(7, estado.ETAPA_PLANILHA, {"aba": "aprovados", "row_idx": 12})
+    estado.registrar_drive("abc", "file-1")
+    estado.registrar_drive("abc", "file-2")
+    estado.registrar_drive("vazio", None)
+
+    reabrir()
+    assert estado.etapas_concluidas("7") == {estado.ETAPA_PLANILHA: {"aba": "aprovados", "row_idx": 12}}
+    assert estado.drive_id_de("abc") == "file-2"
+    assert estado.drive_id_de("vazio") is None
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services import gemini_motor, gemini_service  # noqa: E402
+from services.gemini_motor import MotorGemini  # noqa: E402
+
+
+def _analise_falsa(em_voo, pico, falhar=()):
+    async def analisar(pdf_path, prompt, min_chars=500, hash_arquivo=None):
+        em_voo.append(pdf_path)
+        pico[0] = max(pico[0], len(em_voo))
+        await asyncio.sleep(0.2)
+        em_voo.remove(pdf_path)
+        if pdf_path in falhar:
+            raise Exception("503 UNAVAILABLE")
+        return f"texto {pdf_path}", "SIM", {"prompt_tokens": 1, "output_tokens": 1, "cached_tokens": 0}
+    return analisar
+
+
+def test_lote_devolve_resultado_por_licitacao(monkeypatch):
+    em_voo, pico = [], [0]
+    monkeypatch.setattr(gemini_motor, "analisar_edital_async", _analise_falsa(em_voo, pico, falhar=("c.pdf",)))
+    monkeypatch.setattr(gemini_motor, "backoff", lambda tentativa, base: 0)
+    motor = MotorGemini(concorrencia=3, max_tentativas=2)
+
+    inicio = time.monotonic()
+    resultados = motor.processar_lote({
+        bidding_id: (f"{bidding_id}.pdf", "prompt", 800, None) for bidding_id in ("a", "b", "c", "d", "e", "f")
+    })
+    duracao = time.monotonic() - inicio
+    motor.fechar()
+
+    assert list(resultados) == ["a", "b", "c", "d", "e", "f"]
+    assert resultados["a"][:2] == ("texto a.pdf", "SIM")
+    assert resultados["c"][1] == "ERRO"
+    assert pico[0] == 3
+    assert duracao < 1.0      # 6 análises de 0,2 s em paralelo, não 1,2 s em série
+
+
+def test_lote_vazio_nao_inicia_o_loop():
+    motor = MotorGemini()
+    assert motor.processar_lote({}) == {}
+    assert motor._loop is None
+
+
+def test_analisar_edital_usa_cliente_proprio(monkeypatch):
+    fechados = []
+
+    class _Aio:
+        async def aclose(self):
+            fechados.append(True)
+
+    class _Cliente:
+        aio = _Aio()
+
+    clientes = []
+
+    async def analisar(caminho_pdf, prompt, min_chars=500, hash_arquivo=None, client=None):
+        clientes.append(client)
+        return "texto", "SIM", {}
+
+    monkeypatch.setattr(gemini_service, "_novo_cliente", _Cliente)
+    monkeypatch.setattr(gemini_service, "analisar_edital_async", analisar)
+
+    # Dois asyncio.run seguidos: cada um com o seu cliente
+    assert gemini_service.analisar_edital("a.pdf", "prompt")[1] == "SIM"
+    assert gemini_service.analisar_edital("b.pdf", "prompt")[1] == "SIM"
+    assert len(clientes) == 2 and clientes[0] is not clientes[1]
+    assert fechados == [True, True]
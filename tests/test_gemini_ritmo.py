@@ -0,0 +1,80 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services import gemini_ritmo  # noqa: E402
+from services.gemini_ritmo import GovernadorGemini  # noqa: E402
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr(gemini_ritmo.time, "monotonic", lambda: agora[0])
+    return agora
+
+
+def test_balde_de_requisicoes(relogio):
+    governador = GovernadorGemini(rpm=2, tpm=10 ** 6)
+
+    assert governador._reservar("m", 10) == 0
+    assert governador._reservar("m", 10) == 0
+    assert governador._reservar("m", 10) == pytest.approx(30)     # 1 requisição a cada 30 s
+
+    relogio[0] += 30
+    assert governador._reservar("m", 10) == 0
+
+
+def test_balde_de_tokens_e_acerto_pelo_uso_real(relogio):
+    governador = GovernadorGemini(rpm=100, tpm=1000)
+
+    assert governador._reservar("m", 800) == 0
+    assert governador._reservar("m", 800) == pytest.approx(36)    # faltam 600 tokens a 1000/min
+
+    # Estimou 800, a API contou 200: devolve 600 ao balde
+    governador.registrar_uso("m", 800, 200)
+    assert governador._reservar("m", 800) == 0
+
+
+def test_modelos_tem_orcamentos_separados(relogio):
+    governador = GovernadorGemini(rpm=1, tpm=10 ** 6)
+
+    assert governador._reservar("a", 1) == 0
+    assert governador._reservar("b", 1) == 0
+    assert governador._reservar("a", 1) > 0
+
+
+def test_429_reduz_orcamento_e_recupera_com_o_tempo(relogio):
+    governador = GovernadorGemini(rpm=100, tpm=10000)
+
+    governador.registrar_limite("m")
+    assert governador.orcamento("m") == (50, 5000)
+    assert governador._reservar("m", 1) > 0                       # baldes esvaziados
+
+    for _ in range(5):
+        governador.registrar_limite("m")
+    assert governador.orcamento("m") == (20, 2000)                # piso de FATOR_MINIMO
+    assert governador.limites_atingidos == 6
+
+    relogio[0] += 5 * 60                                          # +10% por minuto
+    assert governador.orcamento("m") == (70, 7000)
+
+
+def test_aguardar_espera_o_balde_encher():
+    governador = GovernadorGemini(rpm=600, tpm=10 ** 6)
+    governador._modelo("m").requisicoes.nivel = 0.5               # meia requisição: ~0,05 s
+
+    asyncio.run(governador.aguardar("m", 1))
+
+    assert 0 < governador.espera_total < 1
+
+
+def test_backoff_e_deteccao_de_limite():
+    assert all(0 <= gemini_ritmo.backoff(t, base=2) <= min(60, 2 ** t) for t in range(1, 10) for _ in range(20))
+    assert gemini_ritmo.backoff(20, base=2) <= gemini_ritmo.BACKOFF_MAXIMO
+    assert gemini_ritmo.eh_limite(Exception("429 RESOURCE_EXHAUSTED"))
+    assert gemini_ritmo.eh_limite(Exception("Quota exceeded"))
+    assert not gemini_ritmo.eh_limite(Exception("503 UNAVAILABLE"))
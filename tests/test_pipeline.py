@@ -0,0 +1,239 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Estado e espelho isolados antes de importar o coletor (caminhos lidos no import)
+_TMP = tempfile.mkdtemp(prefix="teste_pipeline_")
+os.environ.setdefault("GOOGLE_SHEET_ID", "teste")
+os.environ.setdefault("GOOGLE_SHARED_DRIVE_ID", "teste")
+os.environ.setdefault("PIPEDRIVE_API_TOKEN", "teste")
+os.environ["ESTADO_DB"] = os.path.join(_TMP, "estado.db")
+os.environ["ESPELHO_PLANILHA_DB"] = os.path.join(_TMP, "espelho.db")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import collectors.boletins as boletins  # noqa: E402
+from services import espelho_planilha, estado  # noqa: E402
+
+# Módulos já importados por outros testes leram os caminhos antes do ambiente
+estado.ESTADO_DB = os.environ["ESTADO_DB"]
+espelho_planilha.ESPELHO_DB = os.environ["ESPELHO_PLANILHA_DB"]
+
+
+# =========================
+# STUBS
+# =========================
+
+class _Aba:
+    def __init__(self, planilha, nome):
+        self.planilha = planilha
+        self.nome = nome
+
+    def append_rows(self, linhas, value_input_option=None):
+        inicio = self.planilha.proxima_linha
+        self.planilha.proxima_linha += len(linhas)
+        self.planilha.gravados.extend(str(linha[1]) for linha in linhas)
+        return {"updates": {"updatedRange": f"{self.nome}!A{inicio}:U{inicio + len(linhas) - 1}"}}
+
+
+class _Planilha:
+    def __init__(self):
+        self.proxima_linha = 2
+        self.gravados = []
+        self.flags = []
+
+    def worksheet(self, nome):
+        return _Aba(self, nome)
+
+    def values_batch_update(self, corpo):
+        self.flags.extend(dado["range"] for dado in corpo["data"])
+
+
+class _Gemini:
+    concorrencia = 2
+
+    def __init__(self):
+        self.analisados = []
+
+    def processar(self, pdf, prompt, min_chars=0, hash_arquivo=None):
+        self.analisados.append(os.path.basename(pdf))
+        return "STATUS_FINAL: APROVADO", "SIM", {
+            "prompt_tokens": 1, "output_tokens": 1, "cached_tokens": 0, "cache_hit": False,
+        }
+
+    def fechar(self):
+        pass
+
+
+class _Contexto:
+    def cookies(self):
+        return []
+
+
+BOLETINS = {
+    10: [{"bidding_id": i, "edital": "medicos", "valor_estimado": 2e6,
+          "edicts": [{"filename": "edital.zip", "url": "/x"}]} for i in range(1, 4)],
+    20: [{"bidding_id": i, "edital": "telemedicina",
+          "edicts": [{"filename": "edital.zip", "url": "/x"}]} for i in range(4, 6)],
+}
+
+
+@pytest.fixture
+def coletor(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    with estado.conectar():
+        for tabela in ("checkpoint", "licitacoes_processadas", "etapas_licitacao", "resumos_ia", "arquivos_drive"):
+            estado.conectar().execute(f"DELETE FROM {tabela}")
+
+    execucao = {"checkpoints": [], "baixados": [], "falhar_registro": set(), "falhar_pipedrive": set(),
+                "falhar_processada": set(), "deals": [], "gemini": _Gemini(), "planilha": _Planilha()}
+
+    def baixar(sessao, boletim_id, bidding_id, arquivo):
+        execucao["baixados"].append(bidding_id)
+        caminho = tmp_path / f"{bidding_id}.pdf"
+        caminho.write_text(str(bidding_id))
+        return [str(caminho)]
+
+    original_inserir = boletins.inserir_boletim_google_sheets
+
+    def inserir(spreadsheet, dados, ids_existentes, escritor=None, contexto=None):
+        if str(dados["bidding_id"]) in execucao["falhar_registro"]:
+            raise RuntimeError("falha simulada")
+        return original_inserir(spreadsheet, dados, ids_existentes, escritor, contexto)
+
+    def importar(dados):
+        if str(dados["bidding_id"]) in execucao["falhar_pipedrive"]:
+            raise RuntimeError("pipedrive fora do ar")
+        execucao["deals"].append(str(dados["bidding_id"]))
+        return 100 + int(dados["bidding_id"])
+
+    original_processada = boletins.salvar_licitacao_processada
+
+    def salvar_processada(bidding_id, dados):
+        if str(bidding_id) in execucao["falhar_processada"]:
+            raise RuntimeError("queda simulada")
+        original_processada(bidding_id, dados)
+
+    def salvar_checkpoint(boletim_id):
+        execucao["checkpoints"].append(boletim_id)
+        estado.salvar_ultimo_boletim(boletim_id)
+
+    monkeypatch.setattr(boletins, "log_message", lambda *a, **k: None)
+    monkeypatch.setattr(boletins, "salvar_ultimo_boletim", salvar_checkpoint)
+    monkeypatch.setattr(boletins, "conectar_google_sheets", lambda: execucao["planilha"])
+    monkeypatch.setattr(boletins, "obter_ids_existentes", lambda spreadsheet: set())
+    monkeypatch.setattr(boletins, "ativar_boletins", lambda *a: None)
+    monkeypatch.setattr(boletins, "buscar_biddings_boletins", lambda sessao, ids: {b: BOLETINS[b] for b in ids})
+    monkeypatch.setattr(boletins, "baixar_edital_por_json", baixar)
+    monkeypatch.setattr(boletins, "gemini_queue", execucao["gemini"])
+    monkeypatch.setattr(boletins, "montar_prompt_gemini", lambda: "prompt")
+    monkeypatch.setattr(boletins, "criar_pasta", lambda nome, pai: "pasta")
+    monkeypatch.setattr(boletins, "upload_arquivo_para_pasta", lambda *a, **k: "arquivo")
+    monkeypatch.setattr(boletins, "inserir_boletim_google_sheets", inserir)
+    monkeypatch.setattr(boletins, "importar_deal_unico", importar)
+    monkeypatch.setattr(boletins, "salvar_licitacao_processada", salvar_processada)
+    monkeypatch.setattr(boletins, "processar_feedbacks", lambda *a, **k: None, raising=False)
+    return execucao
+
+
+# =========================
+# TESTES
+# =========================
+
+def test_checkpoint_nao_passa_boletim_inacabado(coletor):
+    coletor["falhar_registro"].add("2")
+
+    boletins.coletar_licitacoes(_Contexto(), [10, 20])
+
+    # Boletim 20 terminou, mas o 10 tem uma licitação com falha: nada é salvo
+    assert coletor["checkpoints"] == []
+    assert estado.obter_ultimo_boletim() == 0
+    assert "2" not in coletor["planilha"].gravados
+    assert {"1", "3", "4", "5"} <= set(coletor["planilha"].gravados)
+
+
+def test_checkpoint_avanca_em_ordem(coletor):
+    boletins.coletar_licitacoes(_Contexto(), [10, 20])
+
+    assert coletor["checkpoints"] == [10, 20]
+    assert estado.obter_ultimo_boletim() == 20
+
+
+def test_retomada_pula_etapas_concluidas(coletor):
+    coletor["falhar_registro"].add("2")
+    boletins.coletar_licitacoes(_Contexto(), [10])
+
+    etapas = estado.etapas_concluidas("2")
+    assert estado.ETAPA_BAIXADO in etapas and estado.ETAPA_ANALISADO in etapas
+    assert estado.ETAPA_PLANILHA not in etapas
+
+    # Segunda execução: a licitação 2 não é baixada nem analisada de novo
+    coletor["falhar_registro"].clear()
+    coletor["baixados"].clear()
+    coletor["gemini"].analisados.clear()
+    coletor["planilha"].gravados.clear()
+
+    boletins.coletar_licitacoes(_Contexto(), [10])
+
+    assert 2 not in coletor["baixados"]
+    assert "2.pdf" not in coletor["gemini"].analisados
+    assert "2" in coletor["planilha"].gravados
+    assert coletor["checkpoints"] == [10]
+
+
+def test_retomada_marca_importado_em_linha_de_execucao_anterior(coletor):
+    # 1ª execução: a linha do bidding 2 é gravada, mas o processo cai antes de
+    # marcá-lo como processado e o Pipedrive falha
+    coletor["falhar_processada"].add("2")
+    coletor["falhar_pipedrive"].add("2")
+    boletins.coletar_licitacoes(_Contexto(), [10])
+
+    planilha = estado.etapas_concluidas("2")[estado.ETAPA_PLANILHA]
+    assert estado.ETAPA_PIPEDRIVE not in estado.etapas_concluidas("2")
+    assert not any(flag.endswith(f"O{planilha['row_idx']}") for flag in coletor["planilha"].flags)
+
+    # 2ª execução (novo processo, buffer vazio): só o deal é criado e a flag
+    # vai para a linha registrada no checkpoint
+    coletor["falhar_processada"].clear()
+    coletor["falhar_pipedrive"].clear()
+    coletor["planilha"].gravados.clear()
+    coletor["deals"].clear()
+
+    boletins.coletar_licitacoes(_Contexto(), [10])
+
+    assert coletor["deals"] == ["2"]
+    assert "2" not in coletor["planilha"].gravados
+    assert f"{planilha['aba']}!O{planilha['row_idx']}" in coletor["planilha"].flags
+    assert estado.ETAPA_PIPEDRIVE in estado.etapas_concluidas("2")
+
+
+def test_fecha_apenas_a_sessao_que_criou(coletor, monkeypatch):
+    fechadas = []
+
+    class _Sessao(boletins.SessaoPortal):
+        def close(self):
+            fechadas.append(self)
+            super().close()
+
+    monkeypatch.setattr(boletins, "SessaoPortal", _Sessao)
+
+    boletins.coletar_licitacoes(_Contexto(), [10])
+    assert len(fechadas) == 1
+
+    # Falha antes da esteira também fecha
+    def falhar(*a):
+        raise RuntimeError("portal fora do ar")
+
+    monkeypatch.setattr(boletins, "ativar_boletins", falhar)
+    with pytest.raises(RuntimeError):
+        boletins.coletar_licitacoes(_Contexto(), [20])
+    assert len(fechadas) == 2
+
+    # Sessão recebida pertence a quem chamou
+    monkeypatch.setattr(boletins, "ativar_boletins", lambda *a: None)
+    sessao = _Sessao(_Contexto().cookies)
+    boletins.coletar_licitacoes(_Contexto(), [20], sessao=sessao)
+    assert len(fechadas) == 2
+    sessao.close()
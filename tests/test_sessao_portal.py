@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.sessao_portal import url_de_login  # noqa: E402
+
+
+@pytest.mark.parametrize("url", [
+    "https://conlicitacao.com.br/",
+    "https://www.conlicitacao.com.br/qualquer",
+    "https://consultaonline.conlicitacao.com.br/users/sign_in",
+    "https://consultaonline.conlicitacao.com.br/login?next=/boletins",
+])
+def test_reconhece_login(url):
+    assert url_de_login(url)
+
+
+@pytest.mark.parametrize("url", [
+    "https://consultaonline.conlicitacao.com.br/licitacoes/acessar-edital",
+    "https://consultaonline.conlicitacao.com.br/boletim_web/public/boletins/1?origem=login",
+    "https://consultaonline.conlicitacao.com.br/boletim_web/public/boletins/1/biddings.json",
+])
+def test_ignora_caminhos_comuns(url):
+    assert not url_de_login(url)
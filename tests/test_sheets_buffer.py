@@ -0,0 +1,114 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.sheets_buffer import EscritorPlanilha  # noqa: E402
+
+
+class _Aba:
+    def __init__(self, planilha, nome):
+        self.planilha = planilha
+        self.title = nome
+        self.proxima_linha = 2
+
+    def append_rows(self, linhas, value_input_option=None):
+        inicio = self.proxima_linha
+        self.proxima_linha += len(linhas)
+        self.planilha.appends.append((self.title, [linha[1] for linha in linhas]))
+        return {"updates": {"updatedRange": f"{self.title}!A{inicio}:U{inicio + len(linhas) - 1}"}}
+
+
+class _Planilha:
+    def __init__(self):
+        self.abas = {}
+        self.appends = []
+        self.flags = []
+        self.leituras_metadados = 0
+
+    def worksheet(self, nome):
+        self.leituras_metadados += 1
+        return self.abas.setdefault(nome, _Aba(self, nome))
+
+    def values_batch_update(self, corpo):
+        self.flags.append([dado["range"] for dado in corpo["data"]])
+
+
+def _linha(bidding_id):
+    return ["boletim", str(bidding_id)] + [""] * 19
+
+
+def test_agrupa_por_aba_ate_o_lote():
+    planilha = _Planilha()
+    escritor = EscritorPlanilha(planilha, lote=3, intervalo=60)
+
+    escritor.adicionar("aprovados", 1, _linha(1))
+    escritor.adicionar("reprovados", 2, _linha(2))
+    assert planilha.appends == []
+
+    escritor.adicionar("aprovados", 3, _linha(3))
+    escritor.adicionar("aprovados", 4, _linha(4))
+    escritor.descarregar()
+
+    assert planilha.appends == [("aprovados", ["1", "3"]), ("reprovados", ["2"]), ("aprovados", ["4"])]
+    assert planilha.leituras_metadados == 2          # worksheet() uma vez por aba
+    assert escritor.chamadas_api == 5
+
+
+def test_timer_descarrega_sem_novas_linhas():
+    planilha = _Planilha()
+    escritor = EscritorPlanilha(planilha, lote=100, intervalo=0.2)
+
+    escritor.adicionar("aprovados", 1, _linha(1))
+    time.sleep(0.6)
+
+    assert planilha.appends == [("aprovados", ["1"])]
+    assert escritor.pendentes() == 0
+
+
+def test_ao_gravar_recebe_a_linha_real_em_ordem():
+    planilha = _Planilha()
+    gravadas = []
+    escritor = EscritorPlanilha(planilha, ao_gravar=lambda contexto, aba, linha: gravadas.append((contexto, aba, linha)))
+
+    escritor.adicionar("aprovados", 10, _linha(10), contexto="a")
+    escritor.adicionar("aprovados", 11, _linha(11), contexto="b")
+    assert escritor.linha_de(10) is None          # ainda pendente
+    escritor.descarregar()
+    escritor.adicionar("aprovados", 12, _linha(12), contexto="c")
+    escritor.descarregar()
+
+    assert gravadas == [("a", "aprovados", 2), ("b", "aprovados", 3), ("c", "aprovados", 4)]
+    assert escritor.linha_de(11) == ("aprovados", 3)
+
+
+def test_marcar_importado_pendente_gravado_e_de_outra_execucao():
+    planilha = _Planilha()
+    escritor = EscritorPlanilha(planilha)
+
+    escritor.adicionar("aprovados", 1, _linha(1))
+    escritor.marcar_importado(1)                  # ainda no buffer: vai na própria linha
+    escritor.descarregar()
+    assert planilha.flags == []
+
+    assert escritor.marcar_importado(1)           # já gravada por este escritor
+    assert escritor.marcar_importado(7, aba="aprovados", linha=9)   # gravada numa execução anterior
+    assert not escritor.marcar_importado(8)       # desconhecida: avisa e não marca
+    escritor.descarregar()
+
+    assert planilha.flags == [["aprovados!O2", "aprovados!O9"]]
+
+
+def test_marcar_importado_no_buffer_altera_a_linha():
+    planilha = _Planilha()
+    valores = []
+    planilha.abas["aprovados"] = aba = _Aba(planilha, "aprovados")
+    aba.append_rows = lambda linhas, value_input_option=None: valores.extend(linhas)
+    escritor = EscritorPlanilha(planilha)
+
+    escritor.adicionar("aprovados", 1, _linha(1))
+    escritor.marcar_importado(1)
+    escritor.descarregar()
+
+    assert valores[0][14] == "TRUE"
@@ -0,0 +1,73 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services import sheets_update_service  # noqa: E402
+from services.sheets_update_service import IndiceLinhas  # noqa: E402
+
+
+class _Aba:
+    spreadsheet_id = "planilha"
+
+    def __init__(self, ids, title="aprovados"):
+        self.title = title
+        self.coluna_b = ["idconlicitacao"] + [str(i) for i in ids]
+        self.chamadas = 0
+        self.lotes = []
+
+    def col_values(self, coluna):
+        self.chamadas += 1
+        return list(self.coluna_b)
+
+    def batch_update(self, dados, value_input_option=None):
+        self.chamadas += 1
+        self.lotes.append(dados)
+
+
+def test_lote_custa_duas_chamadas():
+    aba = _Aba(range(1, 51))
+    ausentes = IndiceLinhas(aba).atualizar_status_lote(
+        {i: {"aprovado": "SIM", "link_drive": f"link{i}", "importado": "TRUE"} for i in range(1, 52)}
+    )
+
+    assert aba.chamadas == 2
+    assert ausentes == [51]
+    assert len(aba.lotes[0]) == 150
+    assert {"range": "M2", "values": [["SIM"]]} in aba.lotes[0]
+    assert {"range": "O51", "values": [["TRUE"]]} in aba.lotes[0]
+
+
+def test_indice_acompanha_insercoes_e_exclusoes():
+    aba = _Aba([10, 11, 12, 13])
+    indice = IndiceLinhas(aba).carregar()
+
+    indice.registrar_insercao([20, 21], primeira_linha=6)
+    indice.registrar_exclusoes([3, 5])     # saem 11 e 13
+
+    assert aba.chamadas == 1
+    assert [indice.linha(i) for i in (10, 12, 20, 21)] == [2, 3, 4, 5]
+    assert 11 not in indice and 13 not in indice
+
+
+def test_insercao_sem_indice_carregado_nao_le_a_planilha():
+    aba = _Aba([10])
+    indice = IndiceLinhas(aba)
+
+    indice.registrar_insercao([11])
+
+    assert aba.chamadas == 0
+    assert indice.linha(10) == 2
+
+
+def test_indice_compartilhado_por_aba(monkeypatch):
+    monkeypatch.setattr(sheets_update_service, "_indices", {})
+    aba = _Aba([30, 31], title="teste_compartilhado")
+    indice = sheets_update_service.indice(aba).carregar()
+
+    sheets_update_service.registrar_insercao(aba, [32], 4)
+    sheets_update_service.registrar_exclusoes(aba, [2])
+    sheets_update_service.atualizar_status_planilha(aba, 32, "SIM", "link")
+
+    assert sheets_update_service.indice(aba) is indice
+    assert aba.lotes[-1] == [{"range": "M3", "values": [["SIM"]]}, {"range": "N3", "values": [["link"]]}]